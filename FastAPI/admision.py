@@ -0,0 +1,101 @@
+"""
+Control de admisión del reconocimiento.
+
+Limita las peticiones admitidas (esperando + en ejecución) a max_cola y las
+que se ejecutan a la vez a max_en_ejecucion. Si la cola está llena se lanza
+ColaLlena de inmediato, con una estimación de cuándo reintentar, en lugar
+de dejar que la latencia crezca para todos. El tiempo de espera en cola y el
+de proceso se miden por separado.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+import metricas
+
+
+class ColaLlena(Exception):
+    """No hay sitio en la cola de reconocimiento."""
+    
+    def __init__(self, reintentar_en):
+        super().__init__(f"Servidor ocupado, reintentar en {reintentar_en} s")
+        self.reintentar_en = reintentar_en
+
+
+class Turno:
+    """Tiempos de una petición admitida."""
+    
+    def __init__(self):
+        self.llegada = time.perf_counter()
+        self.inicio = None
+        self.espera = 0.0
+        self.proceso = 0.0
+
+
+class ControlAdmision:
+    """Cola acotada delante del ejecutor de reconocimiento."""
+    
+    def __init__(self, max_cola, max_en_ejecucion):
+        self.max_cola = max_cola  # 0 = sin límite
+        self.max_en_ejecucion = max_en_ejecucion
+        self.semaforo = asyncio.Semaphore(max_en_ejecucion)
+        self.admitidas = 0
+        self.rechazadas = 0
+        # Media móvil del tiempo de proceso para estimar Retry-After
+        self.proceso_medio = 0.0
+    
+    def reintentar_en(self):
+        """Segundos estimados hasta que se libere sitio en la cola."""
+        rondas = self.admitidas / max(self.max_en_ejecucion, 1)
+        return max(1, math.ceil(self.proceso_medio * rondas))
+    
+    async def entrar(self):
+        """Admite la petición y espera turno de ejecución; lanza ColaLlena si no cabe."""
+        if self.max_cola > 0 and self.admitidas >= self.max_cola:
+            self.rechazadas += 1
+            metricas.RECHAZOS.inc()
+            raise ColaLlena(self.reintentar_en())
+        
+        turno = Turno()
+        self.admitidas += 1
+        metricas.ADMITIDAS.set(self.admitidas)
+        try:
+            await self.semaforo.acquire()
+        except BaseException:
+            # Cancelada mientras esperaba (por ejemplo, cliente desconectado)
+            self.admitidas -= 1
+            metricas.ADMITIDAS.set(self.admitidas)
+            raise
+        turno.inicio = time.perf_counter()
+        turno.espera = turno.inicio - turno.llegada
+        metricas.ESPERA_COLA.observar(turno.espera)
+        return turno
+    
+    def salir(self, turno):
+        """Libera el turno de ejecución y registra el tiempo de proceso."""
+        turno.proceso = time.perf_counter() - turno.inicio
+        self.semaforo.release()
+        self.admitidas -= 1
+        metricas.ADMITIDAS.set(self.admitidas)
+        metricas.PROCESO.observar(turno.proceso)
+        self.proceso_medio = turno.proceso if self.proceso_medio == 0 else 0.9 * self.proceso_medio + 0.1 * turno.proceso
+    
+    @asynccontextmanager
+    async def admitir(self):
+        """Bloque async with que ocupa un turno durante el reconocimiento."""
+        turno = await self.entrar()
+        try:
+            yield turno
+        finally:
+            self.salir(turno)
+    
+    def estadisticas(self):
+        """Estado de la cola."""
+        return {
+            "admitidas": self.admitidas,
+            "max_cola": self.max_cola,
+            "max_en_ejecucion": self.max_en_ejecucion,
+            "rechazadas": self.rechazadas,
+            "proceso_medio_s": round(self.proceso_medio, 4),
+        }
@@ -0,0 +1,151 @@
+"""
+Caché de resultados de reconocimiento indexada por el hash de los píxeles.
+
+Tiene dos niveles:
+- memoria: LRU en el propio proceso, limitada por tamaño en bytes
+- disco: base de datos SQLite compartida por todos los workers de uvicorn
+
+Cada nivel tiene su propio lock, para que los aciertos en memoria no esperen
+a SQLite. El nivel en disco no se recorta en cada inserción sino cada
+intervalo_poda inserciones, así que puede superar max_filas_disco en hasta
+ese número de filas por proceso.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheResultados:
+    """Caché LRU en memoria con un segundo nivel SQLite opcional."""
+    
+    def __init__(self, max_bytes_memoria, ruta_sqlite=None, max_filas_disco=100000, intervalo_poda=None):
+        """
+        Args:
+            intervalo_poda: inserciones en disco entre dos recortes (por defecto
+                el 1 % de max_filas_disco)
+        """
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_filas_disco = max_filas_disco
+        self.intervalo_poda = intervalo_poda or max(1, max_filas_disco // 100)
+        self.inserciones = 0
+        self.memoria = OrderedDict()
+        self.bytes_memoria = 0
+        self.lock = threading.Lock()
+        self.lock_disco = threading.Lock()
+        
+        # Contadores
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        
+        self.conexion = None
+        if ruta_sqlite:
+            self.conexion = sqlite3.connect(str(ruta_sqlite), timeout=5, check_same_thread=False)
+            self.conexion.execute("PRAGMA journal_mode=WAL")
+            self.conexion.execute(
+                "CREATE TABLE IF NOT EXISTS resultados ("
+                "clave TEXT PRIMARY KEY, resultado TEXT NOT NULL, creado REAL NOT NULL)"
+            )
+            self.conexion.execute("CREATE INDEX IF NOT EXISTS resultados_creado ON resultados (creado)")
+            self.conexion.commit()
+    
+    @staticmethod
+    def clave(img_array, version_modelo=""):
+        """Hash del contenido de la imagen decodificada (forma + píxeles) y de la versión del modelo."""
+        h = hashlib.blake2b(digest_size=20)
+        h.update(f"{version_modelo}|{img_array.shape}|{img_array.dtype.str}".encode())
+        h.update(memoryview(img_array).cast('B') if img_array.flags.c_contiguous else img_array.tobytes())
+        return h.hexdigest()
+    
+    def obtener(self, clave):
+        """
+        Busca un resultado en la caché.
+        
+        Returns:
+            tuple: (nivel, resultado) con nivel 'memoria', 'disco' o None si no está
+        """
+        with self.lock:
+            if clave in self.memoria:
+                self.memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return "memoria", json.loads(self.memoria[clave][0])
+        
+        if self.conexion is not None:
+            with self.lock_disco:
+                fila = self.conexion.execute(
+                    "SELECT resultado FROM resultados WHERE clave = ?", (clave,)
+                ).fetchone()
+            if fila is not None:
+                self._guardar_memoria(clave, fila[0])
+                with self.lock:
+                    self.aciertos_disco += 1
+                return "disco", json.loads(fila[0])
+        
+        with self.lock:
+            self.fallos += 1
+        return None, None
+    
+    def guardar(self, clave, resultado):
+        """Guarda un resultado (puede ser None si no se detectaron letras)."""
+        serializado = json.dumps(resultado, ensure_ascii=False)
+        self._guardar_memoria(clave, serializado)
+        
+        if self.conexion is not None:
+            with self.lock_disco:
+                self.conexion.execute(
+                    "INSERT OR REPLACE INTO resultados (clave, resultado, creado) VALUES (?, ?, ?)",
+                    (clave, serializado, time.time())
+                )
+                self.inserciones += 1
+                if self.inserciones >= self.intervalo_poda:
+                    self.inserciones = 0
+                    self._podar_disco()
+                self.conexion.commit()
+    
+    def _podar_disco(self):
+        """Elimina las entradas más antiguas del disco si se supera max_filas_disco (con lock_disco)."""
+        filas = self.conexion.execute("SELECT COUNT(*) FROM resultados").fetchone()[0]
+        if filas > self.max_filas_disco:
+            # Con el índice sobre creado solo se recorren las filas que se borran
+            self.conexion.execute(
+                "DELETE FROM resultados WHERE clave IN ("
+                "SELECT clave FROM resultados ORDER BY creado LIMIT ?)",
+                (filas - self.max_filas_disco,)
+            )
+    
+    def _guardar_memoria(self, clave, serializado):
+        """Inserta en el nivel de memoria expulsando por tamaño (LRU)."""
+        tamano = len(serializado.encode('utf-8'))
+        if tamano > self.max_bytes_memoria:
+            return
+        with self.lock:
+            if clave in self.memoria:
+                self.bytes_memoria -= self.memoria.pop(clave)[1]
+            self.memoria[clave] = (serializado, tamano)
+            self.bytes_memoria += tamano
+            while self.bytes_memoria > self.max_bytes_memoria:
+                _, (_, tamano_expulsado) = self.memoria.popitem(last=False)
+                self.bytes_memoria -= tamano_expulsado
+    
+    def estadisticas(self):
+        """Contadores de aciertos/fallos y ocupación."""
+        with self.lock:
+            consultas = self.aciertos_memoria + self.aciertos_disco + self.fallos
+            return {
+                "aciertos_memoria": self.aciertos_memoria,
+                "aciertos_disco": self.aciertos_disco,
+                "fallos": self.fallos,
+                "tasa_aciertos": (self.aciertos_memoria + self.aciertos_disco) / consultas if consultas else 0.0,
+                "entradas_memoria": len(self.memoria),
+                "bytes_memoria": self.bytes_memoria,
+            }
+    
+    def cerrar(self):
+        """Cierra la conexión con SQLite."""
+        if self.conexion is not None:
+            with self.lock_disco:
+                self.conexion.close()
+            self.conexion = None
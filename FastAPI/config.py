@@ -0,0 +1,118 @@
+"""
+Configuración del servicio OCR a partir de variables de entorno
+"""
+import os
+from pathlib import Path
+
+
+def _entero(nombre, defecto):
+    """Lee una variable de entorno entera con valor por defecto."""
+    valor = os.environ.get(nombre)
+    return int(valor) if valor not in (None, "") else defecto
+
+
+def _decimal(nombre, defecto):
+    """Lee una variable de entorno decimal con valor por defecto."""
+    valor = os.environ.get(nombre)
+    return float(valor) if valor not in (None, "") else defecto
+
+
+def _booleano(nombre, defecto):
+    """Lee una variable de entorno booleana (1/0, true/false, si/no)."""
+    valor = os.environ.get(nombre)
+    if valor in (None, ""):
+        return defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes", "on")
+
+
+def _texto(nombre, defecto):
+    """Lee una variable de entorno de texto con valor por defecto."""
+    return os.environ.get(nombre, defecto)
+
+
+# Nivel de logging (DEBUG activa las trazas detalladas de cada petición)
+LOG_NIVEL = _texto("OCR_LOG_NIVEL", "INFO").upper()
+
+# Procesos de reconocimiento (0 = ejecutar en un hilo del propio servidor)
+PROCESOS_OCR = _entero("OCR_PROCESOS", 0)
+
+# Procesos servidor creados con fork después de cargar el modelo (1 = uno solo,
+# sin fork) e hilos de BLAS de cada uno (0 = núcleos repartidos entre los procesos)
+WORKERS = _entero("OCR_WORKERS", 1)
+HILOS_BLAS = _entero("OCR_HILOS_BLAS", 0)
+
+# Motor de clasificación: "sklearn" (modelo.pkl + scaler.pkl) o "lineal"
+# (modelo_lineal.npz exportado con modelo/fase2_entrenamiento/exportar_modelo.py)
+MOTOR = _texto("OCR_MOTOR", "sklearn")
+
+# Precisión de los pesos del motor lineal en memoria: float32, float16 o int8
+PRECISION = _texto("OCR_PRECISION", "float32")
+
+# Clase de cada carácter: la de model.predict (votación uno-contra-uno en el
+# SVC, por defecto) o, con OCR_CLASE_ARGMAX=1, el argmax de predict_proba, que
+# ahorra una llamada al modelo pero acierta menos (ver benchmarks/README.md)
+CLASE_ARGMAX = _booleano("OCR_CLASE_ARGMAX", False)
+
+# Motor lineal desde models/modelo_lineal/ (un .npy por array) proyectado con
+# mmap: los procesos comparten los pesos en la caché de páginas del sistema
+MMAP = _booleano("OCR_MMAP", False)
+
+# Reducción de imágenes grandes antes de segmentar: altura objetivo del texto
+# en píxeles (0 = desactivada), tamaño a partir del cual se intenta y píxeles
+# de la muestra con la que se estima la altura del texto
+ALTURA_TEXTO = _entero("OCR_ALTURA_TEXTO", 48)
+REDUCIR_DESDE_PIXELES = _entero("OCR_REDUCIR_DESDE_PIXELES", 1000000)
+PIXELES_ESTIMACION = _entero("OCR_PIXELES_ESTIMACION", 250000)
+
+# Tamaño máximo del cuerpo de una petición HTTP en bytes (0 = sin límite): se
+# responde 413 en cuanto se supera, sin leer el resto
+MAX_BYTES_PETICION = _entero("OCR_MAX_BYTES_PETICION", 32 * 1024 * 1024)
+
+# Lotes de /upload-images/: archivos como máximo (contando los de dentro de
+# los .zip) y bytes en total una vez descomprimidos (0 = sin límite); se
+# responde 413 al superarlos
+MAX_ARCHIVOS_LOTE = _entero("OCR_MAX_ARCHIVOS_LOTE", 256)
+MAX_BYTES_LOTE = _entero("OCR_MAX_BYTES_LOTE", 64 * 1024 * 1024)
+
+# Detección de idioma: "ngramas" (idioma.py, solo los idiomas soportados) o
+# "langdetect" (55 idiomas, más lento)
+DETECTOR_IDIOMA = _texto("OCR_DETECTOR_IDIOMA", "ngramas")
+
+# Calentamiento al arrancar: reconocimientos de una imagen sintética tras el
+# primero (en frío) con los que se mide la latencia en caliente de /ready
+# (0 = sin calentamiento; /ready responde listo en cuanto carga el modelo)
+CALENTAMIENTO = _entero("OCR_CALENTAMIENTO", 3)
+
+# Micro-lotes entre peticiones: ventana en milisegundos (0 = desactivado) y
+# caracteres a partir de los cuales el lote se envía sin esperar
+MICROLOTE_MS = _decimal("OCR_MICROLOTE_MS", 0.0)
+MICROLOTE_MAX_GLIFOS = _entero("OCR_MICROLOTE_MAX_GLIFOS", 2048)
+
+# Control de admisión: peticiones admitidas como máximo (0 = sin límite) y
+# reconocimientos simultáneos (0 = uno por proceso OCR, o por CPU si no hay procesos)
+MAX_COLA = _entero("OCR_MAX_COLA", 64)
+MAX_EN_EJECUCION = _entero("OCR_MAX_EN_EJECUCION", 0)
+
+# Caché de resultados: nivel en memoria (bytes) y nivel SQLite ("" = desactivado)
+CACHE_MEMORIA_BYTES = _entero("OCR_CACHE_MEMORIA_BYTES", 64 * 1024 * 1024)
+CACHE_SQLITE = _texto("OCR_CACHE_SQLITE", str(Path(__file__).parent / "cache_ocr.sqlite"))
+CACHE_DISCO_MAX_FILAS = _entero("OCR_CACHE_DISCO_MAX_FILAS", 100000)
+
+# Imágenes de debug: activación, fracción guardada, límite en disco y tamaño de la cola
+DEBUG_IMAGENES = _booleano("OCR_DEBUG_IMAGENES", True)
+DEBUG_MUESTREO = _decimal("OCR_DEBUG_MUESTREO", 1.0)
+DEBUG_MAX_BYTES = _entero("OCR_DEBUG_MAX_BYTES", 200 * 1024 * 1024)
+DEBUG_COLA = _entero("OCR_DEBUG_COLA", 64)
+
+# WebSocket de frames: diferencia media mínima (niveles de gris, miniatura 32x32) para reconocer un frame
+WS_UMBRAL_DIFERENCIA = _decimal("OCR_WS_UMBRAL_DIFERENCIA", 2.0)
+
+# Perfilado de peticiones con ?profile=1 (cProfile; desactivado por defecto
+# porque ralentiza la petición y expone detalles internos)
+PERFILADO = _booleano("OCR_PERFILADO", False)
+
+# Recarga del modelo sin reiniciar: intervalo en segundos para vigilar los
+# ficheros de ../models (0 = solo con POST /admin/recargar-modelo) y token
+# para ese endpoint (vacío = solo se acepta desde localhost)
+VIGILAR_MODELO = _decimal("OCR_VIGILAR_MODELO", 0.0)
+ADMIN_TOKEN = _texto("OCR_ADMIN_TOKEN", "")
@@ -0,0 +1,69 @@
+"""
+Estado por conexión para el reconocimiento continuo de frames (WebSocket).
+
+Cada conexión conserva el último frame aceptado. Un frame nuevo se omite si
+sus bytes son idénticos (mismo hash) o si su miniatura en escala de grises
+apenas difiere de la del último frame aceptado.
+"""
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+# Lado de la miniatura usada para comparar frames
+LADO_MINIATURA = 32
+
+
+def miniatura(img):
+    """Miniatura LADO_MINIATURA x LADO_MINIATURA en float32 de una imagen PIL en escala de grises."""
+    return np.asarray(img.resize((LADO_MINIATURA, LADO_MINIATURA), Image.BILINEAR), dtype=np.float32)
+
+
+class FiltroFrames:
+    """Decide qué frames de una conexión merecen reconocerse."""
+    
+    def __init__(self, umbral_diferencia=2.0):
+        self.umbral_diferencia = umbral_diferencia
+        self.ultimo_hash = None
+        self.ultima_miniatura = None
+        self._hash_pendiente = None
+        
+        # Contadores de la conexión
+        self.recibidos = 0
+        self.omitidos = 0
+        self.aceptados = 0
+        self.reemplazados = 0
+    
+    def es_repetido_por_hash(self, contents):
+        """Comprueba (y cuenta) si los bytes coinciden con el último frame aceptado."""
+        self.recibidos += 1
+        digest = hashlib.blake2b(contents, digest_size=16).digest()
+        if digest == self.ultimo_hash:
+            self.omitidos += 1
+            return True
+        self._hash_pendiente = digest
+        return False
+    
+    def es_repetido_por_contenido(self, img):
+        """
+        Compara la miniatura de la imagen con la del último frame aceptado.
+        Si es suficientemente distinta, el frame pasa a ser el de referencia.
+        """
+        actual = miniatura(img)
+        if (self.ultima_miniatura is not None
+                and float(np.mean(np.abs(actual - self.ultima_miniatura))) < self.umbral_diferencia):
+            self.omitidos += 1
+            return True
+        self.ultima_miniatura = actual
+        self.ultimo_hash = self._hash_pendiente
+        self.aceptados += 1
+        return False
+    
+    def estadisticas(self):
+        """Contadores de la conexión."""
+        return {
+            "recibidos": self.recibidos,
+            "omitidos": self.omitidos,
+            "aceptados": self.aceptados,
+            "reemplazados": self.reemplazados,
+        }
@@ -0,0 +1,52 @@
+"""
+Script para generar data/perfiles_idioma.npz a partir de los perfiles de langdetect
+Solo incluye los idiomas de idioma.IDIOMAS; langdetect solo hace falta para generarlo
+"""
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from idioma import IDIOMAS, MAX_N, RUTA_PERFILES
+
+try:
+    import langdetect
+except ImportError:
+    print("La librería 'langdetect' no está instalada.")
+    print("Instálala con: pip install langdetect")
+    sys.exit(1)
+
+def leer_perfil(codigo):
+    """Frecuencias de los n-gramas (en minúsculas) y total por longitud de un perfil de langdetect"""
+    ruta = Path(langdetect.__file__).parent / "profiles" / codigo
+    perfil = json.loads(ruta.read_text(encoding="utf-8"))
+    
+    # El detector pasa el texto a minúsculas: se suman las variantes en mayúsculas
+    frecuencias = {}
+    for ngrama, frecuencia in perfil["freq"].items():
+        ngrama = ngrama.lower()
+        if len(ngrama) <= MAX_N:
+            frecuencias[ngrama] = frecuencias.get(ngrama, 0) + frecuencia
+    return frecuencias, perfil["n_words"][:MAX_N]
+
+def generar_perfiles():
+    """Une los perfiles en una matriz (n-gramas, idiomas) y la guarda"""
+    idiomas = list(IDIOMAS)
+    perfiles = [leer_perfil(codigo) for codigo in idiomas]
+    
+    ngramas = sorted(set().union(*(frecuencias for frecuencias, _ in perfiles)))
+    indices = {ngrama: i for i, ngrama in enumerate(ngramas)}
+    matriz = np.zeros((len(ngramas), len(idiomas)), dtype=np.int64)
+    for columna, (frecuencias, _) in enumerate(perfiles):
+        for ngrama, frecuencia in frecuencias.items():
+            matriz[indices[ngrama], columna] = frecuencia
+    totales = np.array([total for _, total in perfiles], dtype=np.int64)
+    
+    np.savez_compressed(RUTA_PERFILES, ngramas=np.array(ngramas), frecuencias=matriz,
+                        totales=totales, idiomas=np.array(idiomas))
+    print(f"Perfiles de {', '.join(idiomas)}: {len(ngramas)} n-gramas")
+    print(f"   Guardados en: {RUTA_PERFILES} ({RUTA_PERFILES.stat().st_size / 1024:.0f} KB)")
+
+if __name__ == "__main__":
+    generar_perfiles()
@@ -0,0 +1,128 @@
+"""
+Detección de idioma del texto reconocido con perfiles de n-gramas de caracteres.
+
+Solo se consideran los idiomas que muestra la API (IDIOMAS). Cada perfil
+guarda cuántas veces aparece cada n-grama de 1 a 3 caracteres en el idioma
+(data/perfiles_idioma.npz, generado con generar_perfiles_idioma.py a partir
+de los perfiles de langdetect). La puntuación de un texto es la
+log-verosimilitud de sus n-gramas en cada idioma (Bayes ingenuo): una
+suma sobre las filas de una matriz (n-gramas, idiomas).
+
+A diferencia de langdetect no hay muestreo aleatorio, así que el resultado
+es determinista y se puede cachear por texto.
+"""
+import re
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+# Idiomas soportados y nombre que devuelve la API
+IDIOMAS = {
+    'es': '🇪🇸 Español',
+    'en': '🇬🇧 Inglés',
+    'ca': '🇪🇸 Catalán',
+    'fr': '🇫🇷 Francés',
+    'de': '🇩🇪 Alemán',
+    'it': '🇮🇹 Italiano',
+    'pt': '🇵🇹 Portugués'
+}
+
+RUTA_PERFILES = Path(__file__).parent.parent / "data" / "perfiles_idioma.npz"
+
+# Longitud máxima de los n-gramas
+MAX_N = 3
+
+# Textos distintos cuyo idioma se recuerda
+MAX_CACHE = 4096
+
+# Todo lo que no es una letra separa palabras
+_NO_LETRA = re.compile(r"[\W\d_]+")
+
+
+def ngramas(texto):
+    """N-gramas de 1 a MAX_N caracteres de cada palabra, con un espacio delante y detrás."""
+    resultado = []
+    for palabra in _NO_LETRA.split(texto.lower()):
+        if not palabra:
+            continue
+        resultado.extend(palabra)
+        relleno = f" {palabra} "
+        for n in range(2, MAX_N + 1):
+            resultado.extend(relleno[i:i + n] for i in range(len(relleno) - n + 1))
+    return resultado
+
+
+class DetectorIdioma:
+    """Clasificador de Bayes ingenuo sobre n-gramas de caracteres."""
+    
+    def __init__(self, ngramas, frecuencias, totales, idiomas):
+        """
+        Args:
+            ngramas: (V,) n-gramas del vocabulario
+            frecuencias: (V, L) apariciones de cada n-grama en cada idioma
+            totales: (L, MAX_N) n-gramas de cada longitud contados en cada idioma
+            idiomas: (L,) códigos de idioma
+        """
+        self.idiomas = [str(idioma) for idioma in idiomas]
+        self.indices = {str(ngrama): i for i, ngrama in enumerate(ngramas)}
+        longitudes = np.array([len(str(ngrama)) for ngrama in ngramas])
+        frecuencias = np.asarray(frecuencias, dtype=np.float64)
+        totales = np.asarray(totales, dtype=np.float64)
+        
+        # Los perfiles solo guardan los n-gramas que superan una frecuencia
+        # mínima, distinta en cada idioma: un n-grama ausente del perfil se
+        # cuenta como la mitad de esa mínima (no con +1, que favorecería a
+        # los idiomas con perfiles más cortos)
+        minimas = np.array([[frecuencias[(longitudes == n) & (frecuencias[:, j] > 0), j].min()
+                             for n in range(1, MAX_N + 1)] for j in range(len(self.idiomas))])
+        ausente = minimas / 2
+        
+        # Filas 0..V-1: n-gramas conocidos; fila V + n - 1: n-grama desconocido de longitud n
+        self.log_probabilidades = np.vstack([
+            np.log(np.maximum(frecuencias, ausente[:, longitudes - 1].T) / totales[:, longitudes - 1].T),
+            np.log(ausente / totales).T,
+        ]).astype(np.float32)
+        self.desconocido = len(self.indices) - 1
+    
+    @classmethod
+    def cargar(cls, ruta=RUTA_PERFILES):
+        """Carga los perfiles generados con generar_perfiles_idioma.py."""
+        with np.load(ruta, allow_pickle=False) as datos:
+            return cls(datos["ngramas"], datos["frecuencias"], datos["totales"], datos["idiomas"])
+    
+    def puntuaciones(self, texto):
+        """Log-verosimilitud del texto en cada idioma (L,), o None si no tiene letras."""
+        filas = [self.indices.get(ngrama, self.desconocido + len(ngrama)) for ngrama in ngramas(texto)]
+        if not filas:
+            return None
+        cuentas = np.bincount(filas, minlength=len(self.log_probabilidades))
+        return cuentas @ self.log_probabilidades
+    
+    def detectar(self, texto):
+        """Código del idioma más probable, o None si el texto no tiene letras."""
+        puntuaciones = self.puntuaciones(texto)
+        if puntuaciones is None:
+            return None
+        return self.idiomas[int(np.argmax(puntuaciones))]
+
+
+_detector = None
+_bloqueo = threading.Lock()
+
+
+def detector():
+    """Detector con los perfiles de data/, cargado la primera vez que se usa."""
+    global _detector
+    if _detector is None:
+        with _bloqueo:
+            if _detector is None:
+                _detector = DetectorIdioma.cargar()
+    return _detector
+
+
+@lru_cache(maxsize=MAX_CACHE)
+def detectar(texto):
+    """Código del idioma del texto (con caché), o None si no tiene letras."""
+    return detector().detectar(texto)
@@ -0,0 +1,74 @@
+"""
+Límite del tamaño del cuerpo de las peticiones HTTP.
+
+Middleware ASGI que responde 413 en cuanto se sabe que el cuerpo supera el
+máximo: antes de leer nada si la cabecera Content-Length ya lo declara y, si
+no (transferencia por trozos o Content-Length falso), en cuanto lo recibido
+lo supera, sin esperar al resto. Así una subida enorme nunca llega entera a
+memoria.
+"""
+import json
+
+import metricas
+
+
+class CuerpoDemasiadoGrande(Exception):
+    """Se ha recibido más cuerpo del permitido."""
+
+
+class LimiteCuerpo:
+    """Middleware ASGI que limita el cuerpo de las peticiones HTTP a max_bytes (0 = sin límite)."""
+    
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.max_bytes <= 0:
+            await self.app(scope, receive, send)
+            return
+        
+        for nombre, valor in scope["headers"]:
+            if nombre == b"content-length" and valor.isdigit() and int(valor) > self.max_bytes:
+                await self._rechazar(send)
+                return
+        
+        recibidos = 0
+        iniciada = False
+        rechazada = False
+        
+        async def recibir():
+            nonlocal recibidos, rechazada
+            mensaje = await receive()
+            if mensaje["type"] == "http.request" and not rechazada:
+                recibidos += len(mensaje.get("body", b""))
+                if recibidos > self.max_bytes:
+                    rechazada = True
+                    if not iniciada:
+                        await self._rechazar(send)
+                    raise CuerpoDemasiadoGrande()
+            return mensaje
+        
+        async def enviar(mensaje):
+            nonlocal iniciada
+            # Tras el 413 se descarta lo que responda la aplicación (FastAPI
+            # convierte los errores al leer el formulario en un 400)
+            if rechazada:
+                return
+            if mensaje["type"] == "http.response.start":
+                iniciada = True
+            await send(mensaje)
+        
+        try:
+            await self.app(scope, recibir, enviar)
+        except CuerpoDemasiadoGrande:
+            pass
+    
+    async def _rechazar(self, send):
+        metricas.CUERPOS_RECHAZADOS.inc()
+        cuerpo = json.dumps({"detail": f"El cuerpo de la petición supera {self.max_bytes} bytes"}).encode()
+        await send({"type": "http.response.start", "status": 413,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(cuerpo)).encode()),
+                                (b"connection", b"close")]})
+        await send({"type": "http.response.body", "body": cuerpo})
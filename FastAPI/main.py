@@ -2,51 +2,48 @@
 API FastAPI para reconocimiento de texto OCR
 """
 import sys
+import time
+import asyncio
+import logging
 from pathlib import Path
 import numpy as np
-import pickle
 from PIL import Image
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 import io
+import json
 import base64
+import hmac
+import zipfile
 from typing import List
-from langdetect import detect, DetectorFactory
 
-# Fijar semilla para resultados consistentes en langdetect
-DetectorFactory.seed = 0
+import os
 
-# Añadir directorio raíz al path
-project_root = Path(__file__).resolve().parent.parent
-segmenter_path = project_root / "modelo" / "fase3_evaluacion"
-sys.path.insert(0, str(project_root))
-sys.path.insert(0, str(segmenter_path))
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
-# Importar segmentador
-import importlib.util
-import importlib
+import config
+import metricas
+import motor_ocr
+import perfilado
+import respuestas
+from admision import ColaLlena, ControlAdmision
+from cache_resultados import CacheResultados
+from debug_imagenes import EscritorDebug
+from flujo_frames import FiltroFrames
+from limite_cuerpo import LimiteCuerpo
+from procesos import PoolOCR
 
-# Forzar recarga para evitar problemas de caché
-spec = importlib.util.spec_from_file_location(
-    "simple_segmenter", 
-    str(segmenter_path / "simple_segmenter.py")
-)
-simple_segmenter = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(simple_segmenter)
-
-# Recargar el módulo si ya estaba cargado
-if 'simple_segmenter' in sys.modules:
-    simple_segmenter = importlib.reload(simple_segmenter)
-
-SimpleImageSegmenter = simple_segmenter.SimpleImageSegmenter
-
-# Verificar que el segmentador tiene los métodos necesarios
-print(f"✅ SimpleImageSegmenter cargado correctamente")
-print(f"   - Métodos disponibles: {[m for m in dir(SimpleImageSegmenter) if not m.startswith('_')]}")
-if not hasattr(SimpleImageSegmenter, 'segment_image'):
-    raise ImportError("SimpleImageSegmenter no tiene el método segment_image!")
+# Logging: las trazas de cada petición solo se emiten con OCR_LOG_NIVEL=DEBUG
+logging.basicConfig(level=config.LOG_NIVEL,
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger("ocr.api")
 
 # Inicializar FastAPI
 app = FastAPI(title="OCR API", version="1.0.0")
@@ -60,10 +57,46 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Variables globales para el modelo
-model = None
-scaler = None
-label_mapping = None
+# Tamaño máximo del cuerpo, comprobado mientras se recibe
+app.add_middleware(LimiteCuerpo, max_bytes=config.MAX_BYTES_PETICION)
+
+@app.middleware("http")
+async def medir_peticiones(request: Request, call_next):
+    """Registra la duración de cada petición por ruta y código de estado."""
+    inicio = time.perf_counter()
+    codigo = 500
+    try:
+        response = await call_next(request)
+        codigo = response.status_code
+        version = motor_ocr.version_modelo()
+        if version is not None:
+            response.headers["X-Modelo-Version"] = version
+        return response
+    finally:
+        ruta = request.scope.get("route")
+        metricas.PETICION_SEGUNDOS.observar(time.perf_counter() - inicio,
+                                           ruta=ruta.path if ruta is not None else "otra",
+                                           codigo=codigo)
+
+# Ejecutor del reconocimiento (procesos o hilo)
+pool_ocr = None
+
+# Caché de resultados por contenido de la imagen
+cache = None
+
+# Guardado de imágenes de debug en segundo plano
+escritor_debug = None
+
+# Cola acotada delante del reconocimiento
+control_admision = None
+
+# Recarga del modelo: evita dos recargas simultáneas
+bloqueo_recarga = asyncio.Lock()
+tarea_vigilancia = None
+
+# Calentamiento en segundo plano al arrancar; /ready no responde listo hasta que termina
+tarea_calentamiento = None
+calentamiento = {"listo": False, "latencia_fria_ms": None, "latencia_caliente_ms": None, "error": None}
 
 # Modelos de datos
 class RecognitionResponse(BaseModel):
@@ -75,135 +108,299 @@ class RecognitionResponse(BaseModel):
 
 @app.on_event("startup")
 async def cargar_modelo():
-    """Carga el modelo al iniciar la aplicación."""
-    global model, scaler, label_mapping
+    """Carga el modelo y arranca los procesos de reconocimiento."""
+    global pool_ocr, cache, escritor_debug, control_admision, tarea_vigilancia, tarea_calentamiento
     
-    # Usar la carpeta models de la raíz del proyecto
-    models_dir = Path(__file__).parent.parent / "models"
-    data_dir = Path(__file__).parent.parent / "data"
+    # Con varios procesos servidor el modelo ya viene cargado del padre (servidor.py)
+    if motor_ocr.modelo_activo is None:
+        motor_ocr.cargar_modelo()
+    cache = CacheResultados(config.CACHE_MEMORIA_BYTES, config.CACHE_SQLITE or None,
+                            config.CACHE_DISCO_MAX_FILAS)
+    escritor_debug = EscritorDebug(Path(__file__).parent / "debug_images",
+                                   activo=config.DEBUG_IMAGENES,
+                                   muestreo=config.DEBUG_MUESTREO,
+                                   max_bytes=config.DEBUG_MAX_BYTES,
+                                   max_cola=config.DEBUG_COLA)
+    pool_ocr = PoolOCR(config.PROCESOS_OCR, config.MICROLOTE_MS, config.MICROLOTE_MAX_GLIFOS)
+    await pool_ocr.iniciar()
     
-    model_path = models_dir / "modelo.pkl"
-    scaler_path = models_dir / "scaler.pkl"
-    mapping_path = data_dir / "mapping.txt"
+    en_ejecucion = config.MAX_EN_EJECUCION or config.PROCESOS_OCR or (os.cpu_count() or 1)
+    control_admision = ControlAdmision(config.MAX_COLA, en_ejecucion)
     
-    if not model_path.exists():
-        raise FileNotFoundError(f"Modelo no encontrado en {model_path}")
+    if config.VIGILAR_MODELO > 0:
+        tarea_vigilancia = asyncio.create_task(vigilar_modelo(config.VIGILAR_MODELO))
     
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
+    tarea_calentamiento = asyncio.create_task(calentar(config.CALENTAMIENTO))
+
+@app.on_event("shutdown")
+async def detener_procesos():
+    """Detiene los procesos de reconocimiento."""
+    for tarea in (tarea_vigilancia, tarea_calentamiento):
+        if tarea is not None:
+            tarea.cancel()
+    if pool_ocr is not None:
+        pool_ocr.cerrar()
+    if cache is not None:
+        cache.cerrar()
+    if escritor_debug is not None:
+        escritor_debug.cerrar()
+
+async def calentar(repeticiones):
+    """
+    Reconoce una imagen sintética por el mismo camino que las peticiones
+    (ejecutor, procesos OCR y micro-lotes), sin caché ni cola: la primera vez
+    en frío y después `repeticiones` veces en caliente, cuya mediana es la
+    latencia que informa /ready. Los procesos OCR ya llegan calentados
+    (procesos._inicializar_proceso).
+    """
+    if repeticiones <= 0:
+        calentamiento["listo"] = True
+        return
     
-    with open(scaler_path, 'rb') as f:
-        scaler = pickle.load(f)
+    try:
+        img_array = motor_ocr.imagen_calentamiento()
+        latencias = []
+        for _ in range(repeticiones + 1):
+            inicio = time.perf_counter()
+            await pool_ocr.reconocer(img_array)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        if config.PROCESOS_OCR > 0:
+            # El proceso servidor también detecta el idioma con micro-lotes y
+            # reconoce en /upload-image/stream
+            await run_in_threadpool(motor_ocr.calentar_reconocimiento)
+    except Exception as e:
+        logger.exception("Error en el calentamiento")
+        calentamiento["error"] = str(e)
+        return
     
-    # Cargar mapping
-    label_mapping = {}
-    with open(mapping_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            label, letter = line.strip().split()
-            label_mapping[int(label)] = letter
+    calentamiento["latencia_fria_ms"] = round(latencias[0], 2)
+    calentamiento["latencia_caliente_ms"] = round(float(np.median(latencias[1:])), 2)
+    calentamiento["listo"] = True
+    logger.info("Calentamiento terminado: %.1f ms en frío, %.1f ms en caliente",
+                calentamiento["latencia_fria_ms"], calentamiento["latencia_caliente_ms"])
+
+def decodificar_imagen(contents):
+    """
+    Convierte bytes a imagen PIL en escala de grises y su array, ya reducido
+    si el texto es mucho mayor de lo necesario (la imagen PIL es la decodificada).
+    """
+    inicio = time.perf_counter()
+    img = Image.open(io.BytesIO(contents))
+    if img.format == "JPEG" and img.width * img.height >= config.REDUCIR_DESDE_PIXELES:
+        img, decodificada = decodificar_jpeg_reducido(img, contents)
+        img_array = np.array(img)
+    else:
+        decodificada = img.width * img.height * len(img.getbands())
+        img = img.convert('L')
+        img_array = reducir_imagen(np.array(img))
+    metricas.ETAPA_SEGUNDOS.observar(time.perf_counter() - inicio, etapa="decodificacion")
+    # Lo que llega a coexistir: el cuerpo, la imagen decodificada y dos copias
+    # del tamaño final (la imagen en gris o reducida y el array)
+    metricas.MEMORIA_PICO.observar(len(contents) + decodificada + 2 * img.width * img.height)
+    logger.debug("Imagen cargada: %s", img_array.shape)
+    return img, img_array
+
+def decodificar_jpeg_reducido(img, contents):
+    """
+    Decodifica un JPEG grande directamente en gris y ya reducido.
     
-    print("[OK] Modelo cargado correctamente")
+    Con el modo draft libjpeg reduce a 1/2, 1/4 o 1/8 durante la IDCT, de modo
+    que una foto de 20 MB nunca llega a descomprimirse entera en RGB; lo que
+    falta hasta el factor de motor_ocr.factor_jpeg se reduce con un filtro de
+    caja, como Image.reduce en motor_ocr.reducir_imagen.
+    
+    Returns:
+        tuple: (imagen PIL en gris, bytes de la imagen que decodifica libjpeg)
+    """
+    ancho, alto = img.size
+    factor = motor_ocr.factor_jpeg(contents, img.size)
+    escala = 1
+    while escala < 8 and escala * 2 <= factor:
+        escala *= 2
+    img.draft('L', (-(-ancho // escala), -(-alto // escala)))
+    metricas.JPEG_DRAFT.inc(escala=escala)
+    decodificada = img.width * img.height * len(img.getbands())
+    if img.mode != 'L':
+        img = img.convert('L')
+    if factor >= 2:
+        img = img.resize((ancho // factor, alto // factor), Image.BOX)
+        metricas.PIXELES_AHORRADOS.inc(ancho * alto - img.width * img.height)
+        metricas.IMAGENES_REDUCIDAS.inc()
+    return img, decodificada
 
-def detectar_idioma(texto):
-    """Detecta el idioma del texto reconocido."""
-    try:
-        if len(texto.strip()) < 3:
-            return "Desconocido"
-        
-        lang_code = detect(texto)
-        
-        idiomas = {
-            'es': '🇪🇸 Español',
-            'en': '🇬🇧 Inglés',
-            'ca': '🇪🇸 Catalán',
-            'fr': '🇫🇷 Francés',
-            'de': '🇩🇪 Alemán',
-            'it': '🇮🇹 Italiano',
-            'pt': '🇵🇹 Portugués'
-        }
-        
-        return idiomas.get(lang_code, f"Otro ({lang_code})")
-    except:
-        return "Desconocido"
-
-def reconocer_texto(img_array):
-    """Reconoce texto de una imagen (soporta múltiples líneas)."""
-    print(f"🔍 DEBUG - Iniciando reconocimiento...")
-    print(f"🔍 DEBUG - Shape imagen: {img_array.shape}")
-    print(f"🔍 DEBUG - Min/Max imagen: {np.min(img_array)}/{np.max(img_array)}")
-    print(f"🔍 DEBUG - Dtype: {img_array.dtype}")
-    
-    # Segmentar (devuelve lista de líneas)
-    segmenter = SimpleImageSegmenter()
-    segmenter.debug = True  # Activar debug en segmentador
-    lineas_segmentadas = segmenter.segment_image(img_array)
-    
-    print(f"🔍 DEBUG - Líneas segmentadas: {len(lineas_segmentadas) if lineas_segmentadas else 0}")
-    
-    if not lineas_segmentadas:
-        print("❌ DEBUG - No se detectaron líneas")
-        return None
-    
-    # Procesar cada línea
-    todas_las_lineas = []
-    todas_confidencias = []
-    todos_los_caracteres = []
-    
-    for idx_linea, linea_chars in enumerate(lineas_segmentadas):
-        print(f"🔍 DEBUG - Procesando línea {idx_linea+1}/{len(lineas_segmentadas)} con {len(linea_chars)} caracteres")
-        texto_linea = []
-        confidencias_linea = []
-        
-        for letra_img in linea_chars:
-            # Asegurar 28x28
-            if letra_img.shape != (28, 28):
-                img_pil = Image.fromarray(letra_img.astype(np.uint8))
-                img_pil = img_pil.resize((28, 28), Image.LANCZOS)
-                letra_img = np.array(img_pil)
-            
-            # Invertir colores
-            letra_img = 255 - letra_img
-            
-            # Aplanar y normalizar
-            letra_flat = letra_img.flatten().reshape(1, -1)
-            letra_scaled = scaler.transform(letra_flat)
-            
-            # Predecir
-            pred = model.predict(letra_scaled)[0]
-            proba = model.predict_proba(letra_scaled)[0]
-            
-            letra = label_mapping[pred]
-            pred_idx = np.where(model.classes_ == pred)[0][0]
-            confianza = proba[pred_idx]
-            
-            texto_linea.append(letra)
-            confidencias_linea.append(float(confianza))
-        
-        # Reemplazar 'ESPACIO' por espacio real en la línea
-        texto_linea_final = ''.join([' ' if l == 'ESPACIO' else l for l in texto_linea])
-        todas_las_lineas.append(texto_linea_final)
-        todas_confidencias.extend(confidencias_linea)
-        todos_los_caracteres.extend(texto_linea)
+def reducir_imagen(img_array):
+    """Reduce la imagen antes de segmentar (motor_ocr.reducir_imagen) y lo registra en las métricas."""
+    inicio = time.perf_counter()
+    reducida = motor_ocr.reducir_imagen(img_array)
+    if img_array.size >= config.REDUCIR_DESDE_PIXELES:
+        # Las imágenes pequeñas ni se miran: solo cuenta el tiempo de las que se estiman
+        metricas.ETAPA_SEGUNDOS.observar(time.perf_counter() - inicio, etapa="reduccion")
+    if reducida is not img_array:
+        metricas.PIXELES_AHORRADOS.inc(img_array.size - reducida.size)
+        metricas.IMAGENES_REDUCIDAS.inc()
+    return reducida
+
+def _comprobar_lote(archivos, total):
+    """Lanza 413 si el lote supera los archivos o los bytes descomprimidos permitidos."""
+    if config.MAX_ARCHIVOS_LOTE > 0 and archivos > config.MAX_ARCHIVOS_LOTE:
+        metricas.LOTES_RECHAZADOS.inc(motivo="archivos")
+        raise HTTPException(status_code=413,
+                            detail=f"El lote supera {config.MAX_ARCHIVOS_LOTE} archivos")
+    if config.MAX_BYTES_LOTE > 0 and total > config.MAX_BYTES_LOTE:
+        metricas.LOTES_RECHAZADOS.inc(motivo="bytes")
+        raise HTTPException(status_code=413,
+                            detail=f"El lote supera {config.MAX_BYTES_LOTE} bytes descomprimido")
+
+async def leer_archivos_lote(files):
+    """
+    Lee los archivos de un lote; los .zip se expanden en sus imágenes.
     
-    # Unir líneas con salto de línea
-    texto_final = '\n'.join(todas_las_lineas)
-    confianza_promedio = float(np.mean(todas_confidencias)) if todas_confidencias else 0
+    El número de archivos y los bytes descomprimidos se limitan con
+    config.MAX_ARCHIVOS_LOTE y config.MAX_BYTES_LOTE (413 al superarlos).
+    Cada entrada del zip se lee como mucho hasta el límite restante, porque
+    el tamaño que declara la cabecera del zip puede ser falso.
     
-    print(f"✅ DEBUG - Texto final: '{texto_final}'")
-    print(f"✅ DEBUG - Total caracteres: {len(todos_los_caracteres)}")
-    print(f"✅ DEBUG - Confianza promedio: {confianza_promedio:.2%}")
+    Returns:
+        list: tuplas (filename, contents) en el orden de envío
+    """
+    archivos = []
+    total = 0
+    for file in files:
+        contents = await file.read()
+        if file.filename and file.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(io.BytesIO(contents)) as zf:
+                for info in zf.infolist():
+                    if info.is_dir():
+                        continue
+                    _comprobar_lote(len(archivos) + 1, total + info.file_size)
+                    with zf.open(info) as entrada:
+                        if config.MAX_BYTES_LOTE > 0:
+                            datos = entrada.read(config.MAX_BYTES_LOTE - total + 1)
+                        else:
+                            datos = entrada.read()
+                    total += len(datos)
+                    _comprobar_lote(len(archivos) + 1, total)
+                    archivos.append((f"{file.filename}/{info.filename}", datos))
+        else:
+            total += len(contents)
+            _comprobar_lote(len(archivos) + 1, total)
+            archivos.append((file.filename, contents))
+    return archivos
+
+async def recargar_modelo():
+    """
+    Lee el modelo de disco, lo calienta y lo activa sin detener el servidor.
     
-    # Detectar idioma
-    idioma = detectar_idioma(texto_final)
-    print(f"✅ DEBUG - Idioma detectado: {idioma}")
+    Las peticiones en curso terminan con la versión anterior; si algo falla,
+    la versión anterior sigue activa.
     
-    return {
-        "texto": texto_final,
-        "confianza_promedio": confianza_promedio,
-        "letras": todos_los_caracteres,
-        "confidencias": todas_confidencias,
-        "idioma": idioma
-    }
+    Returns:
+        dict: versión anterior, versión activa y si ha habido cambio
+    """
+    async with bloqueo_recarga:
+        anterior = motor_ocr.version_modelo()
+        try:
+            modelo = await run_in_threadpool(motor_ocr.leer_modelo)
+            if modelo.version == anterior:
+                metricas.RECARGAS_MODELO.inc(resultado="sin_cambios")
+                return {"version_anterior": anterior, "version": anterior, "recargado": False}
+            await run_in_threadpool(motor_ocr.calentar_modelo, modelo)
+            await pool_ocr.recargar(modelo.version)
+        except Exception:
+            metricas.RECARGAS_MODELO.inc(resultado="error")
+            raise
+        motor_ocr.activar_modelo(modelo)
+        metricas.RECARGAS_MODELO.inc(resultado="recargado")
+        logger.info("Modelo recargado: %s -> %s", anterior, modelo.version)
+        return {"version_anterior": anterior, "version": modelo.version, "recargado": True}
+
+def firma_artefactos():
+    """Fecha de modificación y tamaño de los ficheros del modelo."""
+    firma = []
+    for ruta in motor_ocr.rutas_artefactos():
+        try:
+            estado = ruta.stat()
+            firma.append((estado.st_mtime_ns, estado.st_size))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+async def vigilar_modelo(intervalo):
+    """Recarga el modelo cuando cambian sus ficheros en disco."""
+    firma = await run_in_threadpool(firma_artefactos)
+    while True:
+        await asyncio.sleep(intervalo)
+        nueva = await run_in_threadpool(firma_artefactos)
+        if nueva == firma:
+            continue
+        try:
+            await recargar_modelo()
+            firma = nueva
+        except Exception:
+            # Puede que los ficheros aún se estén copiando: se reintenta en la siguiente vuelta
+            logger.exception("No se pudo recargar el modelo; se mantiene la versión %s",
+                             motor_ocr.version_modelo())
+
+async def reconocer_con_cache(img_array):
+    """
+    Reconoce una imagen consultando antes la caché por su contenido.
+    Solo los fallos de caché pasan por el control de admisión.
+    
+    Returns:
+        tuple: (nivel, resultado, turno) con nivel 'memoria', 'disco' o None si
+        se ha calculado, y el turno de la cola (None en los aciertos)
+    """
+    clave = await run_in_threadpool(cache.clave, img_array, motor_ocr.version_modelo())
+    nivel, resultado = await run_in_threadpool(cache.obtener, clave)
+    metricas.CACHE_CONSULTAS.inc(resultado=f"hit_{nivel}" if nivel else "miss")
+    turno = None
+    if nivel is None:
+        async with control_admision.admitir() as turno:
+            resultado = await pool_ocr.reconocer(img_array)
+        await run_in_threadpool(cache.guardar, clave, resultado)
+    return nivel, resultado, turno
+
+def comprobar_perfilado(profile):
+    """Rechaza ?profile=1 si el servidor no se ha arrancado con OCR_PERFILADO."""
+    if profile and not config.PERFILADO:
+        raise HTTPException(status_code=403,
+                            detail="El perfilado está desactivado en el servidor (OCR_PERFILADO=1 o --perfilado)")
+
+async def reconocer_perfilado(img_array, tiempos_previos=None):
+    """
+    Reconoce bajo cProfile (?profile=1). Se ejecuta en un hilo del proceso
+    servidor, sin caché ni micro-lotes aunque haya procesos OCR, para que el
+    perfil vea todo el trabajo; pasa por la cola como cualquier petición.
+    
+    Returns:
+        tuple: (resultado, turno, perfil) con el tiempo de cada etapa en
+        perfil["etapas_ms"], precedido de los de tiempos_previos
+        ({etapa: segundos} medidos antes, como la decodificación)
+    """
+    tiempos = dict(tiempos_previos or {})
+    async with control_admision.admitir() as turno:
+        resultado, perfil = await run_in_threadpool(perfilado.perfilar, motor_ocr.reconocer_texto,
+                                                    img_array, tiempos)
+    perfil["etapas_ms"] = {etapa: round(segundos * 1000, 3) for etapa, segundos in tiempos.items()}
+    return resultado, turno, perfil
+
+def cabeceras_reconocimiento(nivel, turno):
+    """Cabeceras de caché y de tiempos de cola/proceso de una respuesta."""
+    cabeceras = {"X-Cache": "HIT" if nivel else "MISS"}
+    if nivel:
+        cabeceras["X-Cache-Nivel"] = nivel
+    if turno is not None:
+        cabeceras["X-Tiempo-Cola"] = f"{turno.espera:.4f}"
+        cabeceras["X-Tiempo-Proceso"] = f"{turno.proceso:.4f}"
+    return cabeceras
+
+@app.exception_handler(ColaLlena)
+async def cola_llena(request: Request, exc: ColaLlena):
+    """Respuesta rápida cuando la cola de reconocimiento está llena."""
+    return JSONResponse(status_code=503,
+                        content={"detail": "Servidor ocupado, reintenta más tarde",
+                                 "reintentar_en": exc.reintentar_en},
+                        headers={"Retry-After": str(exc.reintentar_en)})
 
 @app.get("/")
 async def root():
@@ -211,7 +408,7 @@ async def root():
     return {
         "mensaje": "API OCR funcionando",
         "version": "1.0.0",
-        "endpoints": ["/upload-image/", "/health"]
+        "endpoints": ["/upload-image/", "/upload-image/stream", "/upload-images/", "/upload-raw/", "/ws/frames", "/health", "/ready", "/metrics", "/admin/recargar-modelo"]
     }
 
 @app.get("/health")
@@ -219,51 +416,111 @@ async def health():
     """Verificar estado de la API."""
     return {
         "status": "ok",
-        "modelo_cargado": model is not None
+        "modelo_cargado": motor_ocr.modelo_activo is not None,
+        "modelo_version": motor_ocr.version_modelo(),
+        "procesos_ocr": config.PROCESOS_OCR,
+        "workers": config.WORKERS,
+        "pid": os.getpid(),
+        "motor": config.MOTOR,
+        "precision": config.PRECISION,
+        "mmap": config.MMAP,
+        "microlote_ms": config.MICROLOTE_MS,
+        "cache": cache.estadisticas() if cache is not None else None,
+        "debug_imagenes": escritor_debug.estadisticas() if escritor_debug is not None else None,
+        "cola": control_admision.estadisticas() if control_admision is not None else None
     }
 
+@app.get("/ready")
+async def ready():
+    """
+    Preparado para recibir tráfico: modelo cargado y calentamiento terminado.
+    Responde 503 mientras tanto (o si el calentamiento ha fallado), para que
+    el balanceador no envíe peticiones a un proceso en frío.
+    """
+    listo = calentamiento["listo"] and motor_ocr.modelo_activo is not None
+    return JSONResponse(status_code=200 if listo else 503, content={
+        **calentamiento,
+        "listo": listo,
+        "modelo_version": motor_ocr.version_modelo(),
+        "pid": os.getpid()
+    })
+
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de exposición de texto de Prometheus."""
+    if resource is not None:
+        # ru_maxrss viene en KiB en Linux
+        metricas.MEMORIA_RSS_MAXIMA.set(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+    return PlainTextResponse(metricas.REGISTRO.exponer(),
+                             media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.post("/admin/recargar-modelo")
+async def admin_recargar_modelo(request: Request):
+    """
+    Recarga los ficheros del modelo (modelo.pkl, scaler.pkl y mapping.txt, o
+    modelo_lineal.npz con el motor lineal) sin reiniciar el servidor.
+    Requiere la cabecera X-Admin-Token si OCR_ADMIN_TOKEN está definido; si no,
+    solo se acepta desde localhost.
+    """
+    if config.ADMIN_TOKEN:
+        autorizado = hmac.compare_digest(request.headers.get("X-Admin-Token", ""), config.ADMIN_TOKEN)
+    else:
+        autorizado = request.client is not None and request.client.host in ("127.0.0.1", "::1")
+    if not autorizado:
+        raise HTTPException(status_code=403, detail="No autorizado")
+    
+    try:
+        return await recargar_modelo()
+    except Exception as e:
+        logger.exception("Error al recargar el modelo")
+        raise HTTPException(status_code=500,
+                            detail=f"No se pudo recargar el modelo ({e}); sigue activa la versión "
+                                   f"{motor_ocr.version_modelo()}")
+
 @app.post("/upload-image/")
-async def upload_image(file: UploadFile = File(...)):
+async def upload_image(request: Request, file: UploadFile = File(...), profile: bool = False):
     """
     Recibe una imagen desde Streamlit y reconoce el texto.
     Endpoint compatible con el patrón de enviarFitxerStreamlit-ServerAPI.py
+    Con ?profile=1 (y OCR_PERFILADO) añade el perfil de la petición.
     """
-    if model is None:
+    if motor_ocr.modelo_activo is None:
         raise HTTPException(status_code=503, detail="Modelo no cargado")
+    comprobar_perfilado(profile)
     
     try:
         # Nombre del archivo
         filename = file.filename
-        print(f"📥 Recibiendo imagen: {filename}")
+        logger.debug("Recibiendo imagen: %s", filename)
         
         # Leer contenido en bytes
         contents = await file.read()
-        print(f"📦 Tamaño: {len(contents)} bytes")
+        logger.debug("Tamaño: %d bytes", len(contents))
         
         # Convertir bytes a imagen PIL en escala de grises
-        img = Image.open(io.BytesIO(contents)).convert('L')
-        img_array = np.array(img)
-        print(f"🖼️  Imagen cargada: {img_array.shape}")
+        inicio = time.perf_counter()
+        img, img_array = await run_in_threadpool(decodificar_imagen, contents)
+        decodificacion = time.perf_counter() - inicio
         
         # Guardar imagen recibida para debug
-        debug_dir = Path(__file__).parent / "debug_images"
-        debug_dir.mkdir(exist_ok=True)
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        debug_path = debug_dir / f"{timestamp}_{filename}"
-        img.save(debug_path)
-        print(f"💾 Imagen guardada en: {debug_path}")
+        escritor_debug.enviar(img, filename)
         
-        # Procesar con el modelo OCR
-        resultado = reconocer_texto(img_array)
+        # Procesar con el modelo OCR (o servir desde la caché)
+        perfil = None
+        if profile:
+            resultado, turno, perfil = await reconocer_perfilado(img_array, {"decodificacion": decodificacion})
+            cabeceras = cabeceras_reconocimiento(None, turno)
+        else:
+            nivel, resultado, turno = await reconocer_con_cache(img_array)
+            cabeceras = cabeceras_reconocimiento(nivel, turno)
         
         if resultado is None:
-            raise HTTPException(status_code=400, detail="No se pudieron detectar letras en la imagen")
+            raise HTTPException(status_code=400, detail="No se pudieron detectar letras en la imagen",
+                                headers=cabeceras)
         
-        print(f"✅ Texto reconocido: {resultado['texto']}")
+        logger.debug("Texto reconocido: %r", resultado['texto'])
         
-        # Retornar JSON con resultados
-        return JSONResponse(content={
+        contenido = {
             "filename": filename,
             "size": len(contents),
             "texto": resultado["texto"],
@@ -271,16 +528,306 @@ async def upload_image(file: UploadFile = File(...)):
             "letras": resultado["letras"],
             "confidencias": resultado["confidencias"],
             "idioma": resultado["idioma"]
-        })
+        }
+        if perfil is not None:
+            contenido["perfil"] = perfil
+        
+        # Retornar los resultados (JSON completo o forma compacta, según Accept)
+        return respuestas.responder(contenido, request.headers.get("accept"), cabeceras)
     
-    except HTTPException:
+    except (HTTPException, ColaLlena):
         raise
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"❌ ERROR: {error_detail}")
+        logger.exception("Error al procesar imagen")
         raise HTTPException(status_code=500, detail=f"Error al procesar imagen: {str(e)}")
 
+def _liberar_una_vez(turno):
+    """Devuelve una función que libera el turno de la cola la primera vez que se llama."""
+    liberado = False
+    
+    def liberar():
+        nonlocal liberado
+        if not liberado:
+            liberado = True
+            control_admision.salir(turno)
+    
+    return liberar
+
+@app.post("/upload-image/stream")
+async def upload_image_stream(request: Request, file: UploadFile = File(...)):
+    """
+    Reconoce una imagen y emite cada línea en cuanto se clasifica.
+    Devuelve NDJSON (un objeto JSON por línea) o, si el cliente envía
+    Accept: text/event-stream, Server-Sent Events. El último registro es
+    un resumen con el texto completo y el idioma.
+    """
+    if motor_ocr.modelo_activo is None:
+        raise HTTPException(status_code=503, detail="Modelo no cargado")
+    
+    try:
+        contents = await file.read()
+        img, img_array = await run_in_threadpool(decodificar_imagen, contents)
+        escritor_debug.enviar(img, file.filename)
+        
+        turno = await control_admision.entrar()
+        liberar = _liberar_una_vez(turno)
+        registros = pool_ocr.reconocer_por_lineas(img_array)
+        
+        async def cerrar():
+            """Cierra el reconocimiento y libera el turno; puede llamarse varias veces."""
+            try:
+                await registros.aclose()
+            finally:
+                liberar()
+        
+        # Esperar a la primera línea para poder responder 400 si no hay letras
+        try:
+            primero = await registros.__anext__()
+        except StopAsyncIteration:
+            await cerrar()
+            raise HTTPException(status_code=400, detail="No se pudieron detectar letras en la imagen")
+        except BaseException:
+            await cerrar()
+            raise
+    except (HTTPException, ColaLlena):
+        raise
+    except Exception as e:
+        logger.exception("Error al procesar imagen")
+        raise HTTPException(status_code=500, detail=f"Error al procesar imagen: {str(e)}")
+    
+    sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    def formatear(registro):
+        datos = json.dumps(registro, ensure_ascii=False)
+        if sse:
+            return f"event: {registro['tipo']}\ndata: {datos}\n\n"
+        return datos + "\n"
+    
+    async def emitir():
+        try:
+            yield formatear(primero)
+            async for registro in registros:
+                yield formatear(registro)
+        finally:
+            await cerrar()
+    
+    # Si el cliente se desconecta, Starlette cancela el envío con emitir()
+    # detenido en un yield y su finally no corre hasta que se recoja el
+    # generador; la tarea de fondo se ejecuta igualmente al acabar la respuesta
+    return StreamingResponse(emitir(), background=BackgroundTask(cerrar),
+                             media_type="text/event-stream" if sse else "application/x-ndjson",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                      "X-Tiempo-Cola": f"{turno.espera:.4f}"})
+
+@app.post("/upload-images/")
+async def upload_images(request: Request, files: List[UploadFile] = File(...)):
+    """
+    Recibe varias imágenes (o archivos .zip con imágenes) en una sola petición.
+    Todas las letras del lote se clasifican con una única llamada al modelo y
+    los resultados se devuelven en el mismo orden de envío.
+    """
+    if motor_ocr.modelo_activo is None:
+        raise HTTPException(status_code=503, detail="Modelo no cargado")
+    
+    try:
+        archivos = await leer_archivos_lote(files)
+    except zipfile.BadZipFile as e:
+        raise HTTPException(status_code=400, detail=f"Archivo zip no válido: {str(e)}")
+    logger.debug("Recibiendo lote de %d imágenes", len(archivos))
+    
+    # Decodificar cada imagen; los errores se informan por archivo
+    resultados = [None] * len(archivos)
+    validas = []
+    for idx, (filename, contents) in enumerate(archivos):
+        try:
+            img, img_array = await run_in_threadpool(decodificar_imagen, contents)
+            escritor_debug.enviar(img, filename)
+            validas.append((idx, img_array))
+        except Exception as e:
+            resultados[idx] = {"filename": filename, "size": len(contents),
+                               "error": f"Error al procesar imagen: {str(e)}"}
+    
+    # Consultar la caché; solo las imágenes no encontradas pasan por el modelo
+    reconocidos = [None] * len(validas)
+    claves = [None] * len(validas)
+    pendientes = []
+    for pos, (_, img_array) in enumerate(validas):
+        claves[pos] = await run_in_threadpool(cache.clave, img_array, motor_ocr.version_modelo())
+        nivel, reconocidos[pos] = await run_in_threadpool(cache.obtener, claves[pos])
+        metricas.CACHE_CONSULTAS.inc(resultado=f"hit_{nivel}" if nivel else "miss")
+        if nivel is None:
+            pendientes.append(pos)
+    
+    turno = None
+    try:
+        if pendientes:
+            async with control_admision.admitir() as turno:
+                nuevos = await pool_ocr.reconocer_lote([validas[pos][1] for pos in pendientes])
+        else:
+            nuevos = []
+    except ColaLlena:
+        raise
+    except Exception as e:
+        logger.exception("Error al procesar lote")
+        raise HTTPException(status_code=500, detail=f"Error al procesar lote: {str(e)}")
+    
+    for pos, resultado in zip(pendientes, nuevos):
+        reconocidos[pos] = resultado
+        await run_in_threadpool(cache.guardar, claves[pos], resultado)
+    
+    for (idx, _), resultado in zip(validas, reconocidos):
+        filename, contents = archivos[idx]
+        if resultado is None:
+            resultados[idx] = {"filename": filename, "size": len(contents),
+                               "error": "No se pudieron detectar letras en la imagen"}
+        else:
+            resultados[idx] = {"filename": filename, "size": len(contents), **resultado}
+    
+    cabeceras = {"X-Cache-Aciertos": str(len(validas) - len(pendientes))}
+    if turno is not None:
+        cabeceras["X-Tiempo-Cola"] = f"{turno.espera:.4f}"
+        cabeceras["X-Tiempo-Proceso"] = f"{turno.proceso:.4f}"
+    return respuestas.responder({"resultados": resultados}, request.headers.get("accept"), cabeceras)
+
+@app.post("/upload-raw/")
+async def upload_raw(request: Request, profile: bool = False):
+    """
+    Recibe una imagen en escala de grises sin codificar (application/octet-stream):
+    alto x ancho bytes uint8 por filas, con las dimensiones en las cabeceras
+    X-Width y X-Height. El cuerpo se usa directamente como array con
+    np.frombuffer, sin decodificar ni copiar. Admite ?profile=1 como /upload-image/.
+    """
+    if motor_ocr.modelo_activo is None:
+        raise HTTPException(status_code=503, detail="Modelo no cargado")
+    comprobar_perfilado(profile)
+    
+    try:
+        ancho = int(request.headers["x-width"])
+        alto = int(request.headers["x-height"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=400, detail="Se requieren las cabeceras X-Width y X-Height (enteros)")
+    if ancho <= 0 or alto <= 0:
+        raise HTTPException(status_code=400, detail="X-Width y X-Height deben ser positivos")
+    
+    contents = await request.body()
+    if len(contents) != ancho * alto:
+        raise HTTPException(status_code=400,
+                            detail=f"El cuerpo tiene {len(contents)} bytes y se esperaban {ancho * alto} ({alto}x{ancho} uint8)")
+    
+    try:
+        img_array = np.frombuffer(contents, dtype=np.uint8).reshape(alto, ancho)
+        metricas.MEMORIA_PICO.observar(len(contents))
+        escritor_debug.enviar(Image.fromarray(img_array), "raw.png")
+        inicio = time.perf_counter()
+        img_array = await run_in_threadpool(reducir_imagen, img_array)
+        reduccion = time.perf_counter() - inicio
+        
+        perfil = None
+        if profile:
+            resultado, turno, perfil = await reconocer_perfilado(img_array, {"reduccion": reduccion})
+            cabeceras = cabeceras_reconocimiento(None, turno)
+        else:
+            nivel, resultado, turno = await reconocer_con_cache(img_array)
+            cabeceras = cabeceras_reconocimiento(nivel, turno)
+        
+        if resultado is None:
+            raise HTTPException(status_code=400, detail="No se pudieron detectar letras en la imagen",
+                                headers=cabeceras)
+        
+        contenido = {"size": len(contents), **resultado}
+        if perfil is not None:
+            contenido["perfil"] = perfil
+        return respuestas.responder(contenido, request.headers.get("accept"), cabeceras)
+    
+    except (HTTPException, ColaLlena):
+        raise
+    except Exception as e:
+        logger.exception("Error al procesar imagen")
+        raise HTTPException(status_code=500, detail=f"Error al procesar imagen: {str(e)}")
+
+@app.websocket("/ws/frames")
+async def ws_frames(websocket: WebSocket):
+    """
+    Reconocimiento continuo de frames (por ejemplo desde el cliente Unity).
+    Cada mensaje binario es un frame codificado (PNG/JPEG). Los frames
+    repetidos se omiten y, si llegan más rápido de lo que se reconocen,
+    solo se procesa el más reciente. Los resultados se envían como JSON
+    en cuanto están listos.
+    """
+    await websocket.accept()
+    if motor_ocr.modelo_activo is None:
+        await websocket.close(code=1013, reason="Modelo no cargado")
+        return
+    
+    filtro = FiltroFrames(config.WS_UMBRAL_DIFERENCIA)
+    pendiente = []  # último frame aceptado aún sin reconocer: (numero, img_array)
+    hay_frame = asyncio.Event()
+    envio = asyncio.Lock()
+    
+    async def enviar(mensaje):
+        async with envio:
+            await websocket.send_json(mensaje)
+    
+    async def reconocer_frames():
+        while True:
+            await hay_frame.wait()
+            hay_frame.clear()
+            numero, img_array = pendiente.pop()
+            try:
+                nivel, resultado, _ = await reconocer_con_cache(img_array)
+            except ColaLlena as e:
+                await enviar({"tipo": "error", "frame": numero, "detalle": str(e),
+                              "reintentar_en": e.reintentar_en})
+                continue
+            except Exception as e:
+                logger.exception("Error al procesar frame %d", numero)
+                await enviar({"tipo": "error", "frame": numero, "detalle": str(e)})
+                continue
+            metricas.WS_FRAMES.inc(resultado="procesado")
+            mensaje = {"tipo": "resultado" if resultado is not None else "sin_texto",
+                       "frame": numero, "cache": nivel or "miss",
+                       "modelo_version": motor_ocr.version_modelo()}
+            if resultado is not None:
+                mensaje.update(resultado)
+            mensaje["conexion"] = filtro.estadisticas()
+            await enviar(mensaje)
+    
+    tarea = asyncio.create_task(reconocer_frames())
+    try:
+        while True:
+            mensaje = await websocket.receive()
+            if mensaje["type"] == "websocket.disconnect":
+                break
+            contents = mensaje.get("bytes")
+            if contents is None:
+                await enviar({"tipo": "error", "detalle": "Se esperaba un frame binario (PNG/JPEG)"})
+                continue
+            
+            if filtro.es_repetido_por_hash(contents):
+                metricas.WS_FRAMES.inc(resultado="omitido")
+                continue
+            numero = filtro.recibidos
+            try:
+                img, img_array = await run_in_threadpool(decodificar_imagen, contents)
+            except Exception as e:
+                await enviar({"tipo": "error", "frame": numero, "detalle": f"Error al decodificar frame: {str(e)}"})
+                continue
+            if await run_in_threadpool(filtro.es_repetido_por_contenido, img):
+                metricas.WS_FRAMES.inc(resultado="omitido")
+                continue
+            
+            # Sustituir el frame pendiente por el más reciente
+            if pendiente:
+                pendiente.clear()
+                filtro.reemplazados += 1
+                metricas.WS_FRAMES.inc(resultado="reemplazado")
+            pendiente.append((numero, img_array))
+            hay_frame.set()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tarea.cancel()
+
 if __name__ == "__main__":
     import uvicorn
     import argparse
@@ -291,7 +838,32 @@ if __name__ == "__main__":
                         help='Ejecutar en la red local (accesible desde otros dispositivos)')
     parser.add_argument('--https', action='store_true',
                         help='Habilitar HTTPS (requiere cert.pem y key.pem)')
+    parser.add_argument('--procesos', type=int, default=config.PROCESOS_OCR,
+                        help='Procesos de reconocimiento en paralelo (0 = un hilo del servidor)')
+    parser.add_argument('--motor', choices=['sklearn', 'lineal'], default=config.MOTOR,
+                        help='Motor de clasificación (lineal = modelo_lineal.npz exportado)')
+    parser.add_argument('--precision', choices=['float32', 'float16', 'int8'], default=config.PRECISION,
+                        help='Precisión de los pesos del motor lineal')
+    parser.add_argument('--mmap', action='store_true', default=config.MMAP,
+                        help='Motor lineal desde models/modelo_lineal/ proyectado en memoria')
+    parser.add_argument('--workers', type=int, default=config.WORKERS,
+                        help='Procesos servidor creados con fork tras cargar el modelo (producción)')
+    parser.add_argument('--hilos-blas', type=int, default=config.HILOS_BLAS,
+                        help='Hilos de BLAS por proceso servidor (0 = núcleos / workers)')
+    parser.add_argument('--perfilado', action='store_true', default=config.PERFILADO,
+                        help='Permitir ?profile=1 para perfilar peticiones con cProfile')
     args = parser.parse_args()
+    config.PROCESOS_OCR = args.procesos
+    config.MOTOR = args.motor
+    config.PRECISION = args.precision
+    config.MMAP = args.mmap
+    config.WORKERS = args.workers
+    config.HILOS_BLAS = args.hilos_blas
+    config.PERFILADO = args.perfilado
+    
+    if config.WORKERS > 1 and not hasattr(os, "fork"):
+        print("[ERROR] --workers necesita fork (Linux o macOS); usa --procesos en su lugar")
+        sys.exit(1)
     
     # Determinar host según el argumento
     if args.global_access:
@@ -353,4 +925,13 @@ if __name__ == "__main__":
     elif protocol == "http":
         print(f"\n Para usar HTTPS, ejecuta: python main.py -g --https")
     
-    uvicorn.run(app, host=host, port=8000, ssl_keyfile=ssl_keyfile, ssl_certfile=ssl_certfile)
+    if config.WORKERS > 1:
+        import servidor
+        print(f"\n {config.WORKERS} procesos servidor (modelo cargado antes del fork)")
+        servidor.ejecutar(app, config.WORKERS, host, 8000, config.HILOS_BLAS,
+                          ssl_keyfile=ssl_keyfile, ssl_certfile=ssl_certfile)
+    else:
+        if config.HILOS_BLAS > 0:
+            import servidor
+            servidor.limitar_hilos_blas(config.HILOS_BLAS)
+        uvicorn.run(app, host=host, port=8000, ssl_keyfile=ssl_keyfile, ssl_certfile=ssl_certfile)
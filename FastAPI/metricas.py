@@ -0,0 +1,282 @@
+"""
+Métricas del servicio en formato de exposición de texto de Prometheus.
+
+Implementación mínima (contadores, medidores e histogramas con etiquetas)
+para no añadir dependencias. Cada proceso de uvicorn expone sus propias
+métricas; los tiempos medidos en los procesos de reconocimiento se envían
+de vuelta al proceso principal y se registran aquí.
+"""
+import math
+import threading
+
+
+def _formatear_etiquetas(nombres, valores, extra=None):
+    """Convierte etiquetas a la forma {a="x",b="y"}."""
+    pares = [(n, v) for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    if not pares:
+        return ""
+    texto = ",".join(
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in pares
+    )
+    return "{" + texto + "}"
+
+
+def _formatear_valor(valor):
+    """Formato numérico de la exposición de texto."""
+    if valor == math.inf:
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    """Base común: nombre, ayuda, etiquetas y series por combinación de etiquetas."""
+    
+    tipo = None
+    
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.series = {}
+        self.lock = threading.Lock()
+    
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.etiquetas):
+            raise ValueError(f"{self.nombre} espera las etiquetas {self.etiquetas}")
+        return tuple(str(etiquetas[n]) for n in self.etiquetas)
+    
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        with self.lock:
+            for valores, serie in sorted(self.series.items()):
+                lineas.extend(self._exponer_serie(valores, serie))
+        return lineas
+
+
+class Contador(_Metrica):
+    """Valor que solo aumenta."""
+    
+    tipo = "counter"
+    
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self.lock:
+            self.series[clave] = self.series.get(clave, 0) + cantidad
+    
+    def _exponer_serie(self, valores, valor):
+        return [f"{self.nombre}{_formatear_etiquetas(self.etiquetas, valores)} {_formatear_valor(valor)}"]
+
+
+class Medidor(_Metrica):
+    """Valor que puede subir y bajar."""
+    
+    tipo = "gauge"
+    
+    def set(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self.lock:
+            self.series[clave] = valor
+    
+    def inc(self, cantidad=1, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self.lock:
+            self.series[clave] = self.series.get(clave, 0) + cantidad
+    
+    def dec(self, cantidad=1, **etiquetas):
+        self.inc(-cantidad, **etiquetas)
+    
+    def _exponer_serie(self, valores, valor):
+        return [f"{self.nombre}{_formatear_etiquetas(self.etiquetas, valores)} {_formatear_valor(valor)}"]
+
+
+class Histograma(_Metrica):
+    """Distribución de valores en cubos acumulados."""
+    
+    tipo = "histogram"
+    
+    def __init__(self, nombre, ayuda, etiquetas=(), cubos=None):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.cubos = tuple(sorted(cubos)) + (math.inf,)
+    
+    def observar(self, valor, **etiquetas):
+        clave = self._clave(etiquetas)
+        with self.lock:
+            serie = self.series.get(clave)
+            if serie is None:
+                serie = self.series[clave] = {"cubos": [0] * len(self.cubos), "suma": 0.0, "cuenta": 0}
+            for i, limite in enumerate(self.cubos):
+                if valor <= limite:
+                    serie["cubos"][i] += 1
+                    break
+            serie["suma"] += valor
+            serie["cuenta"] += 1
+    
+    def _exponer_serie(self, valores, serie):
+        lineas = []
+        acumulado = 0
+        for limite, cuenta in zip(self.cubos, serie["cubos"]):
+            acumulado += cuenta
+            etiquetas = _formatear_etiquetas(self.etiquetas, valores, ("le", _formatear_valor(limite)))
+            lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+        etiquetas = _formatear_etiquetas(self.etiquetas, valores)
+        lineas.append(f"{self.nombre}_sum{etiquetas} {_formatear_valor(serie['suma'])}")
+        lineas.append(f"{self.nombre}_count{etiquetas} {serie['cuenta']}")
+        return lineas
+
+
+class Registro:
+    """Conjunto de métricas expuestas en /metrics."""
+    
+    def __init__(self):
+        self.metricas = []
+    
+    def _agregar(self, metrica):
+        self.metricas.append(metrica)
+        return metrica
+    
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Contador(nombre, ayuda, etiquetas))
+    
+    def medidor(self, nombre, ayuda, etiquetas=()):
+        return self._agregar(Medidor(nombre, ayuda, etiquetas))
+    
+    def histograma(self, nombre, ayuda, etiquetas=(), cubos=None):
+        return self._agregar(Histograma(nombre, ayuda, etiquetas, cubos))
+    
+    def exponer(self):
+        """Texto completo en formato de exposición."""
+        lineas = []
+        for metrica in self.metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+# Cubos de latencia en segundos (de 0,5 ms a 30 s)
+CUBOS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REGISTRO = Registro()
+
+ETAPA_SEGUNDOS = REGISTRO.histograma(
+    "ocr_etapa_segundos",
+    "Tiempo de cada etapa del reconocimiento por petición",
+    etiquetas=("etapa",), cubos=CUBOS_SEGUNDOS)
+
+PETICION_SEGUNDOS = REGISTRO.histograma(
+    "ocr_peticion_segundos",
+    "Tiempo total de cada petición HTTP",
+    etiquetas=("ruta", "codigo"), cubos=CUBOS_SEGUNDOS)
+
+CARACTERES_POR_PETICION = REGISTRO.histograma(
+    "ocr_caracteres_por_peticion",
+    "Caracteres clasificados por imagen",
+    cubos=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+
+CARACTERES_TOTAL = REGISTRO.contador(
+    "ocr_caracteres_total",
+    "Caracteres clasificados desde el arranque")
+
+EN_COLA = REGISTRO.medidor(
+    "ocr_reconocimientos_en_curso",
+    "Reconocimientos enviados al ejecutor que aún no han terminado")
+EN_COLA.set(0)
+
+CACHE_CONSULTAS = REGISTRO.contador(
+    "ocr_cache_consultas_total",
+    "Consultas a la caché de resultados",
+    etiquetas=("resultado",))
+
+WS_FRAMES = REGISTRO.contador(
+    "ocr_ws_frames_total",
+    "Frames recibidos por WebSocket según su destino",
+    etiquetas=("resultado",))
+
+ADMITIDAS = REGISTRO.medidor(
+    "ocr_cola_admitidas",
+    "Peticiones admitidas en la cola de reconocimiento (esperando o en ejecución)")
+ADMITIDAS.set(0)
+
+RECHAZOS = REGISTRO.contador(
+    "ocr_cola_rechazos_total",
+    "Peticiones rechazadas con 503 por cola llena")
+
+ESPERA_COLA = REGISTRO.histograma(
+    "ocr_cola_espera_segundos",
+    "Tiempo de espera en cola antes de empezar el reconocimiento",
+    cubos=CUBOS_SEGUNDOS)
+
+PROCESO = REGISTRO.histograma(
+    "ocr_proceso_segundos",
+    "Tiempo de reconocimiento una vez admitida la petición (sin la espera en cola)",
+    cubos=CUBOS_SEGUNDOS)
+
+MICROLOTE_GLIFOS = REGISTRO.histograma(
+    "ocr_microlote_glifos",
+    "Caracteres clasificados en cada micro-lote",
+    cubos=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+
+MICROLOTE_PETICIONES = REGISTRO.histograma(
+    "ocr_microlote_peticiones",
+    "Peticiones agrupadas en cada micro-lote",
+    cubos=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32, 64))
+
+MICROLOTE_ESPERA = REGISTRO.histograma(
+    "ocr_microlote_espera_segundos",
+    "Espera de cada petición hasta que su micro-lote se envía al modelo",
+    cubos=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.25))
+
+IMAGENES_REDUCIDAS = REGISTRO.contador(
+    "ocr_imagenes_reducidas_total",
+    "Imágenes reducidas antes de segmentar porque el texto era mucho mayor de lo necesario")
+
+PIXELES_AHORRADOS = REGISTRO.contador(
+    "ocr_pixeles_ahorrados_total",
+    "Píxeles que no llegan a segmentarse gracias a la reducción previa")
+
+JPEG_DRAFT = REGISTRO.contador(
+    "ocr_jpeg_draft_total",
+    "JPEG grandes decodificados directamente en gris por escala (modo draft)",
+    etiquetas=("escala",))
+
+MEMORIA_PICO = REGISTRO.histograma(
+    "ocr_memoria_pico_bytes",
+    "Memoria máxima estimada de cada imagen al decodificarla: cuerpo, imagen decodificada y copias en gris",
+    cubos=tuple(2 ** n for n in range(16, 29, 2)))
+
+MEMORIA_RSS_MAXIMA = REGISTRO.medidor(
+    "ocr_memoria_rss_maxima_bytes",
+    "Memoria residente máxima del proceso desde el arranque")
+
+CUERPOS_RECHAZADOS = REGISTRO.contador(
+    "ocr_cuerpos_rechazados_total",
+    "Peticiones rechazadas con 413 por superar config.MAX_BYTES_PETICION")
+
+LOTES_RECHAZADOS = REGISTRO.contador(
+    "ocr_lotes_rechazados_total",
+    "Lotes de /upload-images/ rechazados con 413 por superar config.MAX_ARCHIVOS_LOTE "
+    "o config.MAX_BYTES_LOTE",
+    etiquetas=("motivo",))
+
+RESPUESTAS = REGISTRO.contador(
+    "ocr_respuestas_total",
+    "Respuestas de reconocimiento por tipo negociado con la cabecera Accept",
+    etiquetas=("tipo",))
+
+PROCESOS_REPUESTOS = REGISTRO.contador(
+    "ocr_procesos_repuestos_total",
+    "Veces que se han vuelto a crear los procesos de reconocimiento porque uno murió")
+
+RECARGAS_MODELO = REGISTRO.contador(
+    "ocr_recargas_modelo_total",
+    "Recargas del modelo por resultado (recargado, sin_cambios, error)",
+    etiquetas=("resultado",))
+
+
+def observar_etapas(tiempos):
+    """Registra un diccionario {etapa: segundos} en el histograma de etapas."""
+    for etapa, segundos in tiempos.items():
+        ETAPA_SEGUNDOS.observar(segundos, etapa=etapa)
@@ -0,0 +1,104 @@
+"""
+Micro-lotes de clasificación entre peticiones concurrentes.
+
+Las peticiones entregan su matriz de caracteres (N, 784) al planificador,
+que las acumula durante una ventana corta o hasta alcanzar un máximo de
+caracteres, las clasifica con una única llamada al modelo y devuelve a cada
+petición su parte de las predicciones.
+"""
+import asyncio
+import functools
+import logging
+import time
+
+import numpy as np
+
+import metricas
+
+logger = logging.getLogger("ocr.microlotes")
+
+
+class PlanificadorLotes:
+    """Agrupa matrices de caracteres de varias peticiones en una sola clasificación."""
+    
+    def __init__(self, ventana_s, max_glifos, clasificar):
+        """
+        Args:
+            ventana_s: tiempo máximo que espera la primera petición de un lote
+            max_glifos: caracteres a partir de los cuales el lote se envía sin esperar
+            clasificar: corrutina que recibe X (N, 784) y devuelve (letras, confidencias)
+        """
+        self.ventana_s = ventana_s
+        self.max_glifos = max_glifos
+        self.clasificar_lote = clasificar
+        self.pendientes = []  # (X, future, llegada)
+        self.glifos_pendientes = 0
+        self.temporizador = None
+        # El bucle de eventos solo guarda referencias débiles a las tareas: sin
+        # este conjunto una clasificación en curso podría recogerse como basura
+        self.tareas = set()
+    
+    async def clasificar(self, X):
+        """Clasifica X junto con las matrices de otras peticiones concurrentes."""
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        self.pendientes.append((X, futuro, time.perf_counter()))
+        self.glifos_pendientes += len(X)
+        
+        if self.glifos_pendientes >= self.max_glifos:
+            self._despachar()
+        elif self.temporizador is None:
+            self.temporizador = loop.call_later(self.ventana_s, self._despachar)
+        
+        return await futuro
+    
+    def _despachar(self):
+        """Cierra el lote actual y lanza su clasificación."""
+        if self.temporizador is not None:
+            self.temporizador.cancel()
+            self.temporizador = None
+        lote, self.pendientes, self.glifos_pendientes = self.pendientes, [], 0
+        if lote:
+            tarea = asyncio.ensure_future(self._ejecutar(lote))
+            self.tareas.add(tarea)
+            tarea.add_done_callback(functools.partial(self._terminar, lote))
+    
+    def _terminar(self, lote, tarea):
+        """
+        Al acabar la tarea de un lote, termina con error las peticiones que no
+        tengan resultado. Solo pasa si la tarea se canceló (por ejemplo, al
+        apagar el servidor), incluso antes de empezar: ningún try dentro de
+        _ejecutar cubriría ese caso.
+        """
+        self.tareas.discard(tarea)
+        self._fallar(lote, RuntimeError("Se canceló la clasificación del micro-lote"))
+    
+    async def _ejecutar(self, lote):
+        """Clasifica un lote y reparte las predicciones entre sus peticiones."""
+        try:
+            ahora = time.perf_counter()
+            X = np.concatenate([X_peticion for X_peticion, _, _ in lote])
+            metricas.MICROLOTE_GLIFOS.observar(len(X))
+            metricas.MICROLOTE_PETICIONES.observar(len(lote))
+            for _, _, llegada in lote:
+                metricas.MICROLOTE_ESPERA.observar(ahora - llegada)
+            logger.debug("Micro-lote de %d caracteres de %d peticiones", len(X), len(lote))
+            
+            letras, confidencias = await self.clasificar_lote(X)
+        except Exception as e:
+            self._fallar(lote, e)
+            return
+        
+        inicio = 0
+        for X_peticion, futuro, _ in lote:
+            fin = inicio + len(X_peticion)
+            if not futuro.done():
+                futuro.set_result((letras[inicio:fin], confidencias[inicio:fin]))
+            inicio = fin
+    
+    @staticmethod
+    def _fallar(lote, error):
+        """Termina con error los futuros del lote que siguen pendientes."""
+        for _, futuro, _ in lote:
+            if not futuro.done():
+                futuro.set_exception(error)
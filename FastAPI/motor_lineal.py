@@ -0,0 +1,375 @@
+"""
+Motor de inferencia lineal para los modelos entrenados en fase2.
+
+El SVC lineal con probability=True decide con k(k-1)/2 clasificadores
+uno-contra-uno y calibra con Platt + acoplamiento por pares. Como el núcleo es
+lineal, los k(k-1)/2 hiperplanos caben en una matriz densa W (784, P) en la que
+se pliegan también la media y la escala del StandardScaler, así que la
+decisión de todos los pares es una sola multiplicación float32 sobre los
+píxeles en crudo. El acoplamiento se resuelve como el sistema lineal cuya
+solución aproxima iterativamente libsvm, en float32 y por bloques pequeños
+para que cada bloque quepa en caché.
+
+Los pesos pueden guardarse en memoria en float16 o en int8 (cuantizar()),
+de modo que W ocupa la mitad o la cuarta parte. En float16 hay una escala
+por columna (clase o par) y cada bloque de columnas se pasa a float32 justo
+antes de multiplicar: solo se comprimen los pesos guardados. En int8 los
+píxeles se reparten en grupos según el tamaño de sus pesos y cada grupo
+tiene una escala por columna; los caracteres siguen en uint8, la suma de
+cada grupo es un entero exacto y la escala se aplica una vez por grupo.
+numpy no multiplica enteros con BLAS (su producto int32 es ~150 veces más
+lento), así que esa suma entera se calcula con una multiplicación float32,
+que es exacta porque ningún resultado parcial pasa de 2^24. Ninguna de las
+dos precisiones es más rápida que float32 en numpy.
+
+La clase de predict() es la de sklearn: en el SVC, la más votada por los
+pares (no el argmax de las probabilidades, que en caracteres reales difiere
+en torno al 10 % de los casos); en el resto, la de mayor decisión.
+
+Los modelos uno-contra-resto (LogisticRegression y SGDClassifier con pérdida
+logística) se exportan igual, con una columna por clase, y sus
+probabilidades son un softmax o sigmoides normalizadas, como en sklearn.
+
+El artefacto es un .npz generado con exportar() (ver
+modelo/fase2_entrenamiento/exportar_modelo.py) o un directorio con un .npy
+por array (guardar_directorio()), que se abre con mmap para que todos los
+procesos compartan la misma copia de los pesos en la caché de páginas.
+"""
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# Probabilidad mínima por par, igual que libsvm
+PROB_MINIMA = 1e-7
+
+# Filas por bloque al acoplar: cada fila necesita una matriz k x k en float32
+# (32 filas con 91 clases son ~1 MB)
+FILAS_POR_BLOQUE = 32
+
+
+# Tipos de artefacto
+TIPOS = ("svc_ovo", "softmax", "ovr")
+
+# Precisión de los pesos en memoria
+PRECISIONES = ("float32", "float16", "int8")
+
+# Columnas de W reducidas que se pasan a float32 de una vez (784 x 512 float32 = 1,5 MB)
+COLUMNAS_POR_BLOQUE = 512
+
+# Grupos de píxeles en int8 (98 píxeles cada uno con 784). Con una sola escala
+# por columna los píxeles del borde, casi siempre en blanco y con pesos
+# enormes con el scaler plegado, dejan sin resolución al resto
+GRUPOS_INT8 = 8
+
+# Límite de píxeles por grupo: 518 x 255 x 127 < 2^24, así que en float32 cada
+# producto y cada suma parcial de un grupo es un entero exacto
+MAX_PIXELES_GRUPO = 518
+
+
+def cuantizar(W, precision):
+    """
+    Reduce la precisión de los pesos.
+    
+    En float16 cada columna (clase o par) se escala por su máximo absoluto.
+    En int8 los píxeles se ordenan por el máximo absoluto de sus pesos y se
+    reparten en GRUPOS_INT8 grupos consecutivos; cada grupo tiene su escala
+    por columna. La entrada no se reescala, así que en int8 la suma de cada
+    grupo se puede hacer en enteros.
+    
+    Returns:
+        tuple: (pesos, escalas, orden). En float16 W ≈ pesos · diag(escalas[0]);
+        en int8, con los píxeles en el orden de orden, las filas del grupo g
+        de W ≈ las de pesos · diag(escalas[g]). escalas y orden son None en
+        float32 y orden es None en float16
+    """
+    if precision == "float32":
+        return np.ascontiguousarray(W, dtype=np.float32), None, None
+    if precision not in PRECISIONES:
+        raise ValueError(f"Precisión desconocida: {precision} (usa {', '.join(PRECISIONES)})")
+    
+    W = np.asarray(W, dtype=np.float64)
+    if precision == "float16":
+        escala = np.abs(W).max(axis=0)
+        escala[escala == 0] = 1
+        return np.ascontiguousarray((W / escala).astype(np.float16)), escala[None].astype(np.float32), None
+    
+    orden = np.argsort(np.abs(W).max(axis=1), kind="stable")
+    W = W[orden]
+    pesos = np.empty(W.shape, dtype=np.int8)
+    escalas = np.empty((GRUPOS_INT8, W.shape[1]), dtype=np.float64)
+    for g, grupo in enumerate(np.array_split(np.arange(len(W)), GRUPOS_INT8)):
+        escala = np.abs(W[grupo]).max(axis=0) / 127
+        escala[escala == 0] = 1
+        pesos[grupo] = np.clip(np.round(W[grupo] / escala), -127, 127)
+        escalas[g] = escala
+    return np.ascontiguousarray(pesos), escalas.astype(np.float32), orden
+
+
+def _plegar_scaler(coef, intercept, scaler):
+    """
+    Incluye media y escala del StandardScaler en los pesos.
+    
+    coef · (x - media) / escala + b  ==  (coef / escala) · x + (b - coef · media / escala)
+    """
+    coef = np.asarray(coef, dtype=np.float64)
+    media = np.asarray(scaler.mean_, dtype=np.float64)
+    escala = np.asarray(scaler.scale_, dtype=np.float64)
+    W = (coef / escala).T
+    b = np.asarray(intercept, dtype=np.float64) - coef @ (media / escala)
+    return np.ascontiguousarray(W, dtype=np.float32), b.astype(np.float32)
+
+
+def exportar(model, scaler):
+    """
+    Convierte un modelo lineal de fase2 y su StandardScaler en matrices densas.
+    
+    Acepta SVC(kernel='linear', probability=True), LogisticRegression
+    multinomial y SGDClassifier(loss='log_loss').
+    
+    Returns:
+        dict: arrays listos para np.savez
+    """
+    nombre = type(model).__name__
+    if nombre == "SVC":
+        return exportar_svc(model, scaler)
+    
+    if nombre == "LogisticRegression":
+        tipo = "softmax"
+    elif nombre == "SGDClassifier" and model.loss == "log_loss":
+        tipo = "ovr"
+    else:
+        raise ValueError(f"Modelo no exportable: {model!r}")
+    if model.coef_.shape[0] != len(model.classes_):
+        raise ValueError("Solo se exportan modelos con más de dos clases")
+    
+    W, b = _plegar_scaler(model.coef_, model.intercept_, scaler)
+    return {"tipo": np.array(tipo), "W": W, "b": b, "clases": np.asarray(model.classes_)}
+
+
+def exportar_svc(model, scaler):
+    """
+    Convierte un SVC lineal (uno-contra-uno) y su StandardScaler en matrices densas.
+    
+    Returns:
+        dict: arrays listos para np.savez
+    """
+    if getattr(model, "kernel", None) != "linear":
+        raise ValueError("Solo se puede exportar un SVC con kernel='linear'")
+    if not getattr(model, "probability", False):
+        raise ValueError("El SVC debe estar entrenado con probability=True")
+    
+    W, b = _plegar_scaler(model.coef_, model.intercept_, scaler)
+    return {
+        "tipo": np.array("svc_ovo"),
+        "W": W,
+        "b": b,
+        "probA": np.asarray(model.probA_, dtype=np.float32),
+        "probB": np.asarray(model.probB_, dtype=np.float32),
+        "clases": np.asarray(model.classes_),
+    }
+
+
+def guardar_directorio(arrays, ruta):
+    """
+    Guarda los arrays como ruta/<nombre>.npy.
+    
+    Se escribe en un directorio temporal que después sustituye al anterior:
+    los procesos que aún tienen proyectados los ficheros viejos siguen
+    leyéndolos sin problemas, cosa que no pasaría si se sobrescribieran.
+    """
+    ruta = Path(ruta)
+    temporal = ruta.with_name(ruta.name + ".tmp")
+    anterior = ruta.with_name(ruta.name + ".old")
+    shutil.rmtree(temporal, ignore_errors=True)
+    temporal.mkdir(parents=True)
+    for nombre, array in arrays.items():
+        np.save(temporal / f"{nombre}.npy", np.asarray(array), allow_pickle=False)
+    
+    shutil.rmtree(anterior, ignore_errors=True)
+    if ruta.exists():
+        os.rename(ruta, anterior)
+    os.rename(temporal, ruta)
+    shutil.rmtree(anterior, ignore_errors=True)
+
+
+def abrir_directorio(ruta):
+    """Abre un directorio de guardar_directorio() con mmap (solo lectura). Devuelve {nombre: array}."""
+    return {fichero.stem: np.load(fichero, mmap_mode="r", allow_pickle=False)
+            for fichero in sorted(Path(ruta).glob("*.npy"))}
+
+
+class MotorLineal:
+    """Clasificador con la misma interfaz que usa el servidor de un estimador de sklearn."""
+    
+    def __init__(self, tipo, W, b, clases, probA=None, probB=None, precision="float32"):
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de modelo lineal no soportado: {tipo}")
+        self.tipo = tipo
+        self.precision = precision
+        pesos, self.escalas, self.orden = cuantizar(W, precision)
+        if precision != "float16":
+            # En int8 cada grupo de píxeles es un bloque contiguo de filas
+            self.W = pesos
+        else:
+            # Traspuesta (P, 784): cada bloque de columnas de W es contiguo y se
+            # convierte a float32 sin recorrer la matriz entera con saltos
+            self.W = np.ascontiguousarray(pesos.T)
+        if precision == "int8":
+            # Límites de cada grupo de píxeles en el orden de self.orden
+            limites = np.cumsum([0] + [len(g) for g in np.array_split(self.orden, GRUPOS_INT8)])
+            self.grupos = list(zip(limites[:-1], limites[1:]))
+            if max(fin - inicio for inicio, fin in self.grupos) > MAX_PIXELES_GRUPO:
+                raise ValueError(f"Grupos de más de {MAX_PIXELES_GRUPO} píxeles: la suma en float32 no sería exacta")
+        self.b = np.asarray(b, dtype=np.float32)
+        self.classes_ = np.asarray(clases)
+        
+        k = len(self.classes_)
+        columnas = np.shape(W)[1]
+        if tipo == "svc_ovo":
+            if columnas != k * (k - 1) // 2:
+                raise ValueError(f"W tiene {columnas} columnas; se esperaban {k * (k - 1) // 2} pares")
+            self.probA = np.asarray(probA, dtype=np.float32)
+            self.probB = np.asarray(probB, dtype=np.float32)
+            # Pares (i, j) con i < j en el orden de libsvm
+            self.pares_i, self.pares_j = np.triu_indices(k, 1)
+            # Votos de cada par: decisión > 0 vota a i y si no a j, así que
+            # votos = (decisión > 0) @ (E_i - E_j) + votos que recibiría cada j
+            pares = np.arange(len(self.pares_i))
+            self.votos_pares = np.zeros((len(pares), k), dtype=np.float32)
+            self.votos_pares[pares, self.pares_i] = 1
+            self.votos_pares[pares, self.pares_j] = -1
+            self.votos_base = np.bincount(self.pares_j, minlength=k).astype(np.float32)
+        elif columnas != k:
+            raise ValueError(f"W tiene {columnas} columnas; se esperaban {k} clases")
+    
+    @classmethod
+    def desde_arrays(cls, arrays, precision="float32"):
+        """Crea el motor a partir del diccionario de exportar() o de un .npz abierto."""
+        opcionales = {nombre: arrays[nombre] for nombre in ("probA", "probB") if nombre in arrays}
+        return cls(str(arrays["tipo"]), arrays["W"], arrays["b"], arrays["clases"],
+                   precision=precision, **opcionales)
+    
+    @classmethod
+    def cargar(cls, ruta, precision="float32"):
+        """
+        Carga un artefacto .npz generado con exportar() o un directorio de
+        guardar_directorio(). En float32 los pesos del directorio no se copian:
+        se quedan proyectados desde disco.
+        """
+        if isinstance(ruta, (str, os.PathLike)) and Path(ruta).is_dir():
+            return cls.desde_arrays(abrir_directorio(ruta), precision)
+        with np.load(ruta, allow_pickle=False) as datos:
+            return cls.desde_arrays(datos, precision)
+    
+    @property
+    def bytes_pesos(self):
+        """Memoria ocupada por W (y sus escalas)."""
+        extra = (self.escalas, self.orden)
+        return self.W.nbytes + sum(array.nbytes for array in extra if array is not None)
+    
+    def decision(self, X):
+        """Valores de decisión (N, columnas de W) para píxeles en crudo (N, 784) uint8."""
+        if self.precision == "float32":
+            return np.asarray(X, dtype=np.float32) @ self.W + self.b
+        if self.precision == "int8":
+            return self._decision_int8(X)
+        
+        # float16: los pesos se pasan a float32 por bloques de columnas, así
+        # que nunca hay una copia float32 completa de W
+        X = np.asarray(X, dtype=np.float32)
+        decision = np.empty((len(X), self.W.shape[0]), dtype=np.float32)
+        for inicio in range(0, self.W.shape[0], COLUMNAS_POR_BLOQUE):
+            fin = inicio + COLUMNAS_POR_BLOQUE
+            decision[:, inicio:fin] = X @ self.W[inicio:fin].astype(np.float32).T
+        decision *= self.escalas[0]
+        decision += self.b
+        return decision
+    
+    def _decision_int8(self, X):
+        """
+        Decisión con pesos int8: por cada grupo de píxeles, la suma entera
+        X_g · W_g por su escala.
+        
+        X_g (uint8) y W_g (int8) se multiplican en float32, donde con
+        MAX_PIXELES_GRUPO píxeles como mucho el resultado es el entero exacto,
+        el mismo que daría acumular en int32.
+        """
+        X = np.asarray(X)
+        if X.dtype != np.uint8:
+            raise ValueError(f"Con pesos int8 la entrada debe ser uint8, no {X.dtype}")
+        X = X[:, self.orden]
+        decision = np.empty((len(X), self.W.shape[1]), dtype=np.float32)
+        decision[:] = self.b
+        for g, (inicio, fin) in enumerate(self.grupos):
+            # Un grupo de pesos en float32 ocupa 98 x P x 4 bytes (1,6 MB con 4095 pares)
+            enteros = X[:, inicio:fin].astype(np.float32) @ self.W[inicio:fin].astype(np.float32)
+            enteros *= self.escalas[g]
+            decision += enteros
+        return decision
+    
+    def predict(self, X):
+        """Clase de cada fila, igual que predict() del estimador de sklearn."""
+        return self._clases(self.decision(X))
+    
+    def predict_proba(self, X):
+        """Probabilidades por clase (N, k), en el orden de classes_."""
+        return self._probabilidades(self.decision(X))
+    
+    def clasificar(self, X):
+        """(predict(X), predict_proba(X)) con una sola multiplicación por W."""
+        decision = self.decision(X)
+        return self._clases(decision), self._probabilidades(decision)
+    
+    def _clases(self, decision):
+        if self.tipo == "svc_ovo":
+            # Uno-contra-uno de libsvm: gana la más votada y, si empatan, la primera
+            decision = (decision > 0).astype(np.float32) @ self.votos_pares + self.votos_base
+        return self.classes_[decision.argmax(axis=1)]
+    
+    def _probabilidades(self, decision):
+        """Probabilidades a partir de la decisión (que se modifica)."""
+        if self.tipo == "softmax":
+            decision -= decision.max(axis=1, keepdims=True)
+            proba = np.exp(decision, out=decision)
+        elif self.tipo == "ovr":
+            # Sigmoides normalizadas, en float64 como sklearn (en float32 se
+            # saturan a 1 antes y cambian los empates) y en escala logarítmica
+            # para que no se anulen todas cuando ninguna clase tiene decisión positiva
+            log_sigmoide = -np.logaddexp(0, -decision.astype(np.float64))
+            log_sigmoide -= log_sigmoide.max(axis=1, keepdims=True)
+            proba = np.exp(log_sigmoide)
+        else:
+            proba = np.empty((len(decision), len(self.classes_)))
+            for inicio in range(0, len(decision), FILAS_POR_BLOQUE):
+                fin = inicio + FILAS_POR_BLOQUE
+                proba[inicio:fin] = self._acoplar(decision[inicio:fin])
+            return proba
+        return proba / proba.sum(axis=1, keepdims=True)
+    
+    def _acoplar(self, decision):
+        """
+        Acoplamiento por pares (Wu, Lin y Weng, método 2), vectorizado por filas.
+        
+        Con r_ij la probabilidad calibrada de i frente a j, las probabilidades
+        minimizan p^T Q p con sum(p) = 1, es decir p = Q^-1 e / (e^T Q^-1 e).
+        """
+        n, k = len(decision), len(self.classes_)
+        
+        # Platt: r_ij = 1 / (1 + exp(A * f + B))
+        with np.errstate(over="ignore"):
+            r = 1.0 / (1.0 + np.exp(decision * self.probA + self.probB))
+        r = np.clip(r, PROB_MINIMA, 1 - PROB_MINIMA)
+        
+        R = np.zeros((n, k, k), dtype=np.float32)
+        R[:, self.pares_i, self.pares_j] = r
+        R[:, self.pares_j, self.pares_i] = 1 - r
+        
+        # Q_tj = -r_jt r_tj fuera de la diagonal, Q_tt = sum_j r_jt^2
+        Q = -(R * R.transpose(0, 2, 1))
+        diagonal = np.arange(k)
+        Q[:, diagonal, diagonal] = np.einsum("njt,njt->nt", R, R)
+        
+        y = np.linalg.solve(Q, np.ones((n, k, 1), dtype=np.float32))[..., 0]
+        return y / y.sum(axis=1, keepdims=True)
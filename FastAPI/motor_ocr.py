@@ -0,0 +1,559 @@
+"""
+Motor de reconocimiento OCR: segmentación, clasificación y composición del resultado.
+Se mantiene separado de la API para poder cargarlo en procesos de trabajo.
+"""
+import io
+import sys
+import time
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pickle
+import hashlib
+from PIL import Image, ImageDraw, ImageFont
+
+import config
+import idioma
+from motor_lineal import MotorLineal, abrir_directorio
+
+logger = logging.getLogger("ocr.motor")
+
+# Añadir directorio raíz al path
+project_root = Path(__file__).resolve().parent.parent
+segmenter_path = project_root / "modelo" / "fase3_evaluacion"
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(segmenter_path))
+
+from simple_segmenter import SimpleImageSegmenter
+
+# Verificar que el segmentador tiene los métodos necesarios
+logger.debug("SimpleImageSegmenter cargado, métodos disponibles: %s",
+             [m for m in dir(SimpleImageSegmenter) if not m.startswith('_')])
+if not hasattr(SimpleImageSegmenter, 'segment_image'):
+    raise ImportError("SimpleImageSegmenter no tiene el método segment_image!")
+
+
+@contextmanager
+def medir(tiempos, etapa):
+    """Suma a tiempos[etapa] los segundos del bloque (si tiempos no es None)."""
+    if tiempos is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + time.perf_counter() - inicio
+
+
+class SegmentadorMedido(SimpleImageSegmenter):
+    """SimpleImageSegmenter que acumula el tiempo de cada etapa en un diccionario."""
+    
+    def __init__(self, tiempos=None):
+        super().__init__()
+        self.tiempos = tiempos
+    
+    def _binarize(self, image):
+        with medir(self.tiempos, "binarizacion"):
+            return super()._binarize(image)
+    
+    def _find_line_boundaries(self, binary):
+        with medir(self.tiempos, "segmentacion_lineas"):
+            return super()._find_line_boundaries(binary)
+    
+    def _extract_line(self, image, y_start, y_end):
+        with medir(self.tiempos, "segmentacion_lineas"):
+            return super()._extract_line(image, y_start, y_end)
+    
+    def segment_line(self, image):
+        # Incluye la normalización, que se descuenta en segmentar_imagen
+        with medir(self.tiempos, "segmentacion_caracteres"):
+            return super().segment_line(image)
+    
+    def _normalize_to_28x28(self, char_img):
+        with medir(self.tiempos, "normalizacion"):
+            return super()._normalize_to_28x28(char_img)
+
+class ModeloOCR:
+    """Modelo, scaler (None si está plegado en el modelo) y mapping de una misma versión."""
+    
+    def __init__(self, model, scaler, label_mapping, version):
+        self.model = model
+        self.scaler = scaler
+        self.label_mapping = label_mapping
+        self.version = version
+
+
+# Modelo activo. Se sustituye con una sola asignación, de modo que cada
+# clasificación usa siempre las tres piezas de la misma versión.
+modelo_activo = None
+
+def rutas_artefactos():
+    """
+    Ficheros del modelo según config.MOTOR: modelo.pkl, scaler.pkl y mapping.txt
+    con "sklearn", o solo modelo_lineal.npz (autocontenido) con "lineal"; con
+    config.MMAP, el directorio modelo_lineal/ en lugar del .npz.
+    """
+    # Usar la carpeta models de la raíz del proyecto
+    models_dir = Path(__file__).parent.parent / "models"
+    data_dir = Path(__file__).parent.parent / "data"
+    if config.MOTOR not in ("sklearn", "lineal"):
+        raise ValueError(f"OCR_MOTOR desconocido: {config.MOTOR} (usa 'sklearn' o 'lineal')")
+    if config.MOTOR == "lineal":
+        return (models_dir / ("modelo_lineal" if config.MMAP else "modelo_lineal.npz"),)
+    return models_dir / "modelo.pkl", models_dir / "scaler.pkl", data_dir / "mapping.txt"
+
+def leer_modelo():
+    """
+    Lee los ficheros del modelo sin activarlos.
+    
+    Con "sklearn" la versión es un prefijo del SHA-256 de los ficheros. Con
+    "lineal" es la que guardó exportar_modelo.py en el .npz (más la precisión
+    de los pesos si no es float32); así este motor no necesita sklearn.
+    """
+    rutas = rutas_artefactos()
+    if config.MOTOR != "lineal" and config.PRECISION != "float32":
+        raise ValueError("OCR_PRECISION solo se aplica con OCR_MOTOR=lineal")
+    if config.MMAP and (config.MOTOR != "lineal" or config.PRECISION != "float32"):
+        # Con pesos reducidos cada proceso tendría su propia copia cuantizada
+        raise ValueError("OCR_MMAP solo se aplica con OCR_MOTOR=lineal y OCR_PRECISION=float32")
+    
+    if not rutas[0].exists():
+        raise FileNotFoundError(f"Modelo no encontrado en {rutas[0]}")
+    
+    if config.MOTOR == "lineal":
+        modelo = leer_modelo_lineal(rutas[0])
+    else:
+        huella = hashlib.sha256()
+        contenidos = []
+        for ruta in rutas:
+            contenido = ruta.read_bytes()
+            huella.update(contenido)
+            contenidos.append(contenido)
+        
+        model = pickle.loads(contenidos[0])
+        scaler = pickle.loads(contenidos[1])
+        
+        # Cargar mapping
+        label_mapping = {}
+        for line in contenidos[2].decode('utf-8').splitlines():
+            if line.strip():
+                label, letter = line.strip().split()
+                label_mapping[int(label)] = letter
+        
+        modelo = ModeloOCR(model, scaler, label_mapping, huella.hexdigest()[:12])
+    
+    if config.CLASE_ARGMAX:
+        # Las letras cambian con la regla de la clase: que no compartan caché
+        modelo.version = hashlib.sha256(f"{modelo.version}-argmax".encode()).hexdigest()[:12]
+    return modelo
+
+def leer_modelo_lineal(ruta):
+    """Lee modelo_lineal.npz o modelo_lineal/: pesos con el scaler plegado, mapping y versión."""
+    if ruta.is_dir():
+        # Los .npy quedan proyectados en memoria: W no se copia en cada proceso
+        return _modelo_lineal_desde_arrays(abrir_directorio(ruta), ruta)
+    with np.load(io.BytesIO(ruta.read_bytes()), allow_pickle=False) as datos:
+        return _modelo_lineal_desde_arrays(datos, ruta)
+
+def _modelo_lineal_desde_arrays(datos, ruta):
+    if "version" not in datos or "letras" not in datos:
+        raise ValueError(f"{ruta.name} no incluye mapping ni versión; vuelve a "
+                         "exportarlo con modelo/fase2_entrenamiento/exportar_modelo.py")
+    # Scaler plegado en los pesos: se clasifican los píxeles en crudo
+    model = MotorLineal.desde_arrays(datos, config.PRECISION)
+    label_mapping = dict(zip(datos["etiquetas"].tolist(), datos["letras"].tolist()))
+    version = str(datos["version"])
+    
+    if config.PRECISION != "float32":
+        # Los resultados cambian con la precisión: que no compartan caché
+        version = hashlib.sha256(f"{version}-{config.PRECISION}".encode()).hexdigest()[:12]
+    return ModeloOCR(model, None, label_mapping, version)
+
+def calentar_modelo(modelo):
+    """Hace una inferencia de prueba; falla si los artefactos no son coherentes."""
+    letras, confidencias = clasificar_matriz(np.zeros((1, 784), dtype=np.uint8), modelo=modelo)
+    if len(letras) != 1 or not np.isfinite(confidencias).all():
+        raise ValueError(f"Inferencia de prueba inválida con el modelo {modelo.version}")
+
+def activar_modelo(modelo):
+    """Sustituye el modelo activo; las clasificaciones en curso terminan con el anterior."""
+    global modelo_activo
+    modelo_activo = modelo
+
+def cargar_modelo():
+    """Lee, calienta y activa el modelo de ../models. Devuelve su versión."""
+    modelo = leer_modelo()
+    calentar_modelo(modelo)
+    activar_modelo(modelo)
+    
+    logger.info("Modelo cargado correctamente (versión %s)", modelo.version)
+    return modelo.version
+
+def version_modelo():
+    """Versión del modelo activo, o None si aún no se ha cargado."""
+    modelo = modelo_activo
+    return modelo.version if modelo is not None else None
+
+def detectar_idioma(texto):
+    """Detecta el idioma del texto reconocido."""
+    try:
+        if len(texto.strip()) < 3:
+            return "Desconocido"
+        
+        if config.DETECTOR_IDIOMA == "langdetect":
+            # langdetect tarda en importarse y cargar sus perfiles: solo cuando se usa
+            from langdetect import detect, DetectorFactory
+            # Fijar semilla para resultados consistentes
+            DetectorFactory.seed = 0
+            lang_code = detect(texto)
+        else:
+            lang_code = idioma.detectar(texto)
+            if lang_code is None:
+                return "Desconocido"
+        
+        return idioma.IDIOMAS.get(lang_code, f"Otro ({lang_code})")
+    except:
+        return "Desconocido"
+
+def estimar_altura_texto(img_array):
+    """
+    Altura dominante de las líneas de texto en píxeles, o None si no hay texto.
+    
+    Se calcula sobre una muestra de una de cada `paso` filas y columnas (unos
+    config.PIXELES_ESTIMACION píxeles): mediana de la altura de los tramos de
+    filas con contenido en la proyección horizontal binarizada, ponderada por
+    su número de píxeles de texto.
+    """
+    paso = max(1, int(np.ceil(np.sqrt(img_array.size / config.PIXELES_ESTIMACION))))
+    muestra = img_array[::paso, ::paso]
+    if muestra.max() == muestra.min():
+        return None
+    
+    tinta = np.count_nonzero(SimpleImageSegmenter()._binarize(muestra), axis=1)
+    bordes = np.diff(np.concatenate(([0], (tinta > 0).astype(np.int8), [0])))
+    inicios, fines = np.flatnonzero(bordes == 1), np.flatnonzero(bordes == -1)
+    alturas = fines - inicios
+    # Mediana ponderada por la tinta de cada tramo: los puntos de la i y la j
+    # o el ruido forman tramos bajos con poca tinta que no deben contar igual
+    pesos = np.add.reduceat(tinta, inicios) if len(inicios) else np.zeros(0)
+    if pesos.sum() == 0:
+        return None
+    orden = np.argsort(alturas)
+    acumulado = np.cumsum(pesos[orden])
+    return float(alturas[orden][np.searchsorted(acumulado, acumulado[-1] / 2)]) * paso
+
+def reducir_imagen(img_array):
+    """
+    Reduce las imágenes grandes para que el texto quede cerca de config.ALTURA_TEXTO.
+    
+    Las fotos de móvil llegan con el texto a cientos de píxeles de alto,
+    pero cada carácter acaba reducido a 24 px en _normalize_to_28x28; binarizar
+    y proyectar la imagen completa es trabajo perdido. Se reduce por un factor
+    entero (media de bloques, Image.reduce) y nunca por debajo de la altura
+    objetivo, para la que están pensados los umbrales en píxeles del segmentador.
+    
+    Returns:
+        np.ndarray: la imagen reducida, o la misma si no hace falta
+    """
+    if config.ALTURA_TEXTO <= 0 or img_array.ndim != 2 or img_array.size < config.REDUCIR_DESDE_PIXELES:
+        return img_array
+    
+    altura = estimar_altura_texto(img_array)
+    if altura is None:
+        return img_array
+    factor = int(altura // config.ALTURA_TEXTO)
+    if factor < 2:
+        return img_array
+    
+    logger.debug("Reduciendo imagen %s por %d (texto de ~%.0f px)", img_array.shape, factor, altura)
+    return np.asarray(Image.fromarray(img_array).reduce(factor))
+
+def factor_jpeg(contents, tamano):
+    """
+    Factor entero de reducción de un JPEG de tamano (ancho, alto), como el de
+    reducir_imagen, o 1 si no hace falta reducirlo.
+    
+    Se estima sin decodificar la imagen completa: la altura del texto se mide
+    en una vista previa a 1/8 con el modo draft de PIL (libjpeg solo calcula
+    los coeficientes DC de cada bloque de 8x8, casi gratis).
+    """
+    if config.ALTURA_TEXTO <= 0:
+        return 1
+    previa = Image.open(io.BytesIO(contents))
+    previa.draft('L', (tamano[0] // 8, tamano[1] // 8))
+    altura = estimar_altura_texto(np.asarray(previa.convert('L')))
+    if altura is None:
+        return 1
+    return max(1, int(altura * tamano[0] / previa.width // config.ALTURA_TEXTO))
+
+def preparar_glifo(letra_img):
+    """Convierte un carácter segmentado en el vector de 784 píxeles del modelo."""
+    # Asegurar 28x28
+    if letra_img.shape != (28, 28):
+        img_pil = Image.fromarray(letra_img.astype(np.uint8))
+        img_pil = img_pil.resize((28, 28), Image.LANCZOS)
+        letra_img = np.array(img_pil)
+    
+    # Invertir colores y aplanar
+    return (255 - letra_img.astype(np.uint8)).reshape(-1)
+
+def preparar_matriz(glifos):
+    """Apila los caracteres segmentados en una matriz uint8 (N, 784)."""
+    if len(glifos) == 0:
+        return np.zeros((0, 784), dtype=np.uint8)
+    return np.stack([preparar_glifo(g) for g in glifos])
+
+def clasificar_matriz(X, tiempos=None, modelo=None):
+    """
+    Clasifica una matriz (N, 784) de caracteres con una única llamada al modelo.
+    
+    Args:
+        modelo: ModeloOCR a usar (por defecto, el activo)
+    
+    Returns:
+        tuple: (letras, confidencias) en el mismo orden que las filas
+    """
+    if len(X) == 0:
+        return [], np.zeros(0)
+    modelo = modelo or modelo_activo
+    
+    with medir(tiempos, "clasificacion"):
+        X_scaled = modelo.scaler.transform(X) if modelo.scaler is not None else X
+        clases = modelo.model.classes_
+        
+        if config.CLASE_ARGMAX:
+            # Una sola llamada al modelo; la clase es el argmax de las probabilidades
+            proba = modelo.model.predict_proba(X_scaled)
+            indices = np.argmax(proba, axis=1)
+        else:
+            # La clase de predict (votación uno-contra-uno en el SVC) y su probabilidad
+            if isinstance(modelo.model, MotorLineal):
+                predichas, proba = modelo.model.clasificar(X_scaled)
+            else:
+                predichas = modelo.model.predict(X_scaled)
+                proba = modelo.model.predict_proba(X_scaled)
+            indices = np.searchsorted(clases, predichas)
+        confidencias = proba[np.arange(len(indices)), indices]
+        letras = [modelo.label_mapping[int(c)] for c in clases[indices]]
+    
+    return letras, confidencias
+
+def clasificar_glifos(glifos, tiempos=None, modelo=None):
+    """
+    Clasifica una lista de caracteres 28x28 con una única llamada al modelo.
+    
+    Returns:
+        tuple: (letras, confidencias) en el mismo orden que los glifos
+    """
+    with medir(tiempos, "normalizacion"):
+        X = preparar_matriz(glifos)
+    return clasificar_matriz(X, tiempos, modelo)
+
+def _acumular_segmentacion(locales, tiempos):
+    """Suma los tiempos del segmentador a tiempos, separando la normalización."""
+    if tiempos is None:
+        return
+    # La normalización se mide dentro de la segmentación de caracteres
+    locales["segmentacion_caracteres"] = (locales.get("segmentacion_caracteres", 0.0)
+                                          - locales.get("normalizacion", 0.0))
+    for etapa, segundos in locales.items():
+        tiempos[etapa] = tiempos.get(etapa, 0.0) + segundos
+
+def segmentar_imagen(img_array, tiempos=None):
+    """Segmenta una imagen en líneas de caracteres 28x28."""
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("Iniciando reconocimiento: shape=%s min/max=%s/%s dtype=%s",
+                     img_array.shape, np.min(img_array), np.max(img_array), img_array.dtype)
+    
+    # Segmentar (devuelve lista de líneas)
+    locales = {}
+    segmenter = SegmentadorMedido(locales if tiempos is not None else None)
+    segmenter.debug = debug  # Debug del segmentador solo con nivel DEBUG
+    lineas_segmentadas = segmenter.segment_image(img_array)
+    
+    _acumular_segmentacion(locales, tiempos)
+    
+    logger.debug("Líneas segmentadas: %d", len(lineas_segmentadas) if lineas_segmentadas else 0)
+    
+    return lineas_segmentadas
+
+def componer_resultado(longitudes, letras, confidencias, tiempos=None):
+    """
+    Reconstruye texto, confianza e idioma a partir de las predicciones planas.
+    
+    Args:
+        longitudes: número de caracteres de cada línea, en orden
+    """
+    # Reconstruir cada línea a partir de las predicciones
+    todas_las_lineas = []
+    todas_confidencias = [float(c) for c in confidencias]
+    todos_los_caracteres = list(letras)
+    
+    inicio = 0
+    for longitud in longitudes:
+        texto_linea = letras[inicio:inicio + longitud]
+        inicio += longitud
+        
+        # Reemplazar 'ESPACIO' por espacio real en la línea
+        texto_linea_final = ''.join([' ' if l == 'ESPACIO' else l for l in texto_linea])
+        todas_las_lineas.append(texto_linea_final)
+    
+    # Unir líneas con salto de línea
+    texto_final = '\n'.join(todas_las_lineas)
+    confianza_promedio = float(np.mean(todas_confidencias)) if todas_confidencias else 0
+    
+    logger.debug("Texto final: %r (%d caracteres, confianza promedio %.2f)",
+                 texto_final, len(todos_los_caracteres), confianza_promedio)
+    
+    # Detectar idioma
+    with medir(tiempos, "deteccion_idioma"):
+        idioma = detectar_idioma(texto_final)
+    logger.debug("Idioma detectado: %s", idioma)
+    
+    return {
+        "texto": texto_final,
+        "confianza_promedio": confianza_promedio,
+        "letras": todos_los_caracteres,
+        "confidencias": todas_confidencias,
+        "idioma": idioma
+    }
+
+def extraer_glifos(img_array, tiempos=None):
+    """
+    Segmenta una imagen y prepara sus caracteres para el clasificador.
+    
+    Returns:
+        tuple: (X, longitudes) con la matriz uint8 (N, 784) y el número de
+        caracteres de cada línea (lista vacía si no hay letras)
+    """
+    lineas_segmentadas = segmentar_imagen(img_array, tiempos)
+    if not lineas_segmentadas:
+        return preparar_matriz([]), []
+    
+    with medir(tiempos, "normalizacion"):
+        X = preparar_matriz([letra_img for linea_chars in lineas_segmentadas for letra_img in linea_chars])
+    return X, [len(linea_chars) for linea_chars in lineas_segmentadas]
+
+def reconocer_texto(img_array, tiempos=None):
+    """
+    Reconoce texto de una imagen (soporta múltiples líneas).
+    
+    Si se pasa un diccionario en tiempos, se acumulan en él los segundos de
+    cada etapa (binarizacion, segmentacion_lineas, segmentacion_caracteres,
+    normalizacion, clasificacion, deteccion_idioma).
+    """
+    X, longitudes = extraer_glifos(img_array, tiempos)
+    
+    if not longitudes:
+        return None
+    
+    # Clasificar todos los caracteres de la imagen en una sola llamada
+    logger.debug("Clasificando %d caracteres en %d líneas", len(X), len(longitudes))
+    letras, confidencias = clasificar_matriz(X, tiempos)
+    
+    return componer_resultado(longitudes, letras, confidencias, tiempos)
+
+def reconocer_lote(img_arrays, tiempos=None):
+    """
+    Reconoce texto de varias imágenes con una única llamada al modelo.
+    
+    Returns:
+        list: un resultado por imagen, en el mismo orden (None si no hay letras)
+    """
+    extraidos = [extraer_glifos(img_array, tiempos) for img_array in img_arrays]
+    
+    # Todos los caracteres de todas las imágenes en una sola matriz
+    X = np.concatenate([X_img for X_img, _ in extraidos])
+    logger.debug("Clasificando %d caracteres de %d imágenes", len(X), len(img_arrays))
+    letras, confidencias = clasificar_matriz(X, tiempos)
+    
+    return repartir_predicciones([longitudes for _, longitudes in extraidos], letras, confidencias, tiempos)
+
+def repartir_predicciones(longitudes_por_imagen, letras, confidencias, tiempos=None):
+    """
+    Reparte predicciones planas entre varias imágenes y compone cada resultado.
+    
+    Returns:
+        list: un resultado por imagen, en el mismo orden (None si no hay letras)
+    """
+    resultados = []
+    inicio = 0
+    for longitudes in longitudes_por_imagen:
+        if not longitudes:
+            resultados.append(None)
+            continue
+        n = sum(longitudes)
+        resultados.append(componer_resultado(longitudes, letras[inicio:inicio + n],
+                                             confidencias[inicio:inicio + n], tiempos))
+        inicio += n
+    
+    return resultados
+
+def reconocer_por_lineas(img_array, tiempos=None):
+    """
+    Reconoce una imagen línea a línea, devolviendo cada una en cuanto se clasifica.
+    
+    Yields:
+        dict: un registro {"tipo": "linea", ...} por línea y, al final, un
+        registro {"tipo": "resumen", ...} con el texto completo y el idioma.
+        No devuelve nada si no se detectan letras.
+    """
+    locales = {}
+    segmenter = SegmentadorMedido(locales if tiempos is not None else None)
+    segmenter.debug = logger.isEnabledFor(logging.DEBUG)
+    # Todas las líneas se clasifican con la misma versión aunque se recargue
+    modelo = modelo_activo
+    
+    lineas_texto = []
+    todas_confidencias = []
+    try:
+        for indice, linea_chars in enumerate(segmenter.iter_lines(img_array)):
+            letras, confidencias = clasificar_glifos(linea_chars, tiempos, modelo)
+            confidencias = [float(c) for c in confidencias]
+            texto_linea = ''.join([' ' if l == 'ESPACIO' else l for l in letras])
+            lineas_texto.append(texto_linea)
+            todas_confidencias.extend(confidencias)
+            yield {
+                "tipo": "linea",
+                "indice": indice,
+                "texto": texto_linea,
+                "letras": letras,
+                "confidencias": confidencias
+            }
+    finally:
+        _acumular_segmentacion(locales, tiempos)
+    
+    if not lineas_texto:
+        return
+    
+    texto_final = '\n'.join(lineas_texto)
+    with medir(tiempos, "deteccion_idioma"):
+        idioma = detectar_idioma(texto_final)
+    
+    yield {
+        "tipo": "resumen",
+        "texto": texto_final,
+        "confianza_promedio": float(np.mean(todas_confidencias)) if todas_confidencias else 0,
+        "lineas": len(lineas_texto),
+        "idioma": idioma
+    }
+
+def imagen_calentamiento():
+    """Imagen sintética con dos líneas de texto (fuente de mapa de bits de PIL ampliada x4)."""
+    img = Image.new('L', (110, 30), 255)
+    ImageDraw.Draw(img).multiline_text((4, 2), "Hola mundo\nque tal", fill=0,
+                                       font=ImageFont.load_default(), spacing=4)
+    return np.array(img.resize((img.width * 4, img.height * 4), Image.NEAREST))
+
+def calentar_reconocimiento():
+    """
+    Reconoce la imagen de calentamiento con reconocer_texto: segmentador,
+    modelo, BLAS y detector de idioma se inicializan antes de la primera
+    petición real. Devuelve los segundos que ha tardado.
+    """
+    inicio = time.perf_counter()
+    reconocer_texto(imagen_calentamiento())
+    return time.perf_counter() - inicio
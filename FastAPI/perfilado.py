@@ -0,0 +1,51 @@
+"""
+Perfilado de una petición con cProfile (?profile=1, solo con OCR_PERFILADO).
+
+Se ejecuta la función bajo cProfile y se devuelven las funciones con más
+tiempo acumulado: basta para ver si una imagen lenta se va en la
+binarización, la búsqueda de líneas, el redimensionado de
+_normalize_to_28x28, el modelo o la detección de idioma, sin conectar
+herramientas al servidor. Las peticiones perfiladas se ejecutan de una en
+una: desde Python 3.12 cProfile usa sys.monitoring, que es global al
+intérprete.
+"""
+import cProfile
+import pstats
+import threading
+import time
+from pathlib import Path
+
+# Funciones incluidas en el perfil, por tiempo acumulado
+FUNCIONES = 30
+
+_bloqueo = threading.Lock()
+
+
+def _nombre(fichero, linea, funcion):
+    """fichero.py:linea(funcion), o solo la función para las integradas."""
+    if fichero == "~":
+        return funcion
+    return f"{Path(fichero).name}:{linea}({funcion})"
+
+
+def perfilar(funcion, *args, funciones=FUNCIONES):
+    """
+    Ejecuta funcion(*args) bajo cProfile.
+    
+    Returns:
+        tuple: (resultado, perfil) con perfil = {"total_ms", "funciones": [...]},
+        cada función con sus llamadas y sus tiempos propio y acumulado en ms
+    """
+    with _bloqueo:
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        resultado = perfil.runcall(funcion, *args)
+        total = time.perf_counter() - inicio
+    
+    filas = [
+        {"funcion": _nombre(*clave), "llamadas": llamadas,
+         "propio_ms": round(propio * 1000, 3), "acumulado_ms": round(acumulado * 1000, 3)}
+        for clave, (_, llamadas, propio, acumulado, _) in pstats.Stats(perfil).stats.items()
+    ]
+    filas.sort(key=lambda fila: fila["acumulado_ms"], reverse=True)
+    return resultado, {"total_ms": round(total * 1000, 3), "funciones": filas[:funciones]}
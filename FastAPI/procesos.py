@@ -0,0 +1,316 @@
+"""
+Ejecución del reconocimiento fuera del bucle de eventos.
+
+Con procesos > 0 se usa un ProcessPoolExecutor cuyos procesos cargan
+modelo.pkl y scaler.pkl una sola vez al arrancar. Las imágenes y las
+matrices de los micro-lotes llegan a los procesos a través de
+multiprocessing.shared_memory, de modo que solo viaja el nombre del bloque
+y la forma del array. Los resultados (letras y confidencias, o los
+caracteres de cada imagen al segmentar) vuelven serializados con pickle.
+Con procesos = 0 el reconocimiento se ejecuta en un hilo del servidor.
+
+Los procesos no se crean con fork desde el servidor, que tiene hilos (el
+escritor de debug, el threadpool de anyio, BLAS) y podría dejar a los hijos
+con algún lock cogido para siempre: salen de un forkserver de un solo hilo
+con este módulo ya importado (spawn en Windows) y reciben la configuración
+del servidor al arrancar. Si un proceso muere (por ejemplo, por falta de
+memoria), el ejecutor se rehace para las peticiones siguientes.
+
+Con micro-lotes activados, la segmentación se hace por petición y la
+clasificación se agrupa entre peticiones concurrentes (ver microlotes.py).
+"""
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+
+import config
+import metricas
+import motor_ocr
+from microlotes import PlanificadorLotes
+
+logger = logging.getLogger("ocr.procesos")
+
+
+def _contexto():
+    """Contexto de multiprocessing de los procesos de trabajo: forkserver o, si no existe, spawn."""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        contexto = multiprocessing.get_context("forkserver")
+        # Los procesos nacen con numpy, sklearn y el motor ya importados
+        contexto.set_forkserver_preload(["procesos"])
+        return contexto
+    return multiprocessing.get_context("spawn")
+
+
+def _configuracion():
+    """Valores de config del servidor, incluidos los que cambian los argumentos de main.py."""
+    return {nombre: valor for nombre, valor in vars(config).items() if nombre.isupper()}
+
+
+def _inicializar_proceso(configuracion):
+    """Aplica la configuración del servidor, carga el modelo y lo calienta con un reconocimiento completo."""
+    for nombre, valor in configuracion.items():
+        setattr(config, nombre, valor)
+    motor_ocr.cargar_modelo()
+    motor_ocr.calentar_reconocimiento()
+
+
+def _listo():
+    """Tarea vacía para forzar el arranque de los procesos; devuelve su versión del modelo."""
+    return motor_ocr.version_modelo()
+
+
+def _abrir_memoria(nombre):
+    """Abre un bloque de memoria compartida creado por el proceso principal."""
+    try:
+        # Python 3.13+: no registrar el bloque en el resource_tracker del proceso
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        # Antes de 3.13 abrir un bloque también lo registra. Si el proceso comparte
+        # el resource_tracker del principal (procesos creados después de la primera
+        # petición, p. ej. tras recargar el modelo), anular el registro borraría el
+        # del principal, así que se evita registrarlo.
+        from multiprocessing import resource_tracker
+        registrar = resource_tracker.register
+        resource_tracker.register = lambda nombre, tipo: None
+        try:
+            return shared_memory.SharedMemory(name=nombre)
+        finally:
+            resource_tracker.register = registrar
+
+
+def _reconocer(img_arrays):
+    """Reconoce una o varias imágenes y devuelve (resultados, tiempos)."""
+    tiempos = {}
+    if len(img_arrays) == 1:
+        resultados = [motor_ocr.reconocer_texto(img_arrays[0], tiempos)]
+    else:
+        resultados = motor_ocr.reconocer_lote(img_arrays, tiempos)
+    return resultados, tiempos
+
+
+def _extraer(img_arrays):
+    """Segmenta las imágenes sin clasificar y devuelve ([(X, longitudes)], tiempos)."""
+    tiempos = {}
+    extraidos = [motor_ocr.extraer_glifos(img_array, tiempos) for img_array in img_arrays]
+    return extraidos, tiempos
+
+
+def _clasificar(X):
+    """Clasifica una matriz de caracteres y devuelve (letras, confidencias, tiempos)."""
+    tiempos = {}
+    letras, confidencias = motor_ocr.clasificar_matriz(X, tiempos)
+    return letras, confidencias, tiempos
+
+
+def _clasificar_compartido(matrices):
+    """_clasificar para _en_memoria_compartida: recibe una lista con la matriz del micro-lote."""
+    return _clasificar(matrices[0])
+
+
+def _en_memoria_compartida(funcion, descriptores):
+    """
+    Ejecuta funcion sobre arrays alojados en memoria compartida.
+    
+    Args:
+        funcion: _reconocer, _extraer o _clasificar_compartido
+        descriptores: lista de tuplas (nombre, shape, dtype)
+    """
+    bloques = [_abrir_memoria(nombre) for nombre, _, _ in descriptores]
+    try:
+        arrays = [np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+                  for shm, (_, shape, dtype) in zip(bloques, descriptores)]
+        salida = funcion(arrays)
+        # Liberar las vistas antes de cerrar la memoria compartida
+        del arrays
+        return salida
+    finally:
+        for shm in bloques:
+            shm.close()
+
+
+class PoolOCR:
+    """Ejecutor asíncrono del reconocimiento."""
+    
+    def __init__(self, procesos=0, microlote_ms=0, microlote_max_glifos=2048):
+        self.procesos = procesos
+        self.executor = None
+        self.bloqueo_reposicion = asyncio.Lock()
+        self.planificador = None
+        if microlote_ms > 0:
+            self.planificador = PlanificadorLotes(microlote_ms / 1000, microlote_max_glifos,
+                                                  self._clasificar_microlote)
+    
+    async def iniciar(self):
+        """Arranca los procesos y espera a que todos tengan el modelo cargado."""
+        if self.procesos <= 0:
+            return
+        self.executor, _ = await self._arrancar()
+        logger.info("%d procesos de reconocimiento listos", self.procesos)
+    
+    async def _arrancar(self):
+        """Crea un ejecutor nuevo y espera a sus procesos. Devuelve (executor, versiones)."""
+        executor = ProcessPoolExecutor(max_workers=self.procesos, mp_context=_contexto(),
+                                       initializer=_inicializar_proceso,
+                                       initargs=(_configuracion(),))
+        try:
+            loop = asyncio.get_running_loop()
+            versiones = await asyncio.gather(*[loop.run_in_executor(executor, _listo)
+                                               for _ in range(self.procesos)])
+        except BaseException:
+            executor.shutdown(wait=False)
+            raise
+        return executor, set(versiones)
+    
+    async def recargar(self, version_esperada):
+        """
+        Sustituye los procesos por otros que cargan el modelo actual de disco.
+        
+        Los procesos anteriores terminan las tareas que ya tenían antes de
+        cerrarse, así que ninguna petición en curso se corta.
+        """
+        if self.executor is None:
+            return
+        nuevo, versiones = await self._arrancar()
+        if versiones != {version_esperada}:
+            nuevo.shutdown(wait=False)
+            raise RuntimeError(f"Los procesos cargaron {sorted(versiones)} en vez de "
+                               f"{version_esperada}; los ficheros cambiaron durante la recarga")
+        anterior, self.executor = self.executor, nuevo
+        anterior.shutdown(wait=False)
+        logger.info("%d procesos de reconocimiento recargados", self.procesos)
+    
+    async def _en_procesos(self, funcion, *args):
+        """Ejecuta funcion en un proceso de trabajo; si el ejecutor se rompe, lo rehace y relanza el error."""
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, funcion, *args)
+        except BrokenProcessPool:
+            await self._reponer(executor)
+            raise
+    
+    async def _reponer(self, roto):
+        """
+        Sustituye un ejecutor roto (un proceso murió) por uno nuevo.
+        
+        La petición que lo encontró roto falla, pero las siguientes ya no. Si
+        varias lo encuentran roto a la vez, solo la primera lo rehace.
+        """
+        async with self.bloqueo_reposicion:
+            if self.executor is not roto:
+                return
+            logger.error("Un proceso de reconocimiento terminó de forma inesperada; "
+                         "se vuelven a crear los %d procesos", self.procesos)
+            metricas.PROCESOS_REPUESTOS.inc()
+            roto.shutdown(wait=False)
+            self.executor, versiones = await self._arrancar()
+            if versiones != {motor_ocr.version_modelo()}:
+                logger.warning("Los procesos nuevos cargaron %s y el servidor tiene %s",
+                               sorted(versiones), motor_ocr.version_modelo())
+    
+    def cerrar(self):
+        """Detiene los procesos de trabajo."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+    
+    async def reconocer(self, img_array):
+        """Reconoce una imagen sin bloquear el bucle de eventos."""
+        resultados = await self.reconocer_lote([img_array])
+        return resultados[0]
+    
+    async def reconocer_lote(self, img_arrays):
+        """Reconoce varias imágenes con una única llamada al modelo."""
+        if not img_arrays:
+            return []
+        
+        metricas.EN_COLA.inc()
+        try:
+            if self.planificador is None:
+                resultados, tiempos = await self._ejecutar_imagenes(_reconocer, img_arrays)
+            else:
+                resultados, tiempos = await self._reconocer_con_microlotes(img_arrays)
+        finally:
+            metricas.EN_COLA.dec()
+        
+        metricas.observar_etapas(tiempos)
+        for resultado in resultados:
+            caracteres = len(resultado["letras"]) if resultado else 0
+            metricas.CARACTERES_POR_PETICION.observar(caracteres)
+            metricas.CARACTERES_TOTAL.inc(caracteres)
+        return resultados
+    
+    async def _reconocer_con_microlotes(self, img_arrays):
+        """Segmenta en el ejecutor y clasifica junto con otras peticiones."""
+        extraidos, tiempos = await self._ejecutar_imagenes(_extraer, img_arrays)
+        X = np.concatenate([X_img for X_img, _ in extraidos])
+        if len(X):
+            letras, confidencias = await self.planificador.clasificar(X)
+        else:
+            letras, confidencias = [], np.zeros(0)
+        resultados = await run_in_threadpool(motor_ocr.repartir_predicciones,
+                                             [longitudes for _, longitudes in extraidos],
+                                             letras, confidencias, tiempos)
+        return resultados, tiempos
+    
+    async def _clasificar_microlote(self, X):
+        """Clasifica un micro-lote completo en el ejecutor."""
+        if self.executor is None:
+            letras, confidencias, tiempos = await run_in_threadpool(_clasificar, X)
+        else:
+            letras, confidencias, tiempos = await self._en_procesos_con_memoria(_clasificar_compartido, [X])
+        metricas.observar_etapas(tiempos)
+        return letras, confidencias
+    
+    async def reconocer_por_lineas(self, img_array):
+        """
+        Reconoce una imagen línea a línea (generador asíncrono).
+        
+        Se ejecuta siempre en un hilo del servidor: el generador no puede
+        repartirse entre procesos, y así cada línea se emite en cuanto está lista.
+        """
+        tiempos = {}
+        caracteres = 0
+        metricas.EN_COLA.inc()
+        try:
+            async for registro in iterate_in_threadpool(motor_ocr.reconocer_por_lineas(img_array, tiempos)):
+                if registro["tipo"] == "linea":
+                    caracteres += len(registro["letras"])
+                yield registro
+        finally:
+            metricas.EN_COLA.dec()
+            metricas.observar_etapas(tiempos)
+            metricas.CARACTERES_POR_PETICION.observar(caracteres)
+            metricas.CARACTERES_TOTAL.inc(caracteres)
+    
+    async def _ejecutar_imagenes(self, funcion, img_arrays):
+        """Ejecuta _reconocer o _extraer en un hilo o en un proceso de trabajo."""
+        if self.executor is None:
+            return await run_in_threadpool(funcion, img_arrays)
+        return await self._en_procesos_con_memoria(funcion, img_arrays)
+    
+    async def _en_procesos_con_memoria(self, funcion, arrays):
+        """Copia los arrays a bloques de memoria compartida y ejecuta funcion en un proceso de trabajo."""
+        bloques = []
+        try:
+            descriptores = []
+            for array in arrays:
+                array = np.ascontiguousarray(array)
+                shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                bloques.append(shm)
+                destino = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+                destino[...] = array
+                del destino
+                descriptores.append((shm.name, array.shape, array.dtype.str))
+            
+            return await self._en_procesos(_en_memoria_compartida, funcion, descriptores)
+        finally:
+            for shm in bloques:
+                shm.close()
+                shm.unlink()
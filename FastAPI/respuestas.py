@@ -0,0 +1,122 @@
+"""
+Codificación de las respuestas de reconocimiento según la cabecera Accept.
+
+- application/json (por defecto, la que usa la UI): el resultado completo,
+  con las letras y las confidencias en coma flotante.
+- application/vnd.ocr.compacto+json: la forma compacta, codificada con
+  orjson si está instalado.
+- application/msgpack (o application/x-msgpack): la forma compacta en
+  msgpack, con las confidencias como bytes. Solo si msgpack está instalado.
+
+La forma compacta sustituye texto y letras por el texto de cada línea (las
+letras son sus caracteres, con ' ' en lugar de ESPACIO) y da las confianzas
+en porcentaje entero (0-100, uint8). Si no se acepta ningún tipo disponible
+se responde con el JSON por defecto.
+"""
+import json
+import time
+
+import numpy as np
+from fastapi.responses import JSONResponse, Response
+
+import metricas
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+COMPACTO = "application/vnd.ocr.compacto+json"
+MSGPACK = "application/msgpack"
+
+_ALIAS = {
+    "*/*": JSON,
+    "application/*": JSON,
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+def tipos_disponibles():
+    """Tipos de respuesta que se pueden generar con las librerías instaladas."""
+    return (JSON, COMPACTO, MSGPACK) if msgpack is not None else (JSON, COMPACTO)
+
+
+def negociar(accept):
+    """Tipo de respuesta con mayor q de la cabecera Accept entre los disponibles (JSON si ninguno)."""
+    disponibles = tipos_disponibles()
+    elegido, mejor_q = JSON, 0.0
+    for parte in (accept or "").split(","):
+        tipo, *parametros = [trozo.strip() for trozo in parte.split(";")]
+        tipo = _ALIAS.get(tipo.lower(), tipo.lower())
+        q = 1.0
+        for parametro in parametros:
+            nombre, _, valor = parametro.partition("=")
+            if nombre.strip().lower() == "q":
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+                # q va de 0 a 1; fuera de ese rango (o nan) no es válido
+                if not 0.0 <= q <= 1.0:
+                    q = 0.0
+        # Con igual q gana el primero de la cabecera
+        if tipo in disponibles and q > mejor_q:
+            elegido, mejor_q = tipo, q
+    return elegido
+
+
+def compactar(contenido, binario=False):
+    """
+    Forma compacta de un resultado o de un lote {"resultados": [...]}.
+    Las entradas sin reconocimiento (errores del lote) no cambian.
+    
+    Args:
+        binario: confidencias como bytes (msgpack) en lugar de lista de enteros
+    """
+    if "resultados" in contenido:
+        return {**contenido, "resultados": [compactar(r, binario) for r in contenido["resultados"]]}
+    if "letras" not in contenido:
+        return contenido
+    
+    compacto = {clave: valor for clave, valor in contenido.items()
+                if clave not in ("texto", "letras", "confidencias", "confianza_promedio")}
+    porcentajes = np.rint(np.asarray(contenido["confidencias"], dtype=np.float64) * 100)
+    porcentajes = porcentajes.clip(0, 100).astype(np.uint8)
+    compacto["lineas"] = contenido["texto"].split("\n")
+    compacto["confianza_promedio"] = int(round(contenido["confianza_promedio"] * 100))
+    compacto["confidencias"] = porcentajes.tobytes() if binario else porcentajes.tolist()
+    return compacto
+
+
+def codificar(contenido, tipo):
+    """Bytes del contenido en el tipo indicado (compactado salvo en JSON)."""
+    if tipo == JSON:
+        return json.dumps(contenido, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
+    if tipo == MSGPACK:
+        return msgpack.packb(compactar(contenido, binario=True))
+    if orjson is not None:
+        return orjson.dumps(compactar(contenido))
+    return json.dumps(compactar(contenido), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def responder(contenido, accept, headers=None):
+    """Respuesta con el contenido en el tipo negociado con la cabecera Accept."""
+    tipo = negociar(accept)
+    headers = {**(headers or {}), "Vary": "Accept"}
+    inicio = time.perf_counter()
+    if tipo == JSON:
+        # El mismo JSON de siempre, generado por JSONResponse
+        respuesta = JSONResponse(content=contenido, headers=headers)
+    else:
+        respuesta = Response(codificar(contenido, tipo), media_type=tipo, headers=headers)
+    metricas.ETAPA_SEGUNDOS.observar(time.perf_counter() - inicio, etapa="serializacion")
+    metricas.RESPUESTAS.inc(tipo=tipo)
+    return respuesta
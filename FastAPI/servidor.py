@@ -0,0 +1,150 @@
+"""
+Arranque en producción con varios procesos servidor (precarga y fork).
+
+El proceso padre carga el modelo y abre el socket; después congela el
+recolector de basura y crea los procesos con fork, de modo que todos
+comparten con el padre (copia en escritura) los módulos importados y los
+pesos del modelo. Cada proceso ejecuta su propio uvicorn sobre el mismo
+socket y el núcleo reparte las conexiones entre ellos.
+
+Cada proceso limita los hilos de BLAS para que procesos × hilos no supere
+los núcleos. Si un proceso termina inesperadamente, el padre lanza otro.
+Solo funciona en sistemas con fork (Linux, macOS).
+"""
+import gc
+import logging
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+import motor_ocr
+
+logger = logging.getLogger("ocr.servidor")
+
+# Conexiones pendientes de aceptar en el socket compartido (el valor por defecto de uvicorn)
+BACKLOG = 2048
+
+# Espera antes de sustituir un proceso que ha terminado, para no entrar en un
+# bucle de fork si falla nada más arrancar
+ESPERA_RELANZAR_S = 1.0
+
+
+def hilos_por_proceso(procesos, hilos=0):
+    """Hilos de BLAS por proceso: los indicados o los núcleos repartidos entre los procesos."""
+    if hilos > 0:
+        return hilos
+    return max(1, (os.cpu_count() or 1) // procesos)
+
+
+def limitar_hilos_blas(hilos):
+    """Limita los hilos de BLAS (OpenBLAS, MKL...) del proceso actual."""
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        logger.warning("threadpoolctl no está instalado; no se limitan los hilos de BLAS")
+        return
+    threadpool_limits(limits=hilos, user_api="blas")
+
+
+def abrir_socket(host, port):
+    """Socket TCP en escucha que heredan los procesos servidor."""
+    familia = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(familia, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def codigo_salida(estado):
+    """
+    Código de salida a partir del estado de os.wait: el de exit o, si lo
+    terminó una señal, el número de la señal en negativo. Equivale a
+    os.waitstatus_to_exitcode, que no existe hasta Python 3.9.
+    """
+    if os.WIFSIGNALED(estado):
+        return -os.WTERMSIG(estado)
+    return os.WEXITSTATUS(estado)
+
+
+def _lanzar_proceso(app, sock, hilos, opciones_uvicorn):
+    """Crea un proceso servidor con fork. Devuelve su pid."""
+    pid = os.fork()
+    if pid != 0:
+        return pid
+    
+    codigo = 0
+    try:
+        # uvicorn instala sus propios manejadores para apagarse ordenadamente
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        limitar_hilos_blas(hilos)
+        servidor = uvicorn.Server(uvicorn.Config(app, **opciones_uvicorn))
+        servidor.run(sockets=[sock])
+    except BaseException:
+        logger.exception("Error en el proceso servidor %d", os.getpid())
+        codigo = 1
+    finally:
+        os._exit(codigo)
+
+
+def ejecutar(app, procesos, host, port, hilos=0, **opciones_uvicorn):
+    """
+    Sirve app con varios procesos creados con fork después de cargar el modelo.
+    
+    Args:
+        app: aplicación ASGI
+        procesos: número de procesos servidor
+        hilos: hilos de BLAS por proceso (0 = núcleos / procesos)
+        opciones_uvicorn: resto de argumentos de uvicorn.Config (ssl_keyfile, ...)
+    """
+    motor_ocr.cargar_modelo()
+    # Lo que se inicializa al reconocer (perfiles de idioma...) también se comparte
+    motor_ocr.calentar_reconocimiento()
+    sock = abrir_socket(host, port)
+    hilos = hilos_por_proceso(procesos, hilos)
+    
+    # Lo que ya existe no vuelve a recorrerlo el recolector, que si no tocaría
+    # (y copiaría) las páginas compartidas de todos los objetos
+    gc.collect()
+    gc.freeze()
+    
+    hijos = set()
+    parando = False
+    
+    def parar(signum, frame):
+        nonlocal parando
+        parando = True
+        for pid in list(hijos):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+    
+    signal.signal(signal.SIGINT, parar)
+    signal.signal(signal.SIGTERM, parar)
+    
+    for _ in range(procesos):
+        hijos.add(_lanzar_proceso(app, sock, hilos, opciones_uvicorn))
+    logger.info("%d procesos servidor en %s:%d con %d hilos de BLAS cada uno (modelo %s)",
+                procesos, host, port, hilos, motor_ocr.version_modelo())
+    
+    while hijos:
+        try:
+            pid, estado = os.wait()
+        except ChildProcessError:
+            break
+        hijos.discard(pid)
+        if parando:
+            continue
+        logger.warning("El proceso servidor %d ha terminado (código %d); se lanza otro",
+                       pid, codigo_salida(estado))
+        time.sleep(ESPERA_RELANZAR_S)
+        if not parando:
+            hijos.add(_lanzar_proceso(app, sock, hilos, opciones_uvicorn))
+    
+    sock.close()
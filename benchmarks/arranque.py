@@ -0,0 +1,96 @@
+"""
+Benchmark: tiempo de arranque de la API (importaciones, carga del modelo y primer reconocimiento)
+
+Lanza un intérprete nuevo con python -X importtime por cada motor, importa
+FastAPI/main.py, carga el modelo y reconoce una imagen de
+imagenes/verificacion. Muestra los tiempos de cada fase, los paquetes que más
+tardan en importarse (suma del tiempo propio de todos sus módulos, incluidos
+los que se importan al cargar el modelo o al reconocer) y qué paquetes
+opcionales han llegado a importarse.
+
+Uso:
+    python benchmarks/arranque.py [--motores sklearn lineal] [--repeticiones 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Número de paquetes que se muestran en el informe de importación
+MAX_PAQUETES = 10
+
+CODIGO = """
+import json, sys, time
+inicio = time.perf_counter()
+import main
+importado = time.perf_counter()
+import motor_ocr
+motor_ocr.cargar_modelo()
+cargado = time.perf_counter()
+import numpy as np
+from PIL import Image
+img = np.array(Image.open(sys.argv[1]).convert('L'))
+motor_ocr.reconocer_texto(img)
+reconocido = time.perf_counter()
+print(json.dumps({
+    "importar": importado - inicio,
+    "cargar_modelo": cargado - importado,
+    "primer_reconocimiento": reconocido - cargado,
+    "cargados": [m for m in ("sklearn", "scipy", "skimage", "langdetect") if m in sys.modules],
+}))
+"""
+
+
+def medir(motor, imagen):
+    """Ejecuta un arranque en frío y devuelve (tiempos, segundos de importación por paquete)."""
+    entorno = dict(os.environ, OCR_MOTOR=motor, OCR_LOG_NIVEL="WARNING", PYTHONWARNINGS="ignore")
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", CODIGO, str(imagen)],
+                             cwd=RAIZ / "FastAPI", env=entorno, capture_output=True, text=True, check=True)
+    tiempos = json.loads(proceso.stdout.strip().splitlines()[-1])
+
+    # Líneas "import time: propio | acumulado | módulo" (microsegundos)
+    importaciones = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        propio, _, modulo = linea[len("import time:"):].split("|")
+        if not propio.strip().isdigit():
+            continue
+        paquete = modulo.strip().split(".")[0]
+        importaciones[paquete] = importaciones.get(paquete, 0) + int(propio) / 1e6
+    return tiempos, importaciones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--motores", nargs="+", default=["sklearn", "lineal"])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    imagen = sorted((RAIZ / "imagenes" / "verificacion").glob("*.png"))[0]
+
+    for motor in args.motores:
+        # Mejor de varias ejecuciones para quitar ruido de la caché de disco
+        mediciones = [medir(motor, imagen) for _ in range(args.repeticiones)]
+        tiempos, importaciones = min(mediciones, key=lambda m: sum(m[0][f] for f in
+                                                                  ("importar", "cargar_modelo", "primer_reconocimiento")))
+        total = tiempos["importar"] + tiempos["cargar_modelo"] + tiempos["primer_reconocimiento"]
+
+        print(f"Motor {motor}")
+        print(f"   importar main.py        {tiempos['importar']*1000:>8.0f} ms")
+        print(f"   cargar_modelo()         {tiempos['cargar_modelo']*1000:>8.0f} ms")
+        print(f"   primer reconocimiento   {tiempos['primer_reconocimiento']*1000:>8.0f} ms")
+        print(f"   total                   {total*1000:>8.0f} ms")
+        print(f"   importaciones: {sum(importaciones.values())*1000:.0f} ms en total; los más lentos (-X importtime):")
+        for nombre, segundos in sorted(importaciones.items(), key=lambda p: -p[1])[:MAX_PAQUETES]:
+            print(f"      {nombre:<20} {segundos*1000:>8.0f} ms")
+        print(f"   paquetes opcionales cargados: {', '.join(tiempos['cargados']) or 'ninguno'}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
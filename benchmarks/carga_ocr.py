@@ -0,0 +1,264 @@
+"""
+Prueba de carga HTTP de la API OCR
+
+Reenvía las imágenes de imagenes/verificacion (verificacion_NNNNN_<palabra>.png,
+la palabra del nombre es el texto esperado) a una API en marcha y mide
+latencia (p50/p95/p99), rendimiento, tasa de errores y acierto por
+caracteres. El acierto se cuenta sobre todas las peticiones enviadas (una
+respuesta que no es 200 falla todos sus caracteres); el de las respuestas
+200 solas va aparte. El resultado se escribe como JSON.
+
+- En bucle cerrado (por defecto) hay siempre `--concurrencia` peticiones en
+  curso: cada una sale en cuanto termina la anterior.
+- Con `--tasa N` las peticiones salen a N por segundo, terminen o no las
+  anteriores (como mucho `--concurrencia` en curso). La latencia se cuenta
+  desde el momento en que debía salir cada petición, para que la espera
+  cuando el servidor no da abasto no desaparezca de los percentiles.
+- Con `--barrido 1 2 4 8 ...` se repite la prueba en bucle cerrado con cada
+  concurrencia y se da como punto de saturación la menor concurrencia cuyo
+  rendimiento queda a menos de `--umbral` (por defecto 5 %) del máximo.
+
+Antes de empezar espera a que /ready responda 200 (servidores sin /ready:
+no se espera). Para medir el reconocimiento y no la caché, arranca la API
+con OCR_CACHE_MEMORIA_BYTES=0 OCR_CACHE_SQLITE= (el JSON incluye la fracción
+de respuestas servidas desde la caché).
+
+Uso:
+    python benchmarks/carga_ocr.py [--url http://127.0.0.1:8000] [--concurrencia 8]
+        [--tasa 0] [--duracion 20 | --peticiones N] [--accept TIPO] [--salida carga.json]
+    python benchmarks/carga_ocr.py --barrido 1 2 4 8 16 32 [--duracion 10]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def cargar_imagenes():
+    """(nombre, palabra esperada, bytes) de cada imagen verificacion_*.png."""
+    rutas = sorted((RAIZ / "imagenes" / "verificacion").glob("verificacion_*.png"))
+    return [(ruta.name, ruta.stem.split("_", 2)[2], ruta.read_bytes()) for ruta in rutas]
+
+
+def distancia_edicion(a, b):
+    """Distancia de Levenshtein entre dos cadenas."""
+    if len(a) < len(b):
+        a, b = b, a
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = actual
+    return anterior[-1]
+
+
+def texto_respuesta(respuesta):
+    """Texto reconocido de una respuesta 200 en JSON completo, JSON compacto o msgpack."""
+    tipo = respuesta.headers.get("content-type", "")
+    if "msgpack" in tipo:
+        import msgpack
+        datos = msgpack.unpackb(respuesta.content)
+    else:
+        datos = respuesta.json()
+    return datos["texto"] if "texto" in datos else "\n".join(datos["lineas"])
+
+
+async def esperar_listo(cliente, espera_max):
+    """Espera a que /ready responda 200 (o no exista)."""
+    limite = time.monotonic() + espera_max
+    while True:
+        try:
+            respuesta = await cliente.get("/ready")
+            if respuesta.status_code in (200, 404):
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > limite:
+            raise SystemExit(f"La API no está lista tras {espera_max:.0f} s")
+        await asyncio.sleep(0.5)
+
+
+async def enviar(cliente, args, imagen, salida_prevista, registros):
+    """Envía una imagen y añade su registro (latencia, código, texto, caché)."""
+    nombre, palabra, datos = imagen
+    headers = {"Accept": args.accept} if args.accept else {}
+    registro = {"palabra": palabra, "codigo": None, "texto": None, "cache": False}
+    try:
+        respuesta = await cliente.post(args.endpoint, files={"file": (nombre, datos, "image/png")},
+                                       headers=headers)
+        registro["codigo"] = respuesta.status_code
+        registro["cache"] = respuesta.headers.get("X-Cache") == "HIT"
+        if respuesta.status_code == 200:
+            registro["texto"] = texto_respuesta(respuesta)
+    except httpx.HTTPError as e:
+        registro["codigo"] = type(e).__name__
+    registro["latencia"] = time.perf_counter() - salida_prevista
+    registros.append(registro)
+
+
+async def bucle_cerrado(cliente, args, imagenes, concurrencia):
+    """concurrencia peticiones en curso hasta agotar la duración o el número de peticiones."""
+    registros = []
+    siguiente = 0
+    fin = time.perf_counter() + args.duracion
+
+    async def trabajador():
+        nonlocal siguiente
+        while (siguiente < args.peticiones) if args.peticiones else (time.perf_counter() < fin):
+            imagen = imagenes[siguiente % len(imagenes)]
+            siguiente += 1
+            await enviar(cliente, args, imagen, time.perf_counter(), registros)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[trabajador() for _ in range(concurrencia)])
+    return registros, time.perf_counter() - inicio
+
+
+async def bucle_abierto(cliente, args, imagenes, concurrencia):
+    """Peticiones a args.tasa por segundo, con como mucho concurrencia en curso."""
+    registros = []
+    semaforo = asyncio.Semaphore(concurrencia)
+    total = args.peticiones or int(args.duracion * args.tasa)
+
+    async def programada(imagen, salida_prevista):
+        async with semaforo:
+            await enviar(cliente, args, imagen, salida_prevista, registros)
+
+    inicio = time.perf_counter()
+    tareas = []
+    for i in range(total):
+        salida_prevista = inicio + i / args.tasa
+        await asyncio.sleep(max(0.0, salida_prevista - time.perf_counter()))
+        tareas.append(asyncio.create_task(programada(imagenes[i % len(imagenes)], salida_prevista)))
+    await asyncio.gather(*tareas)
+    return registros, time.perf_counter() - inicio
+
+
+def resumir(registros, segundos, concurrencia, tasa):
+    """Estadísticas de una prueba en el formato del JSON de salida."""
+    correctas = [r for r in registros if r["codigo"] == 200]
+    latencias = np.array([r["latencia"] for r in correctas]) * 1000
+    codigos = {}
+    for r in registros:
+        codigos[str(r["codigo"])] = codigos.get(str(r["codigo"]), 0) + 1
+
+    # El acierto se cuenta sobre todas las peticiones enviadas: las que no
+    # responden 200 fallan todos sus caracteres. Sobre las 200 solas un
+    # servidor que rechaza la mitad de la carga parecería igual de preciso
+    caracteres = sum(len(r["palabra"]) for r in registros)
+    caracteres_correctas = sum(len(r["palabra"]) for r in correctas)
+    errores_correctas = sum(min(distancia_edicion(r["texto"], r["palabra"]), len(r["palabra"]))
+                            for r in correctas)
+    errores_caracteres = errores_correctas + caracteres - caracteres_correctas
+    percentiles = np.percentile(latencias, [50, 95, 99]) if len(latencias) else [None] * 3
+    return {
+        "concurrencia": concurrencia,
+        "tasa_objetivo": tasa or None,
+        "duracion_s": round(segundos, 3),
+        "peticiones": len(registros),
+        "correctas": len(correctas),
+        "tasa_errores": round(1 - len(correctas) / len(registros), 4) if registros else None,
+        "codigos": codigos,
+        "rendimiento_rps": round(len(correctas) / segundos, 2),
+        "latencia_ms": {
+            "p50": _redondear(percentiles[0]),
+            "p95": _redondear(percentiles[1]),
+            "p99": _redondear(percentiles[2]),
+            "media": _redondear(latencias.mean()) if len(latencias) else None,
+            "max": _redondear(latencias.max()) if len(latencias) else None,
+        },
+        "acierto_caracteres": round(1 - errores_caracteres / caracteres, 4) if caracteres else None,
+        "acierto_caracteres_correctas": round(1 - errores_correctas / caracteres_correctas, 4)
+                                        if caracteres_correctas else None,
+        "palabras_exactas": round(sum(r["texto"] == r["palabra"] for r in correctas) / len(registros), 4)
+                            if registros else None,
+        "fraccion_cache": round(sum(r["cache"] for r in correctas) / len(correctas), 4) if correctas else None,
+    }
+
+
+def _redondear(valor):
+    return None if valor is None else round(float(valor), 2)
+
+
+def punto_saturacion(barrido, umbral):
+    """
+    Menor concurrencia que alcanza el (1 - umbral) del rendimiento máximo del
+    barrido: a partir de ella más concurrencia solo alarga la cola. Si el
+    máximo está en la última concurrencia puede que aún no se haya saturado.
+    """
+    maximo = max(prueba["rendimiento_rps"] for prueba in barrido)
+    prueba = next(p for p in barrido if p["rendimiento_rps"] >= maximo * (1 - umbral))
+    return {"concurrencia": prueba["concurrencia"],
+            "rendimiento_rps": prueba["rendimiento_rps"],
+            "latencia_p95_ms": prueba["latencia_ms"]["p95"],
+            "rendimiento_maximo_rps": maximo,
+            "maximo_en_la_ultima": barrido[-1]["rendimiento_rps"] == maximo}
+
+
+async def ejecutar(args):
+    imagenes = cargar_imagenes()
+    if not imagenes:
+        raise SystemExit("No hay imágenes verificacion_*.png en imagenes/verificacion")
+
+    limites = httpx.Limits(max_connections=max(args.barrido or [args.concurrencia]))
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limites) as cliente:
+        await esperar_listo(cliente, args.espera_listo)
+        comun = {"url": args.url, "endpoint": args.endpoint, "accept": args.accept or "application/json",
+                 "imagenes": len(imagenes)}
+
+        if args.barrido:
+            barrido = []
+            for concurrencia in args.barrido:
+                registros, segundos = await bucle_cerrado(cliente, args, imagenes, concurrencia)
+                barrido.append(resumir(registros, segundos, concurrencia, 0))
+                print(f"concurrencia {concurrencia:>4}: {barrido[-1]['rendimiento_rps']:>8.2f} pet/s, "
+                      f"p95 {barrido[-1]['latencia_ms']['p95']} ms, errores {barrido[-1]['tasa_errores']:.1%}, "
+                      f"acierto {barrido[-1]['acierto_caracteres']:.1%}", file=sys.stderr)
+            return {**comun, "barrido": barrido, "umbral": args.umbral,
+                    "saturacion": punto_saturacion(barrido, args.umbral)}
+
+        if args.tasa > 0:
+            registros, segundos = await bucle_abierto(cliente, args, imagenes, args.concurrencia)
+        else:
+            registros, segundos = await bucle_cerrado(cliente, args, imagenes, args.concurrencia)
+        return {**comun, **resumir(registros, segundos, args.concurrencia, args.tasa)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="/upload-image/")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--tasa", type=float, default=0.0,
+                        help="peticiones por segundo (0 = bucle cerrado)")
+    parser.add_argument("--duracion", type=float, default=20.0, help="segundos de cada prueba")
+    parser.add_argument("--peticiones", type=int, default=0,
+                        help="número de peticiones en lugar de duración (0 = usar --duracion)")
+    parser.add_argument("--barrido", type=int, nargs="+", help="concurrencias del barrido")
+    parser.add_argument("--umbral", type=float, default=0.05,
+                        help="distancia al rendimiento máximo que se considera saturación")
+    parser.add_argument("--accept", default="", help="cabecera Accept (por ejemplo application/msgpack)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--espera-listo", type=float, default=120.0,
+                        help="segundos como máximo esperando a /ready")
+    parser.add_argument("--salida", help="fichero JSON de resultados (por defecto, la salida estándar)")
+    args = parser.parse_args()
+
+    resultado = asyncio.run(ejecutar(args))
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.salida:
+        Path(args.salida).write_text(texto + "\n", encoding="utf-8")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: clase de model.predict frente al argmax de predict_proba
+
+En el SVC, predict decide por votación uno-contra-uno y predict_proba
+calibra con Platt y acopla los pares, así que el argmax de las
+probabilidades no siempre es la clase de predict. Este script segmenta las
+imágenes de imagenes/verificacion como la API y, con cada regla
+(OCR_CLASE_ARGMAX desactivado y activado), mide cuántas letras coinciden,
+cuántos textos cambian, el acierto frente a la palabra del nombre de los
+ficheros verificacion_NNNNN_<palabra>.png y el tiempo de clasificar todos
+los caracteres de una vez.
+
+Uso:
+    python benchmarks/clase.py [--motor sklearn|lineal] [--repeticiones 3]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+from carga_ocr import distancia_edicion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--motor", default="sklearn", choices=("sklearn", "lineal"))
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    os.environ["OCR_MOTOR"] = args.motor
+    import config
+    import main as api
+    import motor_ocr
+    motor_ocr.cargar_modelo()
+
+    rutas = sorted((RAIZ / "imagenes" / "verificacion").iterdir())
+    extraidos = [motor_ocr.extraer_glifos(api.decodificar_imagen(ruta.read_bytes())[1]) for ruta in rutas]
+    X = np.concatenate([X_img for X_img, _ in extraidos])
+    longitudes = [longitudes for _, longitudes in extraidos]
+    esperadas = {i: ruta.stem.split("_", 2)[2] for i, ruta in enumerate(rutas)
+                 if ruta.name.startswith("verificacion_")}
+
+    reglas = {}
+    for argmax in (False, True):
+        config.CLASE_ARGMAX = argmax
+        mejor = float("inf")
+        for _ in range(args.repeticiones):
+            inicio = time.perf_counter()
+            letras, confidencias = motor_ocr.clasificar_matriz(X)
+            mejor = min(mejor, time.perf_counter() - inicio)
+        textos = [(r or {}).get("texto", "")
+                  for r in motor_ocr.repartir_predicciones(longitudes, letras, confidencias)]
+        reglas["argmax" if argmax else "predict"] = (np.array(letras), textos, mejor)
+
+    (letras_p, textos_p, _), (letras_a, textos_a, _) = reglas["predict"], reglas["argmax"]
+    print(f"Motor {args.motor}: {len(X)} caracteres de {len(rutas)} imágenes")
+    print(f"Letras iguales: {np.mean(letras_p == letras_a)*100:.1f}%, "
+          f"textos distintos: {sum(a != b for a, b in zip(textos_p, textos_a))} de {len(rutas)}")
+    print()
+    print(f"{'regla':<9}{'palabras exactas':>18}{'acierto caracteres':>20}{'clasificación (ms)':>20}")
+    caracteres = sum(len(palabra) for palabra in esperadas.values())
+    for nombre, (_, textos, segundos) in reglas.items():
+        exactas = sum(textos[i] == palabra for i, palabra in esperadas.items())
+        errores = sum(min(distancia_edicion(textos[i], palabra), len(palabra)) for i, palabra in esperadas.items())
+        print(f"{nombre:<9}{f'{exactas}/{len(esperadas)}':>18}{(1 - errores / caracteres)*100:>19.1f}%"
+              f"{segundos * 1000:>20.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: pérdida de accuracy y velocidad del motor lineal con pesos float32, float16 e int8
+
+La referencia es el camino float64 de sklearn (scaler.transform + model.predict y
+model.predict_proba).
+Para cada precisión muestra la memoria de W, la coincidencia de predicciones con
+la referencia en data/test.csv y en los caracteres de imagenes/verificacion
+(segmentados como en la API; data/test.csv son caracteres de entrenamiento),
+la accuracy en data/test.csv, la diferencia máxima de probabilidad y los
+caracteres por segundo con distintos tamaños de lote.
+
+Uso:
+    python benchmarks/cuantizacion.py [--lotes 1 256 2048] [--repeticiones 5]
+"""
+import argparse
+import pickle
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+
+from motor_lineal import PRECISIONES, MotorLineal
+
+
+def cronometrar(funcion, X, repeticiones):
+    """Mejor tiempo de varias ejecuciones de funcion(X), en segundos."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(X)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 256, 2048])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    with open(RAIZ / "models" / "modelo.pkl", "rb") as f:
+        model = pickle.load(f)
+    with open(RAIZ / "models" / "scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+
+    df_test = pd.read_csv(RAIZ / "data" / "test.csv")
+    X_test = df_test.iloc[:, 1:].values.astype(np.uint8)
+    y_test = df_test.iloc[:, 0].values
+
+    X_scaled = scaler.transform(X_test)
+    pred_ref = model.predict(X_scaled)
+    proba_ref = model.predict_proba(X_scaled)
+
+    import main as api
+    import motor_ocr
+    rutas = sorted((RAIZ / "imagenes" / "verificacion").iterdir())
+    X_verificacion = np.concatenate([motor_ocr.extraer_glifos(api.decodificar_imagen(ruta.read_bytes())[1])[0]
+                                     for ruta in rutas])
+    pred_verificacion = model.predict(scaler.transform(X_verificacion))
+    print(f"Modelo: {type(model).__name__}, {len(X_test)} caracteres de test")
+    print(f"Referencia float64 (sklearn): accuracy {np.mean(pred_ref == y_test)*100:.2f}%")
+    print()
+
+    columnas_lote = "".join(f"{f'car/s ({lote})':>16}" for lote in args.lotes)
+    print(f"{'precisión':<10}{'W (MB)':>8}{'iguales':>9}{'iguales verif':>14}{'accuracy':>10}"
+          f"{'máx dif p':>11}{columnas_lote}")
+    for precision in PRECISIONES:
+        motor = MotorLineal.cargar(RAIZ / "models" / "modelo_lineal.npz", precision)
+        pred, proba = motor.clasificar(X_test)
+        iguales_verificacion = np.mean(motor.predict(X_verificacion) == pred_verificacion)
+
+        velocidades = ""
+        for lote in args.lotes:
+            X = np.resize(X_test, (lote, X_test.shape[1]))
+            velocidades += f"{lote / cronometrar(motor.clasificar, X, args.repeticiones):>16.0f}"
+
+        print(f"{precision:<10}{motor.bytes_pesos / 1e6:>8.1f}"
+              f"{np.mean(pred == pred_ref)*100:>8.2f}%{iguales_verificacion*100:>13.2f}%"
+              f"{np.mean(pred == y_test)*100:>9.2f}%"
+              f"{np.abs(proba - proba_ref).max():>11.1e}{velocidades}")
+
+
+if __name__ == "__main__":
+    main()
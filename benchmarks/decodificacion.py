@@ -0,0 +1,120 @@
+"""
+Benchmark: decodificación de fotos JPEG grandes (modo draft de PIL)
+
+Simula fotos de móvil en color: amplía las imágenes verificacion_* por un
+factor, las pega en un lienzo de 4032x3024 (12 Mpx) ligeramente coloreado y
+las guarda como JPEG de calidad 95. Compara la decodificación completa
+(Image.open().convert('L') y después motor_ocr.reducir_imagen, como antes)
+con main.decodificar_imagen, que decodifica en gris y a escala reducida:
+tiempo por imagen, memoria residente máxima que añade cada decodificación
+(medida en un proceso hijo por imagen), píxeles que llegan al segmentador y
+aciertos frente a la palabra del nombre del fichero.
+
+Uso:
+    python benchmarks/decodificacion.py [--imagenes 40] [--factores 2 4 6 10]
+"""
+import argparse
+import ctypes
+import io
+import os
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+
+import main
+import motor_ocr
+
+LIENZO = (4032, 3024)
+
+
+def foto_jpeg(img, factor):
+    """JPEG en color de 12 Mpx con la imagen ampliada por factor en el centro."""
+    grande = img.resize((img.width * factor, img.height * factor), Image.LANCZOS)
+    lienzo = Image.new("L", LIENZO, 255)
+    lienzo.paste(grande, ((LIENZO[0] - grande.width) // 2, (LIENZO[1] - grande.height) // 2))
+    # Papel algo amarillento: la foto es RGB aunque el texto sea gris
+    color = Image.merge("RGB", (lienzo, lienzo, lienzo.point(lambda v: v * 0.9)))
+    salida = io.BytesIO()
+    color.save(salida, "JPEG", quality=95)
+    return salida.getvalue()
+
+
+def decodificar_completa(contents):
+    img_array = np.array(Image.open(io.BytesIO(contents)).convert('L'))
+    return motor_ocr.reducir_imagen(img_array)
+
+
+def decodificar_draft(contents):
+    return main.decodificar_imagen(contents)[1]
+
+
+def memoria_decodificacion(decodificar, contents):
+    """Memoria residente máxima que añade decodificar(contents), medida en un proceso hijo."""
+    lectura, escritura = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # Devuelve al sistema la memoria libre heredada (si no, la decodificación
+        # la reutiliza sin que crezca la memoria residente) y reinicia el máximo
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        antes = memoria_kib("VmRSS")
+        decodificar(contents)
+        os.write(escritura, str((memoria_kib("VmHWM") - antes) * 1024).encode())
+        os._exit(0)
+    os.close(escritura)
+    with os.fdopen(lectura) as f:
+        valor = int(f.read())
+    os.waitpid(pid, 0)
+    return valor
+
+
+def memoria_kib(campo):
+    """Campo de /proc/self/status en KiB (VmRSS, VmHWM...)."""
+    with open("/proc/self/status") as f:
+        for linea in f:
+            if linea.startswith(campo + ":"):
+                return int(linea.split()[1])
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagenes", type=int, default=40)
+    parser.add_argument("--factores", type=int, nargs="+", default=[2, 4, 6, 10])
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    motor_ocr.cargar_modelo()
+    rutas = sorted((RAIZ / "imagenes" / "verificacion").glob("verificacion_*.png"))[:args.imagenes]
+    originales = [Image.open(ruta).convert('L') for ruta in rutas]
+    palabras = [ruta.stem.split("_", 2)[2] for ruta in rutas]
+    modos = {"completa": decodificar_completa, "draft": decodificar_draft}
+
+    print(f"{len(rutas)} fotos JPEG de {LIENZO[0]}x{LIENZO[1]} en color; memoria medida en un proceso hijo por imagen")
+    print(f"{'factor':>6} {'modo':<10}{'MB jpeg':>8}{'ms/imagen':>11}{'MB pico (mediana)':>19}"
+          f"{'Mpx':>7}{'exactos':>9}")
+    for factor in args.factores:
+        fotos = [foto_jpeg(img, factor) for img in originales]
+        megas = sum(map(len, fotos)) / len(fotos) / 1e6
+        for modo, decodificar in modos.items():
+            inicio = time.perf_counter()
+            arrays = [decodificar(contents) for contents in fotos]
+            segundos = (time.perf_counter() - inicio) / len(fotos)
+            pico = statistics.median(memoria_decodificacion(decodificar, contents) for contents in fotos)
+            textos = [(motor_ocr.reconocer_texto(a) or {"texto": ""})["texto"] for a in arrays]
+            exactos = sum(t == p for t, p in zip(textos, palabras))
+            pixeles = sum(a.size for a in arrays) / len(arrays)
+            print(f"{factor:>6} {modo:<10}{megas:>8.1f}{segundos * 1000:>11.0f}{pico / 1e6:>19.1f}"
+                  f"{pixeles / 1e6:>7.2f}{exactos:>9}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,117 @@
+"""
+Benchmark: detector de idioma por n-gramas (FastAPI/idioma.py) frente a langdetect
+
+Reconoce las imágenes de imagenes/verificacion con el motor de la API y
+compara los dos detectores sobre los textos reconocidos y sobre las
+palabras esperadas (el nombre de los ficheros verificacion_XXXXX_<palabra>.png,
+todas en español): tiempo de carga, microsegundos por texto, coincidencia y,
+en las palabras esperadas, cuántas se detectan como español. langdetect puede
+devolver cualquiera de sus 55 idiomas; la coincidencia se da también solo
+sobre los textos en los que elige uno de los idiomas soportados.
+
+Uso:
+    python benchmarks/idioma.py [--repeticiones 5]
+"""
+import argparse
+import sys
+import time
+import warnings
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+
+import idioma
+import motor_ocr
+
+
+def textos_reconocidos():
+    """Textos reconocidos por la API y palabras esperadas de imagenes/verificacion."""
+    motor_ocr.cargar_modelo()
+    reconocidos, esperados = [], []
+    for ruta in sorted((RAIZ / "imagenes" / "verificacion").iterdir()):
+        if ruta.suffix.lower() not in (".png", ".jpg", ".jpeg"):
+            continue
+        img = np.array(Image.open(ruta).convert('L'))
+        texto = motor_ocr.reconocer_texto(img)["texto"]
+        if len(texto.strip()) >= 3:
+            reconocidos.append(texto)
+        if ruta.stem.startswith("verificacion_"):
+            esperados.append(ruta.stem.split("_", 2)[2])
+    return reconocidos, esperados
+
+
+def cronometrar(detectar, textos, repeticiones):
+    """Mejor tiempo medio por texto de varias pasadas, en microsegundos."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        for texto in textos:
+            detectar(texto)
+        mejor = min(mejor, (time.perf_counter() - inicio) / len(textos))
+    return mejor * 1e6
+
+
+def comparar(nombre, textos, detectar_langdetect, detectar_ngramas, esperado=None):
+    """Muestra la coincidencia entre los dos detectores (y sus aciertos si se conoce el idioma)."""
+    de_langdetect = [detectar_langdetect(texto) for texto in textos]
+    de_ngramas = [detectar_ngramas(texto) for texto in textos]
+    iguales = sum(a == b for a, b in zip(de_langdetect, de_ngramas))
+    soportados = [(a, b) for a, b in zip(de_langdetect, de_ngramas) if a in idioma.IDIOMAS]
+    iguales_soportados = sum(a == b for a, b in soportados)
+
+    print(f"{nombre}: {len(textos)} textos")
+    print(f"   coincidencia: {iguales / len(textos) * 100:.1f}%; "
+          f"en los {len(soportados)} que langdetect asigna a un idioma soportado: "
+          f"{iguales_soportados / max(len(soportados), 1) * 100:.1f}%")
+    print(f"   langdetect: {dict(Counter(de_langdetect).most_common(6))}")
+    print(f"   n-gramas:   {dict(Counter(de_ngramas).most_common(6))}")
+    if esperado is not None:
+        print(f"   detectados como '{esperado}': langdetect {de_langdetect.count(esperado) / len(textos) * 100:.1f}%, "
+              f"n-gramas {de_ngramas.count(esperado) / len(textos) * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    reconocidos, esperados = textos_reconocidos()
+
+    inicio = time.perf_counter()
+    from langdetect import DetectorFactory, detect
+    DetectorFactory.seed = 0
+    detect("hola")
+    carga_langdetect = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    detector = idioma.DetectorIdioma.cargar()
+    carga_ngramas = time.perf_counter() - inicio
+
+    def detectar_langdetect(texto):
+        try:
+            return detect(texto)
+        except Exception:
+            return None
+
+    textos = reconocidos + esperados
+    print(f"{'detector':<22}{'carga (ms)':>11}{'µs/texto':>10}")
+    print(f"{'langdetect':<22}{carga_langdetect * 1000:>11.0f}"
+          f"{cronometrar(detectar_langdetect, textos, args.repeticiones):>10.0f}")
+    print(f"{'n-gramas':<22}{carga_ngramas * 1000:>11.0f}"
+          f"{cronometrar(detector.detectar, textos, args.repeticiones):>10.0f}")
+    idioma.detectar(textos[0])
+    print(f"{'n-gramas (en caché)':<22}{'':>11}{cronometrar(idioma.detectar, textos, args.repeticiones):>10.1f}")
+    print()
+
+    comparar("Textos reconocidos", reconocidos, detectar_langdetect, detector.detectar)
+    comparar("Palabras esperadas", esperados, detectar_langdetect, detector.detectar, esperado="es")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: memoria de cada proceso de trabajo según cómo se carga el modelo
+
+Arranca N procesos que importan FastAPI/motor_ocr.py, cargan el modelo y
+clasifican un lote, igual que los procesos de OCR_PROCESOS, y mide con
+/proc/<pid>/smaps_rollup su RSS (memoria residente, contando entera la
+compartida) y su PSS (la compartida repartida entre los procesos que la usan).
+Se comparan el motor sklearn (modelo.pkl), el motor lineal desde
+modelo_lineal.npz y el motor lineal proyectado desde modelo_lineal/ (OCR_MMAP=1).
+
+Solo funciona en Linux. Necesita haber ejecutado
+modelo/fase2_entrenamiento/exportar_modelo.py.
+
+Uso:
+    python benchmarks/memoria.py [--procesos 4]
+"""
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MODOS = {
+    "sklearn (modelo.pkl)": {"OCR_MOTOR": "sklearn"},
+    "lineal (npz)": {"OCR_MOTOR": "lineal"},
+    "lineal (mmap)": {"OCR_MOTOR": "lineal", "OCR_MMAP": "1"},
+}
+
+CODIGO = """
+import sys
+import numpy as np
+import motor_ocr
+motor_ocr.cargar_modelo()
+motor_ocr.clasificar_matriz(np.zeros((256, 784), dtype=np.uint8))
+print("listo", flush=True)
+sys.stdin.readline()
+"""
+
+
+def leer_memoria(pid):
+    """RSS, PSS y memoria privada del proceso en MB."""
+    campos = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == "kB":
+                campos[partes[0].rstrip(":")] = int(partes[1]) / 1024
+    privada = campos.get("Private_Clean", 0) + campos.get("Private_Dirty", 0)
+    return campos["Rss"], campos["Pss"], privada
+
+
+def medir(variables, procesos):
+    """Arranca los procesos, espera a que carguen el modelo y devuelve la memoria de cada uno."""
+    entorno = dict(os.environ, OCR_LOG_NIVEL="WARNING", PYTHONWARNINGS="ignore", **variables)
+    hijos = [subprocess.Popen([sys.executable, "-c", CODIGO], cwd=RAIZ / "FastAPI", env=entorno,
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+             for _ in range(procesos)]
+    try:
+        for hijo in hijos:
+            if hijo.stdout.readline().strip() != "listo":
+                raise RuntimeError(f"El proceso {hijo.pid} no ha cargado el modelo")
+        return [leer_memoria(hijo.pid) for hijo in hijos]
+    finally:
+        for hijo in hijos:
+            hijo.stdin.close()
+            hijo.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--procesos", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{args.procesos} procesos de trabajo; memoria por proceso (media) y PSS total, en MB")
+    print(f"{'modo':<22}{'RSS':>8}{'PSS':>8}{'privada':>9}{'PSS total':>11}")
+    for nombre, variables in MODOS.items():
+        memoria = medir(variables, args.procesos)
+        rss, pss, privada = (sum(columna) / len(memoria) for columna in zip(*memoria))
+        print(f"{nombre:<22}{rss:>8.1f}{pss:>8.1f}{privada:>9.1f}{pss * len(memoria):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark: motor lineal (modelo_lineal.npz) frente a scaler.transform + model.predict + model.predict_proba
+
+Sirve para cualquier modelo de fase2 (SVC, logística o SGD) siempre que
+modelo_lineal.npz se haya exportado a partir del modelo.pkl actual.
+
+Mide caracteres por segundo con distintos tamaños de lote sobre filas de
+data/test.csv y comprueba que ambos motores predicen lo mismo.
+
+Uso:
+    python benchmarks/motor_lineal.py [--lotes 1 16 256 2048] [--repeticiones 5]
+"""
+import argparse
+import pickle
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+
+from motor_lineal import MotorLineal
+
+
+def cronometrar(funcion, X, repeticiones):
+    """Mejor tiempo de varias ejecuciones de funcion(X), en segundos."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(X)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lotes", type=int, nargs="+", default=[1, 16, 256, 2048])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    with open(RAIZ / "models" / "modelo.pkl", "rb") as f:
+        model = pickle.load(f)
+    with open(RAIZ / "models" / "scaler.pkl", "rb") as f:
+        scaler = pickle.load(f)
+    motor = MotorLineal.cargar(RAIZ / "models" / "modelo_lineal.npz")
+
+    X_test = pd.read_csv(RAIZ / "data" / "test.csv").iloc[:, 1:].values.astype(np.uint8)
+
+    def sklearn(X):
+        # Lo que hace la API: la clase de predict y las probabilidades para la confianza
+        X_scaled = scaler.transform(X)
+        return model.predict(X_scaled), model.predict_proba(X_scaled)
+
+    pred_sklearn, proba_sklearn = sklearn(X_test)
+    pred_lineal, proba_lineal = motor.clasificar(X_test)
+    coincidencia = np.mean(pred_sklearn == pred_lineal)
+    print(f"Modelo: {type(model).__name__} (motor lineal {motor.tipo})")
+    print(f"Predicciones iguales: {coincidencia*100:.2f}% de {len(X_test)} caracteres")
+    print(f"Diferencia máxima de probabilidad: {np.abs(proba_sklearn - proba_lineal).max():.2e}")
+    print()
+
+    print(f"{'lote':>6} {'sklearn car/s':>14} {'lineal car/s':>13} {'aceleración':>12}")
+    for lote in args.lotes:
+        # Repetir filas si el lote es mayor que el conjunto de test
+        X = np.resize(X_test, (lote, X_test.shape[1]))
+        t_sklearn = cronometrar(sklearn, X, args.repeticiones)
+        t_lineal = cronometrar(motor.clasificar, X, args.repeticiones)
+        print(f"{lote:>6} {lote / t_sklearn:>14.0f} {lote / t_lineal:>13.0f} {t_sklearn / t_lineal:>11.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: reducción adaptativa de imágenes grandes antes de segmentar
+
+Simula fotos de móvil: amplía las imágenes verificacion_* por un factor
+(con LANCZOS, bordes suaves como en una foto) y las pega en un lienzo blanco
+de 4032x3024 (12 Mpx). Compara el reconocimiento de la imagen grande tal
+cual con el de la imagen reducida por motor_ocr.reducir_imagen: píxeles que
+llegan al segmentador, tiempo por imagen (incluida la reducción) y aciertos
+frente a la palabra del nombre del fichero, exactos y sin contar espacios ni
+mayúsculas (el segmentador separa en espacios los huecos de más de 15 px).
+
+Uso:
+    python benchmarks/reduccion.py [--imagenes 40] [--factores 2 4 6 10]
+"""
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+
+import motor_ocr
+
+# Tamaño de una foto de 12 Mpx
+LIENZO = (4032, 3024)
+
+
+def ampliar(img, factor):
+    """Imagen ampliada por factor y centrada en un lienzo blanco de 12 Mpx."""
+    grande = img.resize((img.width * factor, img.height * factor), Image.LANCZOS)
+    lienzo = Image.new("L", LIENZO, 255)
+    lienzo.paste(grande, ((LIENZO[0] - grande.width) // 2, (LIENZO[1] - grande.height) // 2))
+    return np.array(lienzo)
+
+
+def texto(img_array):
+    """Texto reconocido en la imagen ("" si no hay letras)."""
+    resultado = motor_ocr.reconocer_texto(img_array)
+    return resultado["texto"] if resultado else ""
+
+
+def aciertos(textos, palabras):
+    """(exactos, sin contar espacios ni mayúsculas)"""
+    exactos = sum(t == p for t, p in zip(textos, palabras))
+    parecidos = sum(t.replace(" ", "").lower() == p.lower() for t, p in zip(textos, palabras))
+    return exactos, parecidos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--imagenes", type=int, default=40)
+    parser.add_argument("--factores", type=int, nargs="+", default=[2, 4, 6, 10])
+    args = parser.parse_args()
+
+    warnings.filterwarnings("ignore")
+    motor_ocr.cargar_modelo()
+    rutas = sorted((RAIZ / "imagenes" / "verificacion").glob("verificacion_*.png"))[:args.imagenes]
+    originales = [Image.open(ruta).convert('L') for ruta in rutas]
+    palabras = [ruta.stem.split("_", 2)[2] for ruta in rutas]
+
+    print(f"{len(rutas)} imágenes en un lienzo de {LIENZO[0]}x{LIENZO[1]}; aciertos frente al nombre del fichero")
+    print(f"{'factor':>6} {'modo':<10}{'Mpx':>7}{'ms/imagen':>11}{'exactos':>9}{'sin espacios':>14}")
+    exactos, parecidos = aciertos([texto(np.array(img)) for img in originales], palabras)
+    pixeles = sum(img.width * img.height for img in originales) / len(originales)
+    print(f"{1:>6} {'original':<10}{pixeles / 1e6:>7.2f}{'':>11}{exactos:>9}{parecidos:>14}")
+    for factor in args.factores:
+        grandes = [ampliar(img, factor) for img in originales]
+        for modo in ("completa", "reducida"):
+            pixeles = 0
+            textos = []
+            inicio = time.perf_counter()
+            for grande in grandes:
+                if modo == "reducida":
+                    grande = motor_ocr.reducir_imagen(grande)
+                pixeles += grande.size
+                textos.append(texto(grande))
+            segundos = time.perf_counter() - inicio
+            exactos, parecidos = aciertos(textos, palabras)
+            print(f"{factor:>6} {modo:<10}{pixeles / len(grandes) / 1e6:>7.2f}"
+                  f"{segundos / len(grandes) * 1000:>11.0f}{exactos:>9}{parecidos:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: tamaño y coste de codificar las respuestas de reconocimiento
+
+Genera un resultado del tamaño de una página (por defecto 40 líneas de 60
+caracteres con confidencias aleatorias) y compara, para cada tipo que se
+puede negociar con la cabecera Accept (FastAPI/respuestas.py), los bytes
+de la respuesta y los microsegundos que cuesta generarla, incluida la
+compactación. La forma compacta en JSON se mide con orjson y, como
+referencia, con el json de la librería estándar.
+
+Uso:
+    python benchmarks/respuestas.py [--lineas 40] [--caracteres 60] [--repeticiones 200]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+
+import respuestas
+
+
+def resultado_pagina(lineas, caracteres, semilla=0):
+    """Resultado de reconocimiento sintético con letras del mapping y confidencias en [0, 1]."""
+    rng = np.random.default_rng(semilla)
+    mapping = (RAIZ / "data" / "mapping.txt").read_text(encoding="utf-8").split()[1::2]
+    letras = [mapping[i] for i in rng.integers(0, len(mapping), lineas * caracteres)]
+    confidencias = rng.random(len(letras)).tolist()
+    texto = "\n".join(
+        "".join(" " if letra == "ESPACIO" else letra for letra in letras[i:i + caracteres])
+        for i in range(0, len(letras), caracteres))
+    return {"filename": "pagina.png", "size": 250000, "texto": texto,
+            "confianza_promedio": float(np.mean(confidencias)), "letras": letras,
+            "confidencias": confidencias, "idioma": "🇪🇸 Español"}
+
+
+def cronometrar(funcion, repeticiones):
+    """Mejor tiempo de varias llamadas, en microsegundos."""
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lineas", type=int, default=40)
+    parser.add_argument("--caracteres", type=int, default=60)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    resultado = resultado_pagina(args.lineas, args.caracteres)
+    print(f"Resultado de {args.lineas} líneas x {args.caracteres} caracteres")
+    print(f"{'tipo':<40}{'bytes':>9}{'µs':>9}")
+    for tipo in respuestas.tipos_disponibles():
+        cuerpo = respuestas.codificar(resultado, tipo)
+        segundos = cronometrar(lambda: respuestas.codificar(resultado, tipo), args.repeticiones)
+        print(f"{tipo:<40}{len(cuerpo):>9}{segundos:>9.0f}")
+    if respuestas.orjson is not None:
+        # La forma compacta sin orjson
+        orjson, respuestas.orjson = respuestas.orjson, None
+        try:
+            cuerpo = respuestas.codificar(resultado, respuestas.COMPACTO)
+            segundos = cronometrar(lambda: respuestas.codificar(resultado, respuestas.COMPACTO),
+                                   args.repeticiones)
+            print(f"{respuestas.COMPACTO + ' (json)':<40}{len(cuerpo):>9}{segundos:>9.0f}")
+        finally:
+            respuestas.orjson = orjson
+    if respuestas.msgpack is None:
+        print("msgpack no está instalado: application/msgpack no está disponible")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,27 @@
 """
 Script 2: Entrenar modelo SVM con pixeles crudos
+
+Uso:
+    python entrenar_modelo.py                    # SVC lineal (por defecto)
+    python entrenar_modelo.py --modo logistica   # regresión logística multinomial (softmax)
+    python entrenar_modelo.py --modo sgd         # SGD uno-contra-resto con pérdida logística
+    python entrenar_modelo.py --comparar         # entrena los tres y compara, sin guardar
+
+Si test.csv repite filas de train.csv, esas filas no cuentan como test: si
+no queda ninguna, se aparta un 15 % de train (--apartar) para medir la
+accuracy de test con caracteres que el modelo no ha visto. El modelo que se
+guarda se vuelve a entrenar después con todo train.csv: el conjunto apartado
+solo sirve para medir.
 """
 
+import argparse
+import time
 import numpy as np
 import pandas as pd
 import pickle
 from pathlib import Path
 from sklearn.svm import SVC
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.metrics import accuracy_score
 from sklearn.preprocessing import StandardScaler
 
@@ -15,7 +30,108 @@ DATA_DIR = Path(__file__).parent.parent.parent / "data"
 MODELS_DIR = Path(__file__).parent.parent.parent / "models"
 MODELS_DIR.mkdir(exist_ok=True)
 
+MODOS = ("svc", "logistica", "sgd")
+
+def crear_modelo(modo):
+    """Modelo sin entrenar para cada modo."""
+    if modo == "svc":
+        # Platt con validación cruzada interna y acoplamiento por pares: lento de entrenar y predecir
+        return SVC(C=1.0, kernel='linear', probability=True, random_state=42)
+    if modo == "logistica":
+        # Multinomial: las probabilidades son directamente un softmax
+        return LogisticRegression(C=1.0, max_iter=1000)
+    if modo == "sgd":
+        # Uno-contra-resto; las probabilidades son sigmoides normalizadas
+        return SGDClassifier(loss='log_loss', alpha=1e-4, max_iter=10, tol=1e-3, random_state=42)
+    raise ValueError(f"Modo desconocido: {modo}")
+
+def apartar_test(df_train, df_test, fraccion):
+    """
+    Comprueba que las filas de test no estén también en train.
+    
+    Si lo están, la accuracy de test sería de entrenamiento: se quitan de
+    test y, si no queda ninguna (test.csv es una copia de train.csv), se
+    aparta como test la fracción indicada de las filas distintas de train,
+    con todas sus copias. Con fraccion 0 solo se avisa.
+    """
+    claves_train = pd.util.hash_pandas_object(df_train, index=False)
+    claves_test = pd.util.hash_pandas_object(df_test, index=False)
+    repetidas = claves_test.isin(set(claves_train)).values
+    if not repetidas.any():
+        return df_train, df_test
+    
+    print(f"[AVISO] {repetidas.sum()} de {len(df_test)} filas de test.csv están también en train.csv")
+    if fraccion <= 0:
+        print("[AVISO] Con --apartar 0 la accuracy de test de esas filas es accuracy de entrenamiento")
+        return df_train, df_test
+    
+    df_test = df_test[~repetidas]
+    if len(df_test) == 0:
+        apartadas = set(claves_train.drop_duplicates().sample(frac=fraccion, random_state=42))
+        en_test = claves_train.isin(apartadas).values
+        df_test = df_train[en_test].drop_duplicates()
+        df_train = df_train[~en_test]
+        print(f"[INFO] Test apartado de train.csv: {len(df_test)} filas distintas ({fraccion:.0%})")
+    else:
+        print(f"[INFO] Test sin las filas repetidas: {len(df_test)} muestras")
+    return df_train.reset_index(drop=True), df_test.reset_index(drop=True)
+
+def entrenar_y_evaluar(modo, X_train, y_train, X_test, y_test):
+    """
+    Entrena un modelo y mide tiempo de entrenamiento, velocidad de predicción y accuracy.
+    
+    Igual que en la API, la clase es la de predict y predict_proba da la
+    confianza: la velocidad incluye las dos llamadas.
+    """
+    model = crear_modelo(modo)
+    
+    inicio = time.perf_counter()
+    model.fit(X_train, y_train)
+    segundos_fit = time.perf_counter() - inicio
+    
+    inicio = time.perf_counter()
+    y_test_pred = model.predict(X_test)
+    model.predict_proba(X_test)
+    segundos_predict = time.perf_counter() - inicio
+    
+    y_train_pred = model.predict(X_train)
+    
+    return {
+        "modelo": model,
+        "fit_s": segundos_fit,
+        "caracteres_s": len(X_test) / segundos_predict,
+        "train_acc": accuracy_score(y_train, y_train_pred),
+        "test_acc": accuracy_score(y_test, y_test_pred),
+    }
+
+def comparar(X_train, y_train, X_test, y_test):
+    """Entrena todos los modos y muestra una tabla comparativa."""
+    print("[INFO] Comparando modos (puede tardar varios minutos)...")
+    print()
+    filas = []
+    for modo in MODOS:
+        print(f"   Entrenando {modo}...")
+        filas.append((modo, entrenar_y_evaluar(modo, X_train, y_train, X_test, y_test)))
+    print()
+    
+    print(f"   {'modo':<10} {'fit (s)':>9} {'predict (car/s)':>16} {'train acc':>10} {'test acc':>9}")
+    for modo, r in filas:
+        print(f"   {modo:<10} {r['fit_s']:>9.1f} {r['caracteres_s']:>16.0f} "
+              f"{r['train_acc']*100:>9.2f}% {r['test_acc']*100:>8.2f}%")
+    print()
+    print("No se ha guardado ningún modelo. Para entrenar uno: python entrenar_modelo.py --modo <modo>")
+
 def main():
+    parser = argparse.ArgumentParser(description="Entrenar el clasificador de caracteres")
+    parser.add_argument('--modo', choices=MODOS, default="svc",
+                        help='Tipo de modelo a entrenar y guardar (por defecto svc)')
+    parser.add_argument('--comparar', action='store_true',
+                        help='Entrenar todos los modos y comparar tiempos y accuracy, sin guardar')
+    parser.add_argument('--apartar', type=float, default=0.15,
+                        help='Fracción de train que se aparta como test si test.csv repite sus filas '
+                             '(0 = solo avisar)')
+    args = parser.parse_args()
+    
     print("="*70)
     print("ENTRENAMIENTO SIMPLE (PIXELES CRUDOS - SIN HOG)")
     print("="*70)
@@ -33,6 +149,12 @@ def main():
     print(f"[OK] Test: {len(df_test)} muestras")
     print()
     
+    # train.csv entero: con él se entrena el modelo que se guarda
+    df_completo = df_train
+    df_train, df_test = apartar_test(df_train, df_test, args.apartar)
+    apartado = len(df_train) < len(df_completo)
+    print()
+    
     # Duplicar datos para usar el doble
     df_train = pd.concat([df_train, df_train], ignore_index=True)
     df_test = pd.concat([df_test, df_test], ignore_index=True)
@@ -57,29 +179,41 @@ def main():
     print(f"[OK] Test: {X_test_scaled.shape}")
     print()
     
-    # Entrenar SVM
-    print("[INFO] Entrenando SVM (C=1.0, kernel=linear)...")
-    print("   Esto puede tardar 1-2 minutos...")
+    if args.comparar:
+        comparar(X_train_scaled, y_train, X_test_scaled, y_test)
+        return
+    
+    # Entrenar
+    print(f"[INFO] Entrenando modelo ({args.modo})...")
+    if args.modo == "svc":
+        print("   Esto puede tardar 1-2 minutos...")
     
-    model = SVC(C=1.0, kernel='linear', probability=True, random_state=42)
-    model.fit(X_train_scaled, y_train)
+    resultado = entrenar_y_evaluar(args.modo, X_train_scaled, y_train, X_test_scaled, y_test)
+    model = resultado["modelo"]
+    train_acc = resultado["train_acc"]
+    test_acc = resultado["test_acc"]
     
-    print("[OK] Entrenamiento completado")
+    print(f"[OK] Entrenamiento completado en {resultado['fit_s']:.1f}s")
     print()
     
     # Evaluar
     print("[INFO] Evaluando modelo...")
-    
-    y_train_pred = model.predict(X_train_scaled)
-    train_acc = accuracy_score(y_train, y_train_pred)
-    
-    y_test_pred = model.predict(X_test_scaled)
-    test_acc = accuracy_score(y_test, y_test_pred)
-    
     print(f"   Train Accuracy: {train_acc*100:.2f}%")
     print(f"   Test Accuracy:  {test_acc*100:.2f}%")
+    print(f"   Predicción:     {resultado['caracteres_s']:.0f} caracteres/s")
     print()
     
+    if apartado:
+        # La accuracy se ha medido sin el conjunto apartado, pero el modelo
+        # de la API se entrena con todos los datos, como antes
+        print("[INFO] Reentrenando con todo train.csv para guardar el modelo...")
+        df_completo = pd.concat([df_completo, df_completo], ignore_index=True)
+        scaler = StandardScaler()
+        model = crear_modelo(args.modo)
+        model.fit(scaler.fit_transform(df_completo.iloc[:, 1:].values), df_completo.iloc[:, 0].values)
+        print(f"[OK] Modelo final: {len(df_completo)} muestras")
+        print()
+    
     # Guardar modelo
     print("[INFO] Guardando modelo...")
     model_path = MODELS_DIR / "modelo.pkl"
@@ -99,9 +233,11 @@ def main():
     print("[OK] ENTRENAMIENTO COMPLETADO")
     print("="*70)
     print()
-    print(f"[INFO] Test Accuracy: {test_acc*100:.2f}%")
+    print(f"[INFO] Test Accuracy: {test_acc*100:.2f}%" +
+          (" (medida antes de reentrenar con el conjunto apartado)" if apartado else ""))
     print()
     print("Siguiente paso: python ../fase3_evaluacion/reconocer_texto.py imagen.png")
+    print("Para el motor lineal de la API: python exportar_modelo.py")
 
 if __name__ == "__main__":
     main()
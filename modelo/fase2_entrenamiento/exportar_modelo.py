@@ -0,0 +1,91 @@
+"""
+Script 2b: Exportar el modelo lineal a matrices densas para el motor "lineal" de la API
+
+Pliega el StandardScaler en los pesos del modelo (SVC, logística o SGD) y
+guarda models/modelo_lineal.npz junto con el mapping y una versión, de modo
+que la API lo sirve sin sklearn ni otros ficheros. Guarda lo mismo en
+models/modelo_lineal/ (un .npy por array) para servirlo con OCR_MMAP=1.
+Antes de guardar comprueba que las predicciones coinciden con
+model.predict_proba sobre data/test.csv.
+"""
+
+import sys
+import hashlib
+import numpy as np
+import pandas as pd
+import pickle
+from pathlib import Path
+
+# Paths
+DATA_DIR = Path(__file__).parent.parent.parent / "data"
+MODELS_DIR = Path(__file__).parent.parent.parent / "models"
+API_DIR = Path(__file__).parent.parent.parent / "FastAPI"
+sys.path.insert(0, str(API_DIR))
+
+from motor_lineal import MotorLineal, exportar, guardar_directorio
+
+# Fracción mínima de predicciones iguales al modelo original para aceptar la exportación
+COINCIDENCIA_MINIMA = 0.999
+
+def main():
+    print("="*70)
+    print("EXPORTAR MODELO LINEAL (SCALER PLEGADO EN LOS PESOS)")
+    print("="*70)
+    print()
+    
+    print("[INFO] Cargando modelo, scaler y mapping...")
+    rutas = [MODELS_DIR / "modelo.pkl", MODELS_DIR / "scaler.pkl", DATA_DIR / "mapping.txt"]
+    contenidos = [ruta.read_bytes() for ruta in rutas]
+    model = pickle.loads(contenidos[0])
+    scaler = pickle.loads(contenidos[1])
+    mapping = [line.split() for line in contenidos[2].decode('utf-8').splitlines() if line.strip()]
+    
+    arrays = exportar(model, scaler)
+    arrays["etiquetas"] = np.array([int(label) for label, _ in mapping])
+    arrays["letras"] = np.array([letter for _, letter in mapping])
+    # Versión: huella de los ficheros de origen, distinta de la del motor sklearn
+    huella = hashlib.sha256(b"lineal")
+    for contenido in contenidos:
+        huella.update(contenido)
+    arrays["version"] = np.array(huella.hexdigest()[:12])
+    motor = MotorLineal.desde_arrays(arrays)
+    print(f"[OK] {type(model).__name__} -> {motor.tipo}: {len(motor.classes_)} clases, W {motor.W.shape} float32")
+    print()
+    
+    # Verificar contra el modelo original
+    test_path = DATA_DIR / "test.csv"
+    if test_path.exists():
+        print("[INFO] Verificando contra model.predict y model.predict_proba en test.csv...")
+        df_test = pd.read_csv(test_path)
+        X_test = df_test.iloc[:, 1:].values
+        y_test = df_test.iloc[:, 0].values
+        
+        X_scaled = scaler.transform(X_test)
+        pred_original = model.predict(X_scaled)
+        proba_original = model.predict_proba(X_scaled)
+        pred_lineal, proba_lineal = motor.clasificar(X_test)
+        
+        coincidencia = np.mean(pred_original == pred_lineal)
+        print(f"   Predicciones iguales: {coincidencia*100:.2f}% de {len(X_test)}")
+        print(f"   Diferencia máxima de probabilidad: {np.abs(proba_original - proba_lineal).max():.2e}")
+        print(f"   Accuracy original: {np.mean(pred_original == y_test)*100:.2f}%")
+        print(f"   Accuracy lineal:   {np.mean(pred_lineal == y_test)*100:.2f}%")
+        print()
+        
+        if coincidencia < COINCIDENCIA_MINIMA:
+            print(f"[ERROR] Coincidencia por debajo de {COINCIDENCIA_MINIMA*100:.1f}%; no se exporta")
+            sys.exit(1)
+    else:
+        print(f"[AVISO] No existe {test_path}; se exporta sin verificar")
+        print()
+    
+    salida = MODELS_DIR / "modelo_lineal.npz"
+    np.savez(salida, **arrays)
+    print(f"[OK] Modelo lineal: {salida} (versión {arrays['version']})")
+    guardar_directorio(arrays, MODELS_DIR / "modelo_lineal")
+    print(f"[OK] Modelo lineal para mmap: {MODELS_DIR / 'modelo_lineal'}")
+    print()
+    print("Siguiente paso: OCR_MOTOR=lineal python ../../FastAPI/main.py")
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,34 @@ Version standalone sin dependencias de FASE2
 """
 
 import numpy as np
-from typing import List
+from typing import Iterator, List
 from PIL import Image
-from skimage import filters
-from scipy import ndimage
+
+
+def _otsu(image: np.ndarray) -> float:
+    """
+    Umbral de Otsu con numpy (mismo resultado que skimage.filters.threshold_otsu
+    para imágenes de enteros: un bin por valor de gris).
+    """
+    image = np.asarray(image)
+    if image.dtype.kind not in "ui":
+        image = np.round(image).astype(np.int64)
+    minimo, maximo = int(image.min()), int(image.max())
+    if minimo == maximo:
+        return minimo
+    
+    hist = np.bincount((image.ravel() - minimo).astype(np.intp),
+                       minlength=maximo - minimo + 1).astype(np.float64)
+    centros = np.arange(minimo, maximo + 1, dtype=np.float64)
+    
+    # Peso y media de cada clase para todos los umbrales posibles
+    peso1 = np.cumsum(hist)
+    peso2 = np.cumsum(hist[::-1])[::-1]
+    media1 = np.cumsum(hist * centros) / peso1
+    media2 = (np.cumsum((hist * centros)[::-1]) / peso2[::-1])[::-1]
+    
+    varianza_entre_clases = peso1[:-1] * peso2[1:] * (media1[:-1] - media2[1:]) ** 2
+    return centros[np.argmax(varianza_entre_clases)]
 
 
 class SimpleImageSegmenter:
@@ -28,8 +52,20 @@ class SimpleImageSegmenter:
         Returns:
             Lista de líneas, cada una con una lista de imágenes de caracteres (28x28 cada una)
         """
+        return list(self.iter_lines(image))
+    
+    def iter_lines(self, image: np.ndarray) -> Iterator[List[np.ndarray]]:
+        """
+        Igual que segment_image, pero devuelve cada línea en cuanto está segmentada.
+        
+        Args:
+            image: Imagen en escala de grises (numpy array)
+        
+        Yields:
+            Lista de imágenes de caracteres (28x28 cada una) de cada línea con contenido
+        """
         if image.size == 0:
-            return []
+            return
         
         # Asegurar que es escala de grises
         if len(image.shape) == 3:
@@ -37,7 +73,7 @@ class SimpleImageSegmenter:
         
         # Verificar que la imagen tiene contenido
         if np.max(image) == np.min(image):
-            return []  # Imagen uniforme, sin contenido
+            return  # Imagen uniforme, sin contenido
         
         # Binarizar
         binary = self._binarize(image)
@@ -52,7 +88,7 @@ class SimpleImageSegmenter:
         if white_pixels < 10:
             if self.debug:
                 print("DEBUG - Muy pocos pixeles blancos, retornando vacio")
-            return []
+            return
         
         # Encontrar límites de líneas
         line_boundaries = self._find_line_boundaries(binary)
@@ -61,18 +97,12 @@ class SimpleImageSegmenter:
             print(f"DEBUG - Líneas encontradas: {len(line_boundaries)}")
             print(f"DEBUG - Line boundaries: {line_boundaries}")
         
-        if not line_boundaries:
-            return []
-        
         # Segmentar cada línea en caracteres
-        all_lines = []
         for y_start, y_end in line_boundaries:
             line_img = self._extract_line(binary, y_start, y_end)
             characters = self.segment_line(line_img)
-            if characters:  # Solo agregar si tiene caracteres
-                all_lines.append(characters)
-        
-        return all_lines
+            if characters:  # Solo devolver si tiene caracteres
+                yield characters
     
     def segment_line(self, image: np.ndarray) -> List[np.ndarray]:
         """
@@ -143,11 +173,11 @@ class SimpleImageSegmenter:
                 binary = (image < threshold).astype(np.uint8) * 255
             elif mean_val > 127:
                 # Fondo claro normal, usar Otsu
-                threshold = filters.threshold_otsu(image)
+                threshold = _otsu(image)
                 binary = (image < threshold).astype(np.uint8) * 255
             else:
                 # Fondo oscuro, texto claro
-                threshold = filters.threshold_otsu(image)
+                threshold = _otsu(image)
                 binary = (image > threshold).astype(np.uint8) * 255
             
             return binary
@@ -0,0 +1,17 @@
+"""
+Configuración común de las pruebas.
+
+Los módulos del servicio están en FastAPI/ y se importan como en el
+servidor. Las variables de entorno se fijan antes de importar config, para
+que las pruebas no escriban la caché SQLite ni imágenes de debug.
+"""
+import os
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ / "FastAPI"))
+
+os.environ.setdefault("OCR_CACHE_SQLITE", "")
+os.environ.setdefault("OCR_DEBUG_IMAGENES", "0")
+os.environ.setdefault("OCR_CALENTAMIENTO", "0")
@@ -0,0 +1,92 @@
+"""
+CacheResultados: expulsión LRU por bytes en memoria y recorte del nivel SQLite.
+"""
+import itertools
+import json
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+import cache_resultados
+from cache_resultados import CacheResultados
+
+
+def tamano(resultado):
+    return len(json.dumps(resultado, ensure_ascii=False).encode("utf-8"))
+
+
+def test_lru_expulsa_por_bytes():
+    resultados = {f"k{i}": {"texto": str(i) * 10} for i in range(4)}
+    # Caben exactamente tres resultados
+    cache = CacheResultados(3 * tamano(resultados["k0"]))
+    for clave in ("k0", "k1", "k2"):
+        cache.guardar(clave, resultados[clave])
+    # Usar k0 lo convierte en el más reciente: al añadir k3 sale k1
+    assert cache.obtener("k0") == ("memoria", resultados["k0"])
+    cache.guardar("k3", resultados["k3"])
+    
+    assert cache.obtener("k1") == (None, None)
+    for clave in ("k0", "k2", "k3"):
+        assert cache.obtener(clave) == ("memoria", resultados[clave])
+    assert cache.estadisticas()["bytes_memoria"] == 3 * tamano(resultados["k0"])
+
+
+def test_resultado_mayor_que_la_memoria_no_se_guarda():
+    cache = CacheResultados(10)
+    cache.guardar("grande", {"texto": "x" * 100})
+    assert cache.obtener("grande") == (None, None)
+    assert cache.estadisticas()["bytes_memoria"] == 0
+
+
+def test_acierto_en_disco_pasa_a_memoria(tmp_path):
+    ruta = tmp_path / "cache.sqlite"
+    CacheResultados(1 << 20, ruta).guardar("k", {"texto": "hola"})
+    
+    cache = CacheResultados(1 << 20, ruta)
+    assert cache.obtener("k") == ("disco", {"texto": "hola"})
+    assert cache.obtener("k") == ("memoria", {"texto": "hola"})
+    cache.cerrar()
+
+
+def test_recorte_del_disco_conserva_las_mas_recientes(tmp_path, monkeypatch):
+    # Reloj que avanza en cada inserción para que el orden por creado sea exacto
+    reloj = itertools.count()
+    monkeypatch.setattr(cache_resultados, "time", SimpleNamespace(time=lambda: float(next(reloj))))
+    cache = CacheResultados(0, tmp_path / "cache.sqlite", max_filas_disco=10, intervalo_poda=5)
+    for i in range(23):
+        cache.guardar(f"k{i}", {"i": i})
+    claves = [fila[0] for fila in cache.conexion.execute("SELECT clave FROM resultados ORDER BY creado")]
+    # El último recorte fue en la inserción 20; después se han añadido 3 filas
+    assert claves == [f"k{i}" for i in range(10, 23)]
+    assert cache.obtener("k9") == (None, None)
+    assert cache.obtener("k22") == ("disco", {"i": 22})
+    cache.cerrar()
+
+
+def test_indice_sobre_creado(tmp_path):
+    cache = CacheResultados(0, tmp_path / "cache.sqlite")
+    plan = " ".join(fila[-1] for fila in cache.conexion.execute(
+        "EXPLAIN QUERY PLAN SELECT clave FROM resultados ORDER BY creado LIMIT 5"))
+    assert "resultados_creado" in plan
+    cache.cerrar()
+
+
+def test_aciertos_en_memoria_no_esperan_a_sqlite(tmp_path):
+    cache = CacheResultados(1 << 20, tmp_path / "cache.sqlite")
+    cache.guardar("k", {"texto": "hola"})
+    # Con el lock del disco ocupado, la memoria sigue respondiendo
+    with cache.lock_disco:
+        resultado = []
+        hilo = threading.Thread(target=lambda: resultado.append(cache.obtener("k")))
+        hilo.start()
+        hilo.join(timeout=2)
+        assert resultado == [("memoria", {"texto": "hola"})]
+    cache.cerrar()
+
+
+def test_clave_depende_de_la_version_y_la_forma():
+    img = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    assert CacheResultados.clave(img, "v1") == CacheResultados.clave(img.copy(), "v1")
+    assert CacheResultados.clave(img, "v1") != CacheResultados.clave(img, "v2")
+    assert CacheResultados.clave(img, "v1") != CacheResultados.clave(img.reshape(4, 3), "v1")
@@ -0,0 +1,47 @@
+"""
+EscritorDebug: la retención por tamaño cuenta la carpeta entera, también
+lo que guardan otros procesos.
+"""
+from PIL import Image
+
+from debug_imagenes import EscritorDebug
+
+
+def imagen(semilla):
+    """BMP de 32x32 (unos 3 KB) con contenido distinto para cada semilla."""
+    return Image.frombytes("RGB", (32, 32), bytes((semilla + i) % 256 for i in range(32 * 32 * 3)))
+
+
+def tamano_carpeta(directorio):
+    return sum(ruta.stat().st_size for ruta in directorio.iterdir())
+
+
+def test_limite_compartido_entre_escritores(tmp_path):
+    max_bytes = 20 * 1024
+    # Dos procesos servidor con --workers: cada uno tiene su escritor sobre la misma carpeta
+    escritores = [EscritorDebug(tmp_path, max_bytes=max_bytes) for _ in range(2)]
+    
+    for i in range(20):
+        for n, escritor in enumerate(escritores):
+            escritor.enviar(imagen(i), f"proceso{n}_{i}.bmp")
+    for escritor in escritores:
+        escritor.cerrar()
+    
+    assert sum(escritor.guardadas for escritor in escritores) == 40
+    assert 0 < tamano_carpeta(tmp_path) <= max_bytes
+    # Se conservan las más recientes de los dos
+    nombres = {ruta.name.split("_", 3)[-1] for ruta in tmp_path.iterdir()}
+    assert {"proceso0_19.bmp", "proceso1_19.bmp"} <= nombres
+
+
+def test_cuenta_las_imagenes_ya_existentes(tmp_path):
+    imagen(0).save(tmp_path / "anterior.bmp")
+    tamano = tamano_carpeta(tmp_path)
+    
+    escritor = EscritorDebug(tmp_path, max_bytes=tamano + 100)
+    assert escritor.estadisticas()["bytes_en_disco"] == tamano
+    escritor.enviar(imagen(1), "nueva.bmp")
+    escritor.cerrar()
+    
+    assert [ruta.name.split("_", 3)[-1] for ruta in tmp_path.iterdir()] == ["nueva.bmp"]
+    assert escritor.estadisticas()["bytes_en_disco"] == tamano
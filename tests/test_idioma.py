@@ -0,0 +1,79 @@
+"""
+Detección de idioma con perfiles de n-gramas.
+"""
+import numpy as np
+import pytest
+
+import idioma
+from idioma import DetectorIdioma
+
+FRASES = {
+    "es": "El perro de mi vecino ladra todas las noches cuando sale la luna",
+    "en": "The quick brown fox jumps over the lazy dog while the children watch",
+    "ca": "El gos del meu veí borda cada nit quan surt la lluna i tothom es desperta",
+    "fr": "Le chien de mon voisin aboie toutes les nuits quand la lune se lève",
+    "de": "Der Hund meines Nachbarn bellt jede Nacht, wenn der Mond aufgeht",
+    "it": "Il cane del mio vicino abbaia tutte le notti quando sorge la luna",
+    "pt": "O cão do meu vizinho ladra todas as noites quando a lua nasce",
+}
+
+
+def test_ngramas_por_palabra_en_minusculas():
+    assert idioma.ngramas("Sí, 2 yo!") == [
+        "s", "í", " s", "sí", "í ", " sí", "sí ",
+        "y", "o", " y", "yo", "o ", " yo", "yo ",
+    ]
+
+
+@pytest.mark.parametrize("texto", ["", "   ", "123 ,;", "\n\n"])
+def test_sin_letras(texto):
+    assert idioma.ngramas(texto) == []
+    assert idioma.detector().puntuaciones(texto) is None
+    assert idioma.detectar(texto) is None
+
+
+@pytest.mark.parametrize("codigo, frase", FRASES.items())
+def test_detecta_cada_idioma_soportado(codigo, frase):
+    assert idioma.detectar(frase) == codigo
+    assert codigo in idioma.IDIOMAS
+
+
+def test_perfiles_solo_de_los_idiomas_de_la_api():
+    assert sorted(idioma.detector().idiomas) == sorted(idioma.IDIOMAS)
+
+
+def detector_sintetico():
+    """Dos idiomas con un n-grama de cada longitud por letra; x prefiere 'a' e y prefiere 'b'."""
+    ngramas = ["a", "b", " a", "a ", " b", "b ", " a ", " b "]
+    x = [100, 10, 100, 100, 10, 10, 100, 10]
+    y = [10, 100, 10, 10, 100, 100, 10, 100]
+    frecuencias = np.array([x, y]).T
+    totales = np.array([[110, 220, 110], [110, 220, 110]])
+    return DetectorIdioma(ngramas, frecuencias, totales, ["x", "y"])
+
+
+def test_puntuacion_de_ngramas_conocidos():
+    detector = detector_sintetico()
+    
+    assert detector.detectar("a") == "x"
+    assert detector.detectar("b") == "y"
+    # "a": 'a', ' a', 'a ' y ' a '
+    esperada = np.log(100 / 110) + 2 * np.log(100 / 220) + np.log(100 / 110)
+    np.testing.assert_allclose(detector.puntuaciones("a")[0], esperada, rtol=1e-6)
+
+
+def test_ngrama_desconocido_cuenta_como_la_mitad_de_la_frecuencia_minima():
+    detector = detector_sintetico()
+    
+    # 'z', ' z', 'z ' y ' z ' no están en ningún perfil: la mínima de cada longitud es 10
+    esperada = np.log(5 / 110) + 2 * np.log(5 / 220) + np.log(5 / 110)
+    np.testing.assert_allclose(detector.puntuaciones("z"), [esperada, esperada], rtol=1e-6)
+
+
+def test_resultado_determinista_y_en_cache():
+    idioma.detectar.cache_clear()
+    
+    resultados = {idioma.detectar(FRASES["it"]) for _ in range(5)}
+    
+    assert resultados == {"it"}
+    assert idioma.detectar.cache_info().hits == 4
@@ -0,0 +1,138 @@
+"""
+LimiteCuerpo: 413 cuando el cuerpo supera el máximo, con Content-Length y
+sin él (transferencia por trozos).
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from limite_cuerpo import LimiteCuerpo
+
+MAX_BYTES = 1000
+
+
+def crear_app(max_bytes=MAX_BYTES):
+    """Aplicación con un endpoint que lee el cuerpo entero y otro con un formulario."""
+    app = FastAPI()
+    
+    @app.post("/cuerpo")
+    async def cuerpo(request: Request):
+        return {"bytes": len(await request.body())}
+    
+    @app.post("/archivo")
+    async def archivo(file: UploadFile = File(...)):
+        return {"bytes": len(await file.read())}
+    
+    app.add_middleware(LimiteCuerpo, max_bytes=max_bytes)
+    return app
+
+
+def trozos(total, tamano=100):
+    """Generador del cuerpo en trozos: httpx lo envía sin Content-Length."""
+    for inicio in range(0, total, tamano):
+        yield b"x" * min(tamano, total - inicio)
+
+
+@pytest.mark.parametrize("total", [0, MAX_BYTES])
+def test_dentro_del_limite(total):
+    cliente = TestClient(crear_app())
+    
+    assert cliente.post("/cuerpo", content=b"x" * total).json() == {"bytes": total}
+    assert cliente.post("/cuerpo", content=trozos(total)).json() == {"bytes": total}
+
+
+def test_content_length_mayor_que_el_limite():
+    respuesta = TestClient(crear_app()).post("/cuerpo", content=b"x" * (MAX_BYTES + 1))
+    
+    assert respuesta.status_code == 413
+    assert str(MAX_BYTES) in respuesta.json()["detail"]
+    assert respuesta.headers["connection"] == "close"
+
+
+def test_por_trozos_mayor_que_el_limite():
+    respuesta = TestClient(crear_app()).post("/cuerpo", content=trozos(MAX_BYTES + 1))
+    
+    assert respuesta.status_code == 413
+
+
+def test_formulario_grande_responde_413_y_no_400():
+    # FastAPI convierte los errores al leer el formulario en un 400: el
+    # middleware descarta esa respuesta y deja su 413
+    cabecera = (b"--frontera\r\n"
+                b'Content-Disposition: form-data; name="file"; filename="grande.bin"\r\n'
+                b"Content-Type: application/octet-stream\r\n\r\n")
+    
+    def formulario(total):
+        yield cabecera
+        yield from trozos(total)
+        yield b"\r\n--frontera--\r\n"
+    
+    cliente = TestClient(crear_app())
+    tipo = {"Content-Type": "multipart/form-data; boundary=frontera"}
+    
+    assert cliente.post("/archivo", content=formulario(500), headers=tipo).json() == {"bytes": 500}
+    assert cliente.post("/archivo", content=formulario(4 * MAX_BYTES), headers=tipo).status_code == 413
+
+
+def test_sin_limite():
+    cliente = TestClient(crear_app(max_bytes=0))
+    
+    assert cliente.post("/cuerpo", content=b"x" * (10 * MAX_BYTES)).json() == {"bytes": 10 * MAX_BYTES}
+
+
+def llamar(cabeceras, mensajes):
+    """
+    Llama al middleware delante de una aplicación que lee todo el cuerpo.
+    Devuelve (mensajes enviados, mensajes leídos de receive, bytes que llegaron a la aplicación).
+    """
+    recibido = []
+    enviados = []
+    pendientes = list(mensajes)
+    
+    async def aplicacion(scope, receive, send):
+        while True:
+            mensaje = await receive()
+            recibido.append(mensaje.get("body", b""))
+            if not mensaje.get("more_body", False):
+                break
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+    
+    async def receive():
+        return pendientes.pop(0)
+    
+    async def send(mensaje):
+        enviados.append(mensaje)
+    
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": cabeceras}
+    asyncio.run(LimiteCuerpo(aplicacion, MAX_BYTES)(scope, receive, send))
+    return enviados, len(mensajes) - len(pendientes), sum(map(len, recibido))
+
+
+def test_content_length_rechaza_sin_leer_el_cuerpo():
+    enviados, leidos, _ = llamar([(b"content-length", str(MAX_BYTES + 1).encode())],
+                                 [{"type": "http.request", "body": b"x" * (MAX_BYTES + 1)}])
+    
+    assert enviados[0]["status"] == 413
+    assert leidos == 0
+
+
+def test_por_trozos_rechaza_sin_esperar_al_resto():
+    mensajes = [{"type": "http.request", "body": b"x" * 400, "more_body": True} for _ in range(10)]
+    enviados, leidos, llegados = llamar([], mensajes)
+    
+    assert [m["status"] for m in enviados if m["type"] == "http.response.start"] == [413]
+    # El tercer trozo pasa de 1000 bytes: los siete restantes no se leen
+    assert leidos == 3
+    assert llegados == 800
+
+
+def test_content_length_falso():
+    mensajes = [{"type": "http.request", "body": b"x" * 600, "more_body": True},
+                {"type": "http.request", "body": b"x" * 600, "more_body": False}]
+    enviados, _, llegados = llamar([(b"content-length", b"10")], mensajes)
+    
+    assert enviados[0]["status"] == 413
+    assert llegados == 600
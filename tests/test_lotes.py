@@ -0,0 +1,92 @@
+"""
+Límites de /upload-images/ con archivos .zip: número de entradas y bytes
+una vez descomprimidos.
+"""
+import asyncio
+import io
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+import config
+import main
+import motor_ocr
+
+
+def crear_zip(entradas):
+    """Bytes de un zip con las entradas {nombre: datos}, comprimidas con deflate."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, datos in entradas.items():
+            zf.writestr(nombre, datos)
+    return buffer.getvalue()
+
+
+def leer(archivos):
+    """Ejecuta main.leer_archivos_lote con [(filename, bytes)]."""
+    files = [UploadFile(io.BytesIO(datos), filename=nombre) for nombre, datos in archivos]
+    return asyncio.run(main.leer_archivos_lote(files))
+
+
+@pytest.fixture
+def limites(monkeypatch):
+    """Límites pequeños del lote: 4 archivos y 1 MB."""
+    monkeypatch.setattr(config, "MAX_ARCHIVOS_LOTE", 4)
+    monkeypatch.setattr(config, "MAX_BYTES_LOTE", 1024 * 1024)
+
+
+def test_zip_dentro_de_los_limites(limites):
+    zip_bytes = crear_zip({"a.png": b"a" * 1000, "carpeta/b.png": b"b" * 2000})
+    archivos = leer([("imagenes.zip", zip_bytes), ("c.png", b"c" * 10)])
+    assert archivos == [("imagenes.zip/a.png", b"a" * 1000),
+                        ("imagenes.zip/carpeta/b.png", b"b" * 2000),
+                        ("c.png", b"c" * 10)]
+
+
+def test_zip_que_se_expande_por_encima_del_limite(limites):
+    zip_bytes = crear_zip({"bomba.png": bytes(8 * 1024 * 1024)})
+    assert len(zip_bytes) < 64 * 1024
+    with pytest.raises(HTTPException) as error:
+        leer([("bomba.zip", zip_bytes)])
+    assert error.value.status_code == 413
+
+
+def test_bytes_acumulados_entre_entradas(limites):
+    # Ninguna entrada supera el límite por sí sola, pero sí todas juntas
+    zip_bytes = crear_zip({f"{i}.png": bytes(400 * 1024) for i in range(3)})
+    with pytest.raises(HTTPException) as error:
+        leer([("lote.zip", zip_bytes)])
+    assert error.value.status_code == 413
+
+
+def test_demasiadas_entradas(limites):
+    zip_bytes = crear_zip({f"{i}.png": b"x" for i in range(5)})
+    with pytest.raises(HTTPException) as error:
+        leer([("lote.zip", zip_bytes)])
+    assert error.value.status_code == 413
+
+
+def test_tamano_falso_en_la_cabecera(limites):
+    # La cabecera declara 10 bytes pero la entrada ocupa 8 MB: no se
+    # descomprime más de lo declarado y el zip se rechaza como no válido
+    zip_bytes = bytearray(crear_zip({"bomba.png": bytes(8 * 1024 * 1024)}))
+    with zipfile.ZipFile(io.BytesIO(bytes(zip_bytes))) as zf:
+        info = zf.infolist()[0]
+    central = zip_bytes.rindex(b"PK\x01\x02")
+    zip_bytes[central + 24:central + 28] = (10).to_bytes(4, "little")
+    zip_bytes[info.header_offset + 22:info.header_offset + 26] = (10).to_bytes(4, "little")
+    with pytest.raises(zipfile.BadZipFile):
+        leer([("bomba.zip", bytes(zip_bytes))])
+
+
+def test_endpoint_responde_413(limites, monkeypatch):
+    # El límite se comprueba antes de reconocer nada: basta con que haya modelo
+    monkeypatch.setattr(motor_ocr, "modelo_activo", SimpleNamespace(version="prueba"))
+    zip_bytes = crear_zip({"bomba.png": bytes(8 * 1024 * 1024)})
+    respuesta = TestClient(main.app).post(
+        "/upload-images/", files=[("files", ("bomba.zip", zip_bytes, "application/zip"))])
+    assert respuesta.status_code == 413
+    assert "bytes" in respuesta.json()["detail"]
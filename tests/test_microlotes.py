@@ -0,0 +1,126 @@
+"""
+PlanificadorLotes: agrupación de peticiones, reparto de las predicciones y
+propagación de errores y cancelaciones a todas las peticiones del lote.
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from microlotes import PlanificadorLotes
+
+
+def matriz(filas, valor):
+    return np.full((filas, 784), valor, dtype=np.uint8)
+
+
+def ejecutar(corrutina):
+    return asyncio.run(asyncio.wait_for(corrutina, timeout=5))
+
+
+def test_agrupa_y_reparte_en_orden():
+    llamadas = []
+    
+    async def clasificar(X):
+        llamadas.append(len(X))
+        return [f"c{fila[0]}" for fila in X], X[:, 0] / 10
+    
+    async def prueba():
+        planificador = PlanificadorLotes(0.05, 1000, clasificar)
+        return await asyncio.gather(planificador.clasificar(matriz(2, 1)),
+                                    planificador.clasificar(matriz(3, 2)))
+    
+    (letras_a, conf_a), (letras_b, conf_b) = ejecutar(prueba())
+    assert llamadas == [5]
+    assert letras_a == ["c1", "c1"] and letras_b == ["c2", "c2", "c2"]
+    np.testing.assert_allclose(conf_b, [0.2, 0.2, 0.2])
+
+
+def test_max_glifos_despacha_sin_esperar():
+    llamadas = []
+    
+    async def clasificar(X):
+        llamadas.append(len(X))
+        return ["x"] * len(X), np.ones(len(X))
+    
+    async def prueba():
+        # Con una ventana de 10 s la prueba solo termina a tiempo si no se espera
+        planificador = PlanificadorLotes(10, 4, clasificar)
+        return await asyncio.gather(planificador.clasificar(matriz(2, 0)),
+                                    planificador.clasificar(matriz(2, 0)))
+    
+    ejecutar(prueba())
+    assert llamadas == [4]
+
+
+def test_error_llega_a_todas_las_peticiones():
+    async def clasificar(X):
+        raise ValueError("modelo roto")
+    
+    async def prueba():
+        planificador = PlanificadorLotes(0.01, 1000, clasificar)
+        return await asyncio.gather(planificador.clasificar(matriz(1, 0)),
+                                    planificador.clasificar(matriz(1, 0)),
+                                    return_exceptions=True)
+    
+    resultados = ejecutar(prueba())
+    assert len(resultados) == 2
+    assert all(isinstance(r, ValueError) and str(r) == "modelo roto" for r in resultados)
+
+
+@pytest.mark.parametrize("empezada", [False, True])
+def test_cancelar_la_clasificacion_no_deja_peticiones_esperando(empezada):
+    dentro = None
+    
+    async def clasificar(X):
+        dentro.set()
+        await asyncio.sleep(3600)
+    
+    async def prueba():
+        nonlocal dentro
+        dentro = asyncio.Event()
+        planificador = PlanificadorLotes(0.01, 1000, clasificar)
+        despachar = planificador._despachar
+        
+        def despachar_y_cancelar():
+            # Cancelada en el mismo paso en que se crea: antes de entrar en _ejecutar
+            despachar()
+            for tarea in planificador.tareas:
+                tarea.cancel()
+        
+        if not empezada:
+            planificador._despachar = despachar_y_cancelar
+        peticiones = [asyncio.ensure_future(planificador.clasificar(matriz(1, 0))) for _ in range(2)]
+        if empezada:
+            await dentro.wait()
+            for tarea in planificador.tareas:
+                tarea.cancel()
+        resultados = await asyncio.gather(*peticiones, return_exceptions=True)
+        return resultados, dentro.is_set()
+    
+    resultados, entro = ejecutar(prueba())
+    assert entro == empezada
+    assert all(isinstance(r, RuntimeError) for r in resultados)
+
+
+def test_guarda_la_tarea_mientras_clasifica():
+    continuar = None
+    
+    async def clasificar(X):
+        await continuar.wait()
+        return ["x"] * len(X), np.ones(len(X))
+    
+    async def prueba():
+        nonlocal continuar
+        continuar = asyncio.Event()
+        planificador = PlanificadorLotes(0.01, 1000, clasificar)
+        peticion = asyncio.ensure_future(planificador.clasificar(matriz(1, 0)))
+        while not planificador.tareas:
+            await asyncio.sleep(0.01)
+        assert len(planificador.tareas) == 1
+        continuar.set()
+        await peticion
+        await asyncio.sleep(0)
+        return planificador.tareas
+    
+    assert ejecutar(prueba()) == set()
@@ -0,0 +1,112 @@
+"""
+MotorLineal frente a los estimadores de sklearn de los que se exporta, y la
+regla de la clase en motor_ocr.clasificar_matriz.
+
+Los modelos se entrenan aquí con datos sintéticos (pocas clases, píxeles
+uint8), así que no hace falta models/modelo.pkl.
+"""
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+import config
+import motor_lineal
+import motor_ocr
+from motor_lineal import MotorLineal
+
+
+def datos(clases=6, por_clase=30, semilla=0):
+    """Píxeles uint8 (N, 784) en grupos solapados, para que haya caracteres dudosos."""
+    rng = np.random.default_rng(semilla)
+    centros = rng.integers(60, 200, size=(clases, 784))
+    X = np.concatenate([centros[c] + rng.normal(0, 60, size=(por_clase, 784)) for c in range(clases)])
+    y = np.repeat(np.arange(clases) * 3 + 1, por_clase)  # clases no consecutivas, como en el mapping
+    return np.clip(X, 0, 255).astype(np.uint8), y
+
+
+@pytest.fixture(scope="module")
+def svc():
+    X, y = datos()
+    scaler = StandardScaler().fit(X)
+    model = SVC(kernel="linear", probability=True, random_state=0).fit(scaler.transform(X), y)
+    X_prueba, _ = datos(semilla=1)
+    return model, scaler, X_prueba
+
+
+@pytest.mark.parametrize("precision", motor_lineal.PRECISIONES)
+def test_svc_igual_que_sklearn(svc, precision):
+    model, scaler, X = svc
+    motor = MotorLineal.desde_arrays(motor_lineal.exportar_svc(model, scaler), precision)
+    X_scaled = scaler.transform(X)
+    
+    if precision == "float32":
+        np.testing.assert_array_equal(motor.predict(X), model.predict(X_scaled))
+    else:
+        # Los pesos reducidos pueden cambiar el voto de algún par casi empatado
+        assert np.mean(motor.predict(X) == model.predict(X_scaled)) >= 0.98
+    tolerancia = 2e-2 if precision == "int8" else 1e-3
+    np.testing.assert_allclose(motor.predict_proba(X), model.predict_proba(X_scaled), atol=tolerancia)
+    
+    clases, proba = motor.clasificar(X)
+    np.testing.assert_array_equal(clases, motor.predict(X))
+    np.testing.assert_allclose(proba, motor.predict_proba(X), rtol=1e-6)
+
+
+def test_int8_suma_enteros_exactos_por_grupo(svc):
+    model, scaler, X = svc
+    motor = MotorLineal.desde_arrays(motor_lineal.exportar_svc(model, scaler), "int8")
+    
+    assert motor.W.dtype == np.int8
+    assert max(fin - inicio for inicio, fin in motor.grupos) <= motor_lineal.MAX_PIXELES_GRUPO
+    # Referencia en int64 y float64: suma entera de cada grupo por su escala
+    X_ordenada = X[:, motor.orden].astype(np.int64)
+    esperada = motor.b.astype(np.float64)
+    for g, (inicio, fin) in enumerate(motor.grupos):
+        enteros = X_ordenada[:, inicio:fin] @ motor.W[inicio:fin].astype(np.int64)
+        esperada = esperada + enteros * motor.escalas[g].astype(np.float64)
+    np.testing.assert_allclose(motor.decision(X), esperada, rtol=1e-5, atol=1e-4)
+
+
+def test_int8_necesita_pixeles_uint8(svc):
+    model, scaler, X = svc
+    motor = MotorLineal.desde_arrays(motor_lineal.exportar_svc(model, scaler), "int8")
+    
+    with pytest.raises(ValueError):
+        motor.decision(X.astype(np.float32))
+
+
+@pytest.mark.parametrize("model", [
+    LogisticRegression(max_iter=2000),
+    SGDClassifier(loss="log_loss", random_state=0),
+])
+def test_uno_contra_resto_y_softmax_igual_que_sklearn(model):
+    X, y = datos()
+    scaler = StandardScaler().fit(X)
+    model.fit(scaler.transform(X), y)
+    motor = MotorLineal.desde_arrays(motor_lineal.exportar(model, scaler))
+    X_prueba, _ = datos(semilla=1)
+    X_scaled = scaler.transform(X_prueba)
+    
+    np.testing.assert_array_equal(motor.predict(X_prueba), model.predict(X_scaled))
+    np.testing.assert_allclose(motor.predict_proba(X_prueba), model.predict_proba(X_scaled), atol=1e-4)
+
+
+@pytest.mark.parametrize("argmax", [False, True])
+def test_clase_de_clasificar_matriz(svc, monkeypatch, argmax):
+    model, scaler, X = svc
+    monkeypatch.setattr(config, "CLASE_ARGMAX", argmax)
+    mapping = {int(c): f"L{c}" for c in model.classes_}
+    modelo = motor_ocr.ModeloOCR(model, scaler, mapping, "prueba")
+    
+    letras, confidencias = motor_ocr.clasificar_matriz(X, modelo=modelo)
+    
+    proba = model.predict_proba(scaler.transform(X))
+    if argmax:
+        clases = model.classes_[proba.argmax(axis=1)]
+    else:
+        clases = model.predict(scaler.transform(X))
+    assert letras == [mapping[int(c)] for c in clases]
+    indices = np.searchsorted(model.classes_, clases)
+    np.testing.assert_allclose(confidencias, proba[np.arange(len(X)), indices])
@@ -0,0 +1,78 @@
+"""
+PoolOCR con procesos: se crean con forkserver/spawn y, si uno muere, el
+ejecutor se rehace para las peticiones siguientes.
+
+Los procesos cargan models/modelo.pkl, así que sin el modelo entrenado se saltan.
+"""
+import asyncio
+import os
+import signal
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import motor_ocr
+from procesos import PoolOCR
+
+pytestmark = [
+    pytest.mark.skipif(not motor_ocr.rutas_artefactos()[0].exists(), reason="falta el modelo entrenado"),
+    pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="necesita SIGKILL"),
+]
+
+
+def imagen_texto():
+    """Imagen en gris con una palabra."""
+    img = Image.new("L", (40, 12), 255)
+    ImageDraw.Draw(img).text((2, 0), "casa", fill=0)
+    return np.asarray(img.resize((160, 48), Image.NEAREST))
+
+
+def test_el_ejecutor_se_rehace_si_muere_un_proceso():
+    img = imagen_texto()
+    
+    async def prueba():
+        pool = PoolOCR(2)
+        await pool.iniciar()
+        try:
+            assert pool.executor._mp_context.get_start_method() in ("forkserver", "spawn")
+            esperado = await pool.reconocer(img)
+            roto = pool.executor
+            
+            for pid in list(roto._processes):
+                os.kill(pid, signal.SIGKILL)
+            await asyncio.sleep(0.2)
+            # Las peticiones que encuentran el ejecutor roto fallan; solo se rehace una vez
+            resultados = await asyncio.gather(*[pool.reconocer(img) for _ in range(3)],
+                                              return_exceptions=True)
+            assert all(isinstance(r, Exception) for r in resultados)
+            assert pool.executor is not roto
+            
+            nuevo = pool.executor
+            assert await pool.reconocer(img) == esperado
+            assert pool.executor is nuevo
+        finally:
+            pool.cerrar()
+    
+    asyncio.run(prueba())
+
+
+def test_microlotes_en_procesos_igual_que_sin_microlotes():
+    img = imagen_texto()
+    
+    async def reconocer(pool, veces):
+        await pool.iniciar()
+        try:
+            return await asyncio.gather(*[pool.reconocer(img) for _ in range(veces)])
+        finally:
+            pool.cerrar()
+    
+    async def prueba():
+        esperado, = await reconocer(PoolOCR(2), 1)
+        # La matriz del micro-lote llega al proceso por memoria compartida
+        return esperado, await reconocer(PoolOCR(2, microlote_ms=5), 3)
+    
+    esperado, resultados = asyncio.run(prueba())
+    
+    assert esperado["letras"]
+    assert resultados == [esperado] * 3
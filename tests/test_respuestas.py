@@ -0,0 +1,75 @@
+"""
+Negociación del tipo de respuesta con la cabecera Accept.
+"""
+import json
+
+import pytest
+
+import respuestas
+from respuestas import COMPACTO, JSON, MSGPACK
+
+
+@pytest.fixture
+def con_msgpack(monkeypatch):
+    """La negociación como si msgpack estuviera instalado (es opcional)."""
+    monkeypatch.setattr(respuestas, "tipos_disponibles", lambda: (JSON, COMPACTO, MSGPACK))
+
+
+@pytest.mark.parametrize("accept, esperado", [
+    (None, JSON),
+    ("", JSON),
+    ("*/*", JSON),
+    ("application/*", JSON),
+    ("text/html", JSON),
+    ("application/json", JSON),
+    (COMPACTO, COMPACTO),
+    ("APPLICATION/MSGPACK", MSGPACK),
+    ("application/x-msgpack", MSGPACK),
+    ("application/vnd.msgpack", MSGPACK),
+])
+def test_tipos_y_alias(con_msgpack, accept, esperado):
+    assert respuestas.negociar(accept) == esperado
+
+
+@pytest.mark.parametrize("accept, esperado", [
+    # Gana la mayor q, esté donde esté
+    ("application/json;q=0.5, application/msgpack", MSGPACK),
+    ("application/msgpack;q=0.2, application/vnd.ocr.compacto+json;q=0.9", COMPACTO),
+    # Con igual q gana el primero
+    ("application/msgpack, application/json", MSGPACK),
+    ("application/json, application/msgpack", JSON),
+    # q=0 es "no aceptable"
+    ("application/msgpack;q=0, application/vnd.ocr.compacto+json;q=0.1", COMPACTO),
+    # Espacios, otros parámetros y Q en mayúsculas
+    (" application/msgpack ; charset=utf-8 ; Q=0.8 , application/json ; q=0.3", MSGPACK),
+    # Un tipo no disponible con q alta no cuenta
+    ("text/html, application/msgpack;q=0.1", MSGPACK),
+])
+def test_prioridad_por_q(con_msgpack, accept, esperado):
+    assert respuestas.negociar(accept) == esperado
+
+
+@pytest.mark.parametrize("q", ["abc", "", "2", "-1", "nan", "inf"])
+def test_q_no_valida_cuenta_como_cero(con_msgpack, q):
+    assert respuestas.negociar(f"application/msgpack;q={q}, application/json;q=0.1") == JSON
+
+
+def test_sin_msgpack_responde_json(monkeypatch):
+    monkeypatch.setattr(respuestas, "msgpack", None)
+    
+    assert MSGPACK not in respuestas.tipos_disponibles()
+    assert respuestas.negociar("application/msgpack") == JSON
+    assert respuestas.negociar("application/msgpack, application/vnd.ocr.compacto+json;q=0.5") == COMPACTO
+
+
+def test_responder_pone_tipo_y_vary():
+    contenido = {"texto": "Hola\nmundo", "letras": list("Hola") + ["ESPACIO"] + list("mundo"),
+                 "confidencias": [0.5] * 10, "confianza_promedio": 0.5}
+    respuesta = respuestas.responder(contenido, f"{COMPACTO}, {JSON};q=0.5")
+    
+    assert respuesta.media_type == COMPACTO
+    assert respuesta.headers["vary"] == "Accept"
+    compacto = json.loads(respuesta.body)
+    assert compacto["lineas"] == ["Hola", "mundo"]
+    assert compacto["confidencias"] == [50] * 10
+    assert compacto["confianza_promedio"] == 50
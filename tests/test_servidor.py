@@ -0,0 +1,33 @@
+"""
+Estado de salida de los procesos servidor tal como lo devuelve os.wait.
+"""
+import os
+import signal
+
+import pytest
+
+import servidor
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="necesita fork")
+
+
+def esperar_hijo(terminar):
+    """Crea un proceso con fork que ejecuta terminar() y devuelve su estado de os.waitpid."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            terminar()
+        finally:
+            os._exit(99)
+    return os.waitpid(pid, 0)[1]
+
+
+@pytest.mark.parametrize("codigo", [0, 1, 3])
+def test_codigo_de_exit(codigo):
+    assert servidor.codigo_salida(esperar_hijo(lambda: os._exit(codigo))) == codigo
+
+
+def test_terminado_por_una_senal():
+    estado = esperar_hijo(lambda: os.kill(os.getpid(), signal.SIGKILL))
+    
+    assert servidor.codigo_salida(estado) == -signal.SIGKILL
@@ -0,0 +1,118 @@
+"""
+/upload-image/stream: el turno de la cola de admisión se libera aunque el
+cliente se desconecte a mitad de la respuesta.
+"""
+import asyncio
+import io
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+import motor_ocr
+from admision import ControlAdmision
+
+FRONTERA = b"frontera"
+
+
+def imagen_png():
+    """PNG blanco de 8x8."""
+    buffer = io.BytesIO()
+    Image.new("L", (8, 8), 255).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def cuerpo_multipart():
+    """Cuerpo multipart/form-data con una imagen PNG pequeña en el campo file."""
+    return (b"--" + FRONTERA + b"\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="prueba.png"\r\n'
+            b"Content-Type: image/png\r\n\r\n" + imagen_png() + b"\r\n"
+            b"--" + FRONTERA + b"--\r\n")
+
+
+@pytest.fixture
+def servidor(monkeypatch):
+    """main sin arrancar el lifespan: reconocimiento que emite dos líneas y se queda esperando."""
+    seguir = asyncio.Event()
+    cerrado = []
+    
+    async def reconocer_por_lineas(img_array):
+        try:
+            # Dos líneas listas: la segunda espera en el envío cuando el cliente se va
+            yield {"tipo": "linea", "letras": []}
+            yield {"tipo": "linea", "letras": []}
+            await seguir.wait()
+            yield {"tipo": "resumen", "texto": ""}
+        finally:
+            cerrado.append(True)
+    
+    monkeypatch.setattr(motor_ocr, "modelo_activo", SimpleNamespace(version="prueba"))
+    monkeypatch.setattr(main, "control_admision", ControlAdmision(4, 1))
+    monkeypatch.setattr(main, "pool_ocr", SimpleNamespace(reconocer_por_lineas=reconocer_por_lineas))
+    monkeypatch.setattr(main, "escritor_debug", SimpleNamespace(enviar=lambda img, nombre: None))
+    return cerrado
+
+
+async def pedir_y_desconectar():
+    """Pide el stream y se desconecta mientras recibe el primer fragmento."""
+    cuerpo = cuerpo_multipart()
+    scope = {
+        "type": "http", "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/upload-image/stream", "raw_path": b"/upload-image/stream", "query_string": b"",
+        "root_path": "", "client": ("127.0.0.1", 1), "server": ("testserver", 80),
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + FRONTERA),
+                    (b"content-length", str(len(cuerpo)).encode())],
+    }
+    recibido = asyncio.Event()
+    fragmentos = []
+    enviado = False
+    
+    async def receive():
+        nonlocal enviado
+        if not enviado:
+            enviado = True
+            return {"type": "http.request", "body": cuerpo, "more_body": False}
+        await recibido.wait()
+        return {"type": "http.disconnect"}
+    
+    async def send(mensaje):
+        # Como uvicorn: tras la desconexión los envíos se descartan sin error
+        if recibido.is_set():
+            return
+        if mensaje["type"] == "http.response.start":
+            assert mensaje["status"] == 200
+        elif mensaje["type"] == "http.response.body" and mensaje.get("body"):
+            fragmentos.append(mensaje["body"])
+            recibido.set()
+            # Cliente lento: la siguiente línea queda esperando en emitir()
+            await asyncio.sleep(0.05)
+    
+    await asyncio.wait_for(main.app(scope, receive, send), 5)
+    # Comprobado sin ceder el bucle: no vale que lo libere el recolector más tarde
+    return fragmentos, main.control_admision.admitidas
+
+
+def test_desconexion_a_mitad_libera_el_turno(servidor):
+    fragmentos, admitidas = asyncio.run(pedir_y_desconectar())
+    
+    assert len(fragmentos) == 1
+    assert admitidas == 0
+    assert servidor == [True]
+    assert main.control_admision.semaforo._value == 1
+
+
+@pytest.mark.parametrize("fallo, estado", [(None, 400), (RuntimeError("fallo"), 500)])
+def test_sin_primera_linea_libera_el_turno(servidor, monkeypatch, fallo, estado):
+    async def reconocer_por_lineas(img_array):
+        if fallo:
+            raise fallo
+        return
+        yield
+    
+    monkeypatch.setattr(main, "pool_ocr", SimpleNamespace(reconocer_por_lineas=reconocer_por_lineas))
+    respuesta = TestClient(main.app).post("/upload-image/stream", files={"file": ("prueba.png", imagen_png())})
+    
+    assert respuesta.status_code == estado
+    assert main.control_admision.admitidas == 0